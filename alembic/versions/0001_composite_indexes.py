@@ -0,0 +1,75 @@
+"""Índices compostos para as consultas do dashboard, uso e relatório financeiro
+
+Revision ID: 0001_composite_indexes
+Revises:
+Create Date: 2026-10-18
+
+As tabelas são criadas por Base.metadata.create_all na inicialização
+(start.sh); esta revisão apenas adiciona os índices, por isso usa
+IF NOT EXISTS e pode rodar em bancos novos ou já populados.
+
+No Postgres os índices são criados com CREATE INDEX CONCURRENTLY, fora de
+transação, para não bloquear escritas em tabelas grandes. Se uma criação
+concorrente falhar, o índice fica INVALID: remova-o antes de repetir.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_composite_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas, único)
+INDEXES = [
+    ("ix_leads_created_at_status", "leads", ["created_at", "status"], False),
+    ("ix_lead_purchases_client_id_status", "lead_purchases", ["client_id", "status"], False),
+    ("ix_lead_purchases_status_created_at", "lead_purchases", ["status", "created_at"], False),
+    ("uq_lead_usages_client_id_date", "lead_usages", ["client_id", "date"], True),
+]
+
+
+def merge_duplicate_lead_usages():
+    """Consolida registros duplicados de (client_id, date) antes do índice único"""
+    op.execute(sa.text("""
+        UPDATE lead_usages
+        SET total_consumed = (
+            SELECT SUM(dup.total_consumed) FROM lead_usages dup
+            WHERE dup.client_id = lead_usages.client_id AND dup.date = lead_usages.date
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM lead_usages
+            GROUP BY client_id, date
+            HAVING COUNT(*) > 1
+        )
+    """))
+    op.execute(sa.text("""
+        DELETE FROM lead_usages
+        WHERE id NOT IN (SELECT MIN(id) FROM lead_usages GROUP BY client_id, date)
+    """))
+
+
+def upgrade():
+    merge_duplicate_lead_usages()
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name, table, columns,
+                unique=unique,
+                if_not_exists=True,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True
+            )
@@ -0,0 +1,37 @@
+"""Versão de token por usuário (revogação dos tokens JWT)
+
+Revision ID: 0002_user_token_version
+Revises: 0001_composite_indexes
+Create Date: 2026-10-18
+
+Bancos criados pelo create_all já têm a coluna; nos demais ela é
+adicionada com default 0, o que mantém válidos os tokens emitidos antes
+da migração.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_user_token_version'
+down_revision = '0001_composite_indexes'
+branch_labels = None
+depends_on = None
+
+
+def user_columns():
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+
+
+def upgrade():
+    if "token_version" not in user_columns():
+        op.add_column(
+            "users",
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade():
+    if "token_version" in user_columns():
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.drop_column("token_version")
@@ -0,0 +1,35 @@
+"""Índice (source, status) para o agrupamento por origem e status do dashboard
+
+Revision ID: 0003_leads_source_status_index
+Revises: 0002_user_token_version
+Create Date: 2026-10-18
+
+Com o índice, o GROUP BY (source, status) dos gráficos do dashboard é
+resolvido por uma varredura do índice, sem ler a tabela leads.
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_leads_source_status_index'
+down_revision = '0002_user_token_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_leads_source_status", "leads", ["source", "status"],
+            if_not_exists=True,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_leads_source_status", table_name="leads",
+            if_exists=True,
+            postgresql_concurrently=True
+        )
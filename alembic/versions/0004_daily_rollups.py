@@ -0,0 +1,91 @@
+"""Agregados diários de leads e compras (lead_daily_stats, purchase_daily_stats)
+
+Revision ID: 0004_daily_rollups
+Revises: 0003_leads_source_status_index
+Create Date: 2026-10-18
+
+Cria as tabelas quando ainda não existem e, se estiverem vazias, as
+preenche a partir de leads e lead_purchases. Depois disso, o crud_lead as
+mantém de forma incremental; `python rollups.py` as reconstrói.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_daily_rollups'
+down_revision = '0003_leads_source_status_index'
+branch_labels = None
+depends_on = None
+
+
+def day_expression(column):
+    if op.get_bind().dialect.name == "sqlite":
+        return f"date({column})"
+    return f"CAST({column} AS DATE)"
+
+
+def upgrade():
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "lead_daily_stats" not in tables:
+        op.create_table(
+            "lead_daily_stats",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("source", sa.String(), nullable=False, server_default=""),
+            sa.Column("status", sa.String(), nullable=False, server_default=""),
+            sa.Column("assigned_to_id", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("lead_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+        op.create_index("ix_lead_daily_stats_id", "lead_daily_stats", ["id"])
+        op.create_index(
+            "uq_lead_daily_stats_key", "lead_daily_stats",
+            ["day", "source", "status", "assigned_to_id"], unique=True
+        )
+
+    if "purchase_daily_stats" not in tables:
+        op.create_table(
+            "purchase_daily_stats",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("client_id", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("status", sa.String(), nullable=False, server_default=""),
+            sa.Column("purchase_count", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("quantity", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("amount", sa.Float(), nullable=False, server_default="0"),
+            sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        )
+        op.create_index("ix_purchase_daily_stats_id", "purchase_daily_stats", ["id"])
+        op.create_index(
+            "uq_purchase_daily_stats_key", "purchase_daily_stats",
+            ["day", "client_id", "status"], unique=True
+        )
+
+    bind = op.get_bind()
+    if "leads" in tables and not bind.execute(sa.text("SELECT 1 FROM lead_daily_stats LIMIT 1")).first():
+        day = day_expression("created_at")
+        op.execute(sa.text(f"""
+            INSERT INTO lead_daily_stats (day, source, status, assigned_to_id, lead_count, updated_at)
+            SELECT {day}, COALESCE(source, ''), COALESCE(status, ''), COALESCE(assigned_to_id, 0),
+                   COUNT(id), CURRENT_TIMESTAMP
+            FROM leads
+            WHERE created_at IS NOT NULL
+            GROUP BY {day}, COALESCE(source, ''), COALESCE(status, ''), COALESCE(assigned_to_id, 0)
+        """))
+    if "lead_purchases" in tables and not bind.execute(sa.text("SELECT 1 FROM purchase_daily_stats LIMIT 1")).first():
+        day = day_expression("created_at")
+        op.execute(sa.text(f"""
+            INSERT INTO purchase_daily_stats (day, client_id, status, purchase_count, quantity, amount, updated_at)
+            SELECT {day}, COALESCE(client_id, 0), COALESCE(status, ''),
+                   COUNT(id), COALESCE(SUM(quantity), 0), COALESCE(SUM(amount), 0), CURRENT_TIMESTAMP
+            FROM lead_purchases
+            WHERE created_at IS NOT NULL
+            GROUP BY {day}, COALESCE(client_id, 0), COALESCE(status, '')
+        """))
+
+
+def downgrade():
+    op.drop_table("purchase_daily_stats")
+    op.drop_table("lead_daily_stats")
@@ -0,0 +1,54 @@
+"""Índices (created_at, id) para a paginação por cursor de leads, compras e usuários
+
+Revision ID: 0005_keyset_pagination_indexes
+Revises: 0004_daily_rollups
+Create Date: 2026-10-18
+
+As listagens ordenam por (created_at, id) decrescente e continuam a partir
+do cursor; com estes índices cada página é uma varredura curta do índice,
+também quando filtrada por responsável, status ou cliente. O filtro por
+status das compras usa o índice (status, created_at) da revisão 0001.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_keyset_pagination_indexes'
+down_revision = '0004_daily_rollups'
+branch_labels = None
+depends_on = None
+
+
+# (nome, tabela, colunas)
+INDEXES = [
+    ("ix_leads_created_at_id", "leads", ["created_at", "id"]),
+    ("ix_leads_assigned_to_id_created_at_id", "leads", ["assigned_to_id", "created_at", "id"]),
+    ("ix_leads_status_created_at_id", "leads", ["status", "created_at", "id"]),
+    ("ix_lead_purchases_created_at_id", "lead_purchases", ["created_at", "id"]),
+    ("ix_lead_purchases_client_id_created_at_id", "lead_purchases", ["client_id", "created_at", "id"]),
+    ("ix_users_created_at_id", "users", ["created_at", "id"]),
+]
+
+
+def upgrade():
+    tables = set(sa.inspect(op.get_bind()).get_table_names())
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            if table not in tables:
+                continue
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True
+            )
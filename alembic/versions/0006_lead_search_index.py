@@ -0,0 +1,83 @@
+"""Índice de busca textual de leads (FTS5 no SQLite, pg_trgm no PostgreSQL)
+
+Revision ID: 0006_lead_search_index
+Revises: 0005_keyset_pagination_indexes
+Create Date: 2026-10-18
+
+SQLite: cria a tabela virtual leads_fts (tokenizer trigram) e, se estiver
+vazia, a preenche a partir de leads em lotes. Depois disso, o crud_lead a
+mantém (ver lead_search).
+
+PostgreSQL: habilita a extensão pg_trgm e cria, com CREATE INDEX
+CONCURRENTLY, um índice GIN de trigramas sobre nome, email e telefone. A
+expressão deve ser idêntica a lead_search.SEARCH_DOCUMENT_SQL.
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_lead_search_index'
+down_revision = '0005_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_DOCUMENT_SQL = (
+    "(coalesce(leads.name, '') || ' ' || coalesce(leads.email, '') || ' ' || "
+    "coalesce(leads.phone, '') || ' ' || regexp_replace(coalesce(leads.phone, ''), '[^0-9]', '', 'g'))"
+)
+BACKFILL_BATCH_SIZE = 5000
+
+
+def backfill_sqlite(bind):
+    if bind.execute(sa.text("SELECT 1 FROM leads_fts LIMIT 1")).first():
+        return
+    insert = sa.text(
+        "INSERT INTO leads_fts (rowid, name, email, phone, phone_digits) "
+        "VALUES (:id, :name, :email, :phone, :digits)"
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(sa.text(
+            "SELECT id, name, email, phone FROM leads WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).fetchall()
+        if not rows:
+            return
+        bind.execute(insert, [
+            {"id": row.id, "name": row.name, "email": row.email, "phone": row.phone,
+             "digits": re.sub(r"\D", "", row.phone or "")}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    if "leads" not in sa.inspect(bind).get_table_names():
+        return
+
+    if bind.dialect.name == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts "
+            "USING fts5(name, email, phone, phone_digits, tokenize='trigram')"
+        )
+        backfill_sqlite(bind)
+    elif bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_leads_search_trgm "
+                f"ON leads USING gin ({SEARCH_DOCUMENT_SQL} gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS leads_fts")
+    elif bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_leads_search_trgm")
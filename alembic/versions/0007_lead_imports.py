@@ -0,0 +1,44 @@
+"""Andamento das importações de leads (lead_imports)
+
+Revision ID: 0007_lead_imports
+Revises: 0006_lead_search_index
+Create Date: 2026-10-18
+
+Os jobs de importação ficavam na memória do worker que os criou; com
+vários workers, o envio e a consulta caíam em outros processos. A tabela
+guarda o andamento para que qualquer worker o consulte.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_lead_imports'
+down_revision = '0006_lead_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "lead_imports" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "lead_imports",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("format", sa.String(), nullable=False),
+        sa.Column("created_by_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("assigned_to_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("status", sa.String(), nullable=False, server_default="pending"),
+        sa.Column("processed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("errors", sa.JSON(), nullable=False),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("started_at", sa.DateTime(timezone=True)),
+        sa.Column("finished_at", sa.DateTime(timezone=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("lead_imports", if_exists=True)
@@ -6,6 +6,7 @@ Este módulo implementa as rotas de autenticação, incluindo login, logout
 e obtenção de informações do usuário atual.
 """
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
@@ -21,6 +22,7 @@ from models_user import User
 import core_security
 import logger
 from error_handlers import AuthenticationError, handle_errors
+from rate_limit import login_throttle, get_client_ip
 
 # Criar router
 router = APIRouter()
@@ -35,16 +37,16 @@ class Token(BaseModel):
 @router.post("/token", response_model=Token)
 @handle_errors(default_message="Erro durante autenticação")
 async def login_for_access_token(
+    request: Request,
     response: Response,
-    db: Session = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     Autentica o usuário e retorna um token JWT
     
     Args:
+        request: Objeto Request do FastAPI
         response: Objeto Response do FastAPI
-        db: Sessão do banco de dados
         form_data: Dados do formulário de login
         
     Returns:
@@ -52,16 +54,31 @@ async def login_for_access_token(
         
     Raises:
         AuthenticationError: Se as credenciais forem inválidas ou o usuário estiver inativo
+        RateLimitError: Se a conta ou o IP excederem o limite de falhas de login
+        ServiceUnavailableError: Se o pool de hash de senha estiver saturado
     """
     logger.info("Tentativa de autenticação via API", {"email": form_data.username})
     
-    user = crud_user.get_user_by_email(db, email=form_data.username)
-    if not user or not core_security.verify_password(form_data.password, user.hashed_password):
+    # Bloqueio por conta e por IP antes de qualquer hash; a tentativa já conta
+    # como falha e é devolvida se o login der certo. O backend compartilhado
+    # (SQLite) pode esperar pelo lock, então roda fora do event loop
+    client_ip = get_client_ip(request)
+    attempt = await asyncio.to_thread(login_throttle.reserve, form_data.username, client_ip)
+    
+    try:
+        user = await core_security.authenticate_user_async(
+            email=form_data.username, password=form_data.password
+        )
+    except Exception:
+        await asyncio.to_thread(login_throttle.release, attempt)
+        raise
+    if not user:
         logger.warning("Falha na autenticação via API", {"email": form_data.username})
         raise AuthenticationError(
             message="Email ou senha incorretos",
             details={"email": form_data.username}
         )
+    await asyncio.to_thread(login_throttle.record_success, attempt)
         
     if not user.is_active:
         logger.warning("Tentativa de login com usuário inativo", {"email": form_data.username, "user_id": user.id})
@@ -72,8 +89,8 @@ async def login_for_access_token(
 
     # Criar token JWT
     access_token_expires = timedelta(minutes=core_security.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = core_security.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    access_token = core_security.create_user_access_token(
+        user, expires_delta=access_token_expires
     )
 
     # Registrar login bem-sucedido
@@ -163,8 +180,8 @@ async def refresh_access_token(
     
     # Criar novo token JWT
     access_token_expires = timedelta(minutes=core_security.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = core_security.create_access_token(
-        data={"sub": current_user.email}, expires_delta=access_token_expires
+    access_token = core_security.create_user_access_token(
+        current_user, expires_delta=access_token_expires
     )
     
     # Atualizar cookie se response for fornecido
@@ -207,8 +224,11 @@ async def change_password(
     """
     logger.info("Tentativa de alteração de senha", {"user_id": current_user.id})
     
+    # Carregar o usuário nesta sessão; current_user vem da sessão assíncrona da autenticação
+    db_user = crud_user.get_user(db, user_id=current_user.id)
+    
     # Verificar senha atual
-    if not core_security.verify_password(current_password, current_user.hashed_password):
+    if not await core_security.verify_password_async(current_password, db_user.hashed_password):
         logger.warning("Falha na alteração de senha: senha atual incorreta", {"user_id": current_user.id})
         raise AuthenticationError(
             message="Senha atual incorreta",
@@ -216,11 +236,13 @@ async def change_password(
         )
     
     # Gerar hash da nova senha
-    hashed_password = core_security.get_password_hash(new_password)
+    hashed_password = await core_security.get_password_hash_async(new_password)
     
-    # Atualizar senha no banco de dados
-    current_user.hashed_password = hashed_password
+    # Atualizar senha no banco de dados, revogando os tokens emitidos
+    db_user.hashed_password = hashed_password
+    core_security.revoke_user_tokens(db_user)
     db.commit()
+    core_security.publish_user_change(db_user)
     
     logger.info("Senha alterada com sucesso", {"user_id": current_user.id})
     
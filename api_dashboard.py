@@ -1,24 +1,349 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, extract
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+from sqlalchemy import func, desc, and_, case
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Dict, List, Any, Optional, Tuple
+import asyncio
 import calendar
+import hashlib
 import json
-import random # Para dados simulados
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from database import get_db
+import logger
+from cache import StaleWhileRevalidateCache
+from database import (
+    get_read_db, get_async_read_db, replica_router, statement_timeout, ReadSessionLocal, PrimaryReadSessionLocal,
+    READ_POOL_SIZE
+)
 # Assumindo que Lead e LeadPurchase são os modelos relevantes. Se houver um modelo Commission, deve ser importado.
 from models import Lead, LeadPurchase # Adicionado LeadPurchase
-from core_security import get_current_active_user
+from models_rollups import LeadDailyStat, PurchaseDailyStat
+from core_security import get_current_principal
+from error_handlers import NotFoundError, ServiceUnavailableError, ValidationError
+from event_stream import EventBroadcaster, format_sse
+from rollups import add_change_listener
+from time_buckets import GRANULARITIES, bucket_label, bucket_range, bucket_totals, months_back
 
 # Criar router para o dashboard
 router = APIRouter(prefix="/dashboard")
 
+# Cache das estatísticas por perfil: novas por DASHBOARD_CACHE_TTL segundos e,
+# depois disso, servidas por até DASHBOARD_CACHE_STALE_TTL segundos enquanto
+# um único recálculo roda em segundo plano
+DASHBOARD_CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+DASHBOARD_CACHE_STALE_TTL = float(os.getenv("DASHBOARD_CACHE_STALE_TTL", "300"))
+dashboard_cache = StaleWhileRevalidateCache(
+    "dashboard_stats", ttl=DASHBOARD_CACHE_TTL, stale_ttl=DASHBOARD_CACHE_STALE_TTL
+)
+# Escritas de leads e compras vencem o cache assim que são confirmadas
+add_change_listener(dashboard_cache.invalidate)
+
+# Painéis ausentes do cache são calculados ao mesmo tempo, cada um com sua
+# sessão do pool de leitura (por padrão, um worker por conexão desse pool);
+# cada consulta tem no máximo DASHBOARD_QUERY_TIMEOUT segundos, contados a partir
+# do início do painel, e um painel que espera na fila mais que
+# DASHBOARD_PANEL_QUEUE_TIMEOUT segundos é cancelado sem ocupar um worker
+DASHBOARD_PARALLEL_PANELS = os.getenv("DASHBOARD_PARALLEL_PANELS", "true").lower() in ("1", "true", "yes")
+DASHBOARD_PANEL_WORKERS = int(os.getenv("DASHBOARD_PANEL_WORKERS", str(READ_POOL_SIZE)))
+DASHBOARD_QUERY_TIMEOUT = float(os.getenv("DASHBOARD_QUERY_TIMEOUT", "5"))
+DASHBOARD_PANEL_QUEUE_TIMEOUT = float(
+    os.getenv("DASHBOARD_PANEL_QUEUE_TIMEOUT", str(DASHBOARD_QUERY_TIMEOUT * 2))
+)
+panel_executor = ThreadPoolExecutor(max_workers=DASHBOARD_PANEL_WORKERS, thread_name_prefix="dashboard-panel")
+
+# Stream SSE do dashboard (por worker): limite de conexões, heartbeat e
+# espera para agrupar alterações em sequência num único recálculo
+DASHBOARD_STREAM_MAX_CONNECTIONS = int(os.getenv("DASHBOARD_STREAM_MAX_CONNECTIONS", "100"))
+DASHBOARD_STREAM_HEARTBEAT_SECONDS = float(os.getenv("DASHBOARD_STREAM_HEARTBEAT_SECONDS", "15"))
+DASHBOARD_STREAM_DEBOUNCE_SECONDS = float(os.getenv("DASHBOARD_STREAM_DEBOUNCE_SECONDS", "1"))
+# Recálculo periódico do stream: escritas feitas em outros workers não
+# avisam este processo e só aparecem nele por aqui (0 desativa)
+DASHBOARD_STREAM_REFRESH_SECONDS = float(os.getenv("DASHBOARD_STREAM_REFRESH_SECONDS", str(DASHBOARD_CACHE_TTL)))
+
+# Status considerados nos cards
+QUALIFIED_STATUSES = ["qualificado", "proposta", "fechado"]
+CONVERTED_STATUS = "fechado"
+
+# Período padrão dos gráficos de evolução (meses, contando o atual)
+DEFAULT_SERIES_MONTHS = 12
+
+
+def get_card_counts(db: Session, since: datetime) -> tuple:
+    """
+    Conta total, qualificados e convertidos desde o dia de `since` em uma
+    única leitura do agregado lead_daily_stats
+    
+    Returns:
+        Tupla (total_leads, qualified_leads, converted_leads)
+    """
+    lead_count = LeadDailyStat.lead_count
+    total_leads, qualified_leads, converted_leads = db.query(
+        func.sum(lead_count),
+        func.sum(case((LeadDailyStat.status.in_(QUALIFIED_STATUSES), lead_count), else_=0)),
+        func.sum(case((LeadDailyStat.status == CONVERTED_STATUS, lead_count), else_=0))
+    ).filter(
+        LeadDailyStat.day >= since.date()
+    ).one()
+    return int(total_leads or 0), int(qualified_leads or 0), int(converted_leads or 0)
+
+
+def get_source_status_breakdown(db: Session) -> tuple:
+    """
+    Totais por origem e por status a partir de um único GROUP BY (source, status)
+    sobre o agregado lead_daily_stats
+    
+    Returns:
+        Tupla (origens, status), cada uma uma lista de (rótulo, total)
+        em ordem decrescente de total
+    """
+    by_source: Dict[Any, int] = {}
+    by_status: Dict[Any, int] = {}
+    rows = db.query(
+        LeadDailyStat.source, LeadDailyStat.status, func.sum(LeadDailyStat.lead_count)
+    ).group_by(LeadDailyStat.source, LeadDailyStat.status).all()
+    for source, lead_status, count in rows:
+        count = int(count or 0)
+        if not count:
+            continue
+        by_source[source] = by_source.get(source, 0) + count
+        by_status[lead_status] = by_status.get(lead_status, 0) + count
+    
+    def ordered(totals):
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return ordered(by_source), ordered(by_status)
+
+
+def get_series_period(start_date: Optional[date], end_date: Optional[date], granularity: str) -> tuple:
+    """
+    Valida o período e a granularidade dos gráficos de evolução
+    
+    Returns:
+        Tupla (start_date, end_date, granularity); sem datas, os últimos
+        DEFAULT_SERIES_MONTHS meses completos até hoje
+    
+    Raises:
+        ValidationError: Se a granularidade ou o período forem inválidos
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or months_back(end_date, DEFAULT_SERIES_MONTHS)
+    try:
+        bucket_range(start_date, end_date, granularity)
+    except ValueError as e:
+        field = "granularity" if granularity not in GRANULARITIES else "start_date"
+        raise ValidationError(message="Período inválido para os gráficos", field_errors={field: str(e)})
+    return start_date, end_date, granularity
+
+
+def get_dashboard_scope(current_user) -> str:
+    """Chave do cache do dashboard para o perfil do usuário"""
+    return "admin" if getattr(current_user, "is_superuser", False) else "user"
+
+
+def dashboard_etag(stats: Dict[str, Any]) -> str:
+    """
+    ETag forte das estatísticas: hash do conteúdo calculado
+    
+    Muda sempre que os agregados lidos mudam e é igual em todos os workers
+    para os mesmos dados, então um cliente pode revalidar em qualquer um.
+    """
+    digest = hashlib.sha256(json.dumps(stats, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Verifica se o cabeçalho If-None-Match contém a ETag (comparação fraca, RFC 9110)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def _dashboard_snapshot(stats: Dict[str, Any]) -> Dict[str, Any]:
+    # A ETag é calculada uma vez por entrada do cache, não a cada requisição
+    return {
+        "stats": stats,
+        "etag": dashboard_etag(stats),
+        "computed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def _new_read_session() -> Session:
+    return ReadSessionLocal() if replica_router.use_replica() else PrimaryReadSessionLocal()
+
+
+def compute_panel(panel: str, db: Optional[Session], period: tuple) -> Dict[str, Any]:
+    """
+    Calcula um painel com limite de DASHBOARD_QUERY_TIMEOUT segundos por consulta
+    
+    Args:
+        panel: Nome do painel em DASHBOARD_PANELS
+        db: Sessão a usar; None abre uma sessão própria do pool de leitura
+        period: Tupla (start_date, end_date, granularity)
+    """
+    own_session = db is None
+    if own_session:
+        db = _new_read_session()
+    try:
+        with statement_timeout(db, DASHBOARD_QUERY_TIMEOUT):
+            return DASHBOARD_PANELS[panel](db, *period)
+    except Exception:
+        # Libera a transação (no PostgreSQL, abortada após o timeout) para os próximos painéis
+        db.rollback()
+        raise
+    finally:
+        if own_session:
+            db.close()
+
+
+def _panel_key(scope: str, panel: str, period: tuple) -> tuple:
+    # Painéis sem série temporal ignoram o período: uma entrada por perfil
+    return (scope, panel, *(period if panel in SERIES_PANELS else ()))
+
+
+def _load_panel_snapshot(db: Optional[Session], scope: str, panel: str, period: tuple):
+    return dashboard_cache.get(
+        _panel_key(scope, panel, period),
+        compute=lambda: _dashboard_snapshot(compute_panel(panel, db, period)),
+        refresh=lambda: _dashboard_snapshot(compute_panel(panel, None, period))
+    )
+
+
+def _run_panels(calls: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+    """
+    Executa os painéis no panel_executor; o resultado de cada um é o retorno ou a exceção
+    
+    O prazo de cada painel começa quando ele sai da fila, para que a espera por
+    um worker livre não o faça ser dado como indisponível sem ter rodado. Um
+    painel que não começa em DASHBOARD_PANEL_QUEUE_TIMEOUT segundos é cancelado.
+    """
+    started_at: Dict[str, float] = {}
+    started = {panel: threading.Event() for panel in calls}
+    
+    def run(panel: str):
+        started_at[panel] = time.monotonic()
+        started[panel].set()
+        return calls[panel]()
+    
+    futures = {panel: panel_executor.submit(run, panel) for panel in calls}
+    outcomes: Dict[str, Any] = {}
+    for panel, future in futures.items():
+        try:
+            if not started[panel].wait(DASHBOARD_PANEL_QUEUE_TIMEOUT) and future.cancel():
+                raise TimeoutError(
+                    f"Painel {panel} aguardou mais de {DASHBOARD_PANEL_QUEUE_TIMEOUT}s por um worker"
+                )
+            started[panel].wait()
+            # O limite no banco deve vencer antes; este é só uma garantia
+            deadline = started_at[panel] + DASHBOARD_QUERY_TIMEOUT * 2
+            outcomes[panel] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            outcomes[panel] = e
+    return outcomes
+
+
+def _load_panels(db: Optional[Session], scope: str, period: tuple, parallel: bool) -> Dict[str, Any]:
+    """Carrega todos os painéis; o resultado de cada um é (snapshot, idade) ou a exceção"""
+    outcomes: Dict[str, Any] = {}
+    if parallel:
+        outcomes = _run_panels({
+            panel: partial(_load_panel_snapshot, None, scope, panel, period)
+            for panel in DASHBOARD_PANELS
+        })
+    else:
+        for panel in DASHBOARD_PANELS:
+            try:
+                outcomes[panel] = _load_panel_snapshot(db, scope, panel, period)
+            except Exception as e:
+                outcomes[panel] = e
+    return outcomes
+
+
+def _merge_panels(outcomes: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], float]:
+    """
+    Junta os painéis numa única resposta
+    
+    Painéis que falharam ficam fora dos dados e são listados em
+    unavailable_panels; nesse caso não há ETag, para a resposta parcial não
+    ser reaproveitada pelo cliente.
+    """
+    stats: Dict[str, Any] = {}
+    unavailable = []
+    etags = []
+    ages = []
+    computed_at = []
+    for panel, outcome in outcomes.items():
+        if isinstance(outcome, BaseException):
+            logger.error("Painel do dashboard indisponível", {"panel": panel, "error": repr(outcome)})
+            unavailable.append(panel)
+            continue
+        snapshot, age = outcome
+        stats.update(snapshot["stats"])
+        etags.append(snapshot["etag"])
+        ages.append(age)
+        computed_at.append(snapshot["computed_at"])
+    
+    stats["unavailable_panels"] = unavailable
+    stats["computed_at"] = min(computed_at) if computed_at else None
+    etag = None if unavailable else f'"{hashlib.sha256("".join(etags).encode()).hexdigest()[:32]}"'
+    return stats, etag, max(ages, default=0.0)
+
+
+def conditional_response(request: Request, stats: Dict[str, Any], etag: str, age: float) -> Response:
+    """Resposta JSON com ETag e Age, ou 304 se If-None-Match tiver a mesma ETag"""
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Age": str(int(age))}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=stats, headers=headers)
+
+
+def load_dashboard_stats(
+    db: Session,
+    current_user,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = "month",
+    parallel: Optional[bool] = None
+) -> Tuple[Dict[str, Any], Optional[str], float]:
+    """
+    Obtém as estatísticas do dashboard, painel a painel, pelo cache
+    
+    Args:
+        db: Sessão somente leitura (usada no modo sequencial)
+        current_user: Usuário autenticado (define o perfil das entradas)
+        start_date: Início dos gráficos de evolução
+        end_date: Fim dos gráficos de evolução
+        granularity: Intervalo dos gráficos de evolução
+        parallel: Calcula os painéis ausentes do cache ao mesmo tempo, cada
+            um com sua sessão; padrão: DASHBOARD_PARALLEL_PANELS
+    
+    Returns:
+        Tupla (estatísticas com computed_at e unavailable_panels, ETag,
+        idade em segundos); a ETag é None se algum painel falhou
+    
+    Raises:
+        ValidationError: Se a granularidade ou o período forem inválidos
+    """
+    period = get_series_period(start_date, end_date, granularity)
+    if parallel is None:
+        parallel = DASHBOARD_PARALLEL_PANELS
+    outcomes = _load_panels(db, get_dashboard_scope(current_user), period, parallel)
+    return _merge_panels(outcomes)
+
+
 @router.get("/stats")
 def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_active_user)
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = "month",
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(get_current_principal)
 ):
     """
     Retorna estatísticas agregadas para o dashboard financeiro.
@@ -28,221 +353,389 @@ def get_dashboard_stats(
     - Leads convertidos
     - Receita estimada
     - Dados para gráficos (Leads, Origem, Status, Comissões)
+    - Momento do cálculo (computed_at, UTC)
+    - Painéis que não puderam ser calculados (unavailable_panels)
+    
+    Os gráficos de evolução cobrem de start_date a end_date (padrão: últimos
+    12 meses), agrupados por granularity ("day", "week" ou "month").
+    
+    A resposta traz ETag; com If-None-Match igual, responde 304 sem corpo e
+    sem recalcular. O cabeçalho Age informa há quantos segundos os dados
+    foram calculados. Se um painel falhar ou passar do tempo limite, os
+    demais são devolvidos normalmente, sem ETag.
+    """
+    stats, etag, age = load_dashboard_stats(db, current_user, start_date, end_date, granularity)
+    if etag is None:
+        return JSONResponse(content=stats, headers={"Cache-Control": "no-store"})
+    return conditional_response(request, stats, etag, age)
+
+
+def load_dashboard_panel(
+    db: Session,
+    current_user,
+    panel: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = "month"
+) -> Tuple[Dict[str, Any], str, float]:
+    """
+    Obtém um painel do dashboard pelo cache, independente dos demais
+    
+    Painéis sem série temporal ignoram o período e compartilham uma única
+    entrada por perfil.
+    
+    Returns:
+        Tupla (dados do painel com computed_at, ETag, idade em segundos)
+    
+    Raises:
+        NotFoundError: Se o painel não existir
+        ValidationError: Se a granularidade ou o período forem inválidos
+    """
+    if panel not in DASHBOARD_PANELS:
+        raise NotFoundError(message="Painel não encontrado", resource_type="dashboard_panel", resource_id=panel)
+    period = get_series_period(start_date, end_date, granularity)
+    snapshot, age = _load_panel_snapshot(db, get_dashboard_scope(current_user), panel, period)
+    return {**snapshot["stats"], "computed_at": snapshot["computed_at"]}, snapshot["etag"], age
+
+
+@router.get("/panels/{panel}")
+def get_dashboard_panel(
+    request: Request,
+    panel: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    granularity: str = "month",
+    db: Session = Depends(get_read_db),
+    current_user: dict = Depends(get_current_principal)
+):
     """
-    # Definir período (últimos 30 dias para cards, últimos 12 meses para gráficos)
-    today = datetime.now()
-    thirty_days_ago = today - timedelta(days=30)
-    one_year_ago = today - timedelta(days=365)
+    Retorna um único painel do dashboard: cards, leads_evolution, breakdown
+    (origem e status) ou commissions
     
+    Cada painel tem cache e ETag próprios, então a página carrega os painéis
+    em paralelo e um painel lento não atrasa os demais. Se o cálculo falhar,
+    responde 503 apenas para este painel.
+    """
     try:
-        # --- Cálculos para os Cards (últimos 30 dias) ---
-        total_leads = db.query(func.count(Lead.id)).filter(
-            Lead.created_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        qualified_leads = db.query(func.count(Lead.id)).filter(
-            and_(
-                Lead.created_at >= thirty_days_ago,
-                Lead.status.in_(["qualificado", "proposta", "fechado"])
-            )
-        ).scalar() or 0
-        
-        converted_leads = db.query(func.count(Lead.id)).filter(
-            and_(
-                Lead.created_at >= thirty_days_ago,
-                Lead.status == "fechado"
-            )
-        ).scalar() or 0
-        
-        qualified_rate = round((qualified_leads / total_leads * 100), 1) if total_leads > 0 else 0
-        conversion_rate = round((converted_leads / total_leads * 100), 1) if total_leads > 0 else 0
-        
-        average_ticket = 3000
-        estimated_revenue = converted_leads * average_ticket
-        
-        # --- Dados para Gráficos (últimos 12 meses) ---
-        
-        # 1. Evolução de Leads por Mês
-        leads_monthly_data = db.query(
-            extract('year', Lead.created_at).label('year'),
-            extract('month', Lead.created_at).label('month'),
-            func.count(Lead.id).label('count')
-        ).filter(
-            Lead.created_at >= one_year_ago
-        ).group_by('year', 'month').order_by('year', 'month').all()
-        
-        leads_evolution_labels = []
-        leads_evolution_values = []
-        month_map = {}
-        for i in range(12):
-            dt = today - timedelta(days=(11-i)*30) # Aproximação para garantir 12 meses
-            month_key = (dt.year, dt.month)
-            month_map[month_key] = 0
-            leads_evolution_labels.append(dt.strftime("%b/%y"))
-            
-        for year, month, count in leads_monthly_data:
-            if (year, month) in month_map:
-                 month_map[(year, month)] = count
-                 
-        leads_evolution_values = [month_map.get((datetime.strptime(label, "%b/%y").year, datetime.strptime(label, "%b/%y").month), 0) for label in leads_evolution_labels]
-        # Ajuste final para garantir 12 valores
-        if len(leads_evolution_values) < 12:
-             leads_evolution_values.extend([0] * (12 - len(leads_evolution_values)))
-        leads_evolution_values = leads_evolution_values[-12:]
-        leads_evolution_labels = leads_evolution_labels[-12:]
-
-        # 2. Conversão por Origem (Total)
-        sources_data = db.query(
-            Lead.source, func.count(Lead.id).label('count')
-        ).group_by(Lead.source).order_by(desc('count')).all()
-        
-        conversion_source_labels = [s[0] for s in sources_data if s[0]]
-        conversion_source_values = [s[1] for s in sources_data if s[0]]
-        # Limitar a 5 fontes principais + 'Outros'
-        if len(conversion_source_labels) > 5:
-            other_count = sum(conversion_source_values[5:])
-            conversion_source_labels = conversion_source_labels[:5] + ["Outros"]
-            conversion_source_values = conversion_source_values[:5] + [other_count]
-            
-        # Cores para o gráfico de pizza/doughnut
-        pie_colors = ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#34495e"]
-
-        # 3. Status dos Leads (Total)
-        statuses_data = db.query(
-            Lead.status, func.count(Lead.id).label('count')
-        ).group_by(Lead.status).order_by(desc('count')).all()
-        
-        lead_status_labels = [s[0] for s in statuses_data if s[0]]
-        lead_status_values = [s[1] for s in statuses_data if s[0]]
-        
-        # 4. Comissões ao Longo do Tempo (últimos 12 meses)
-        # Assumindo que LeadPurchase.amount representa o valor da comissão e created_at a data
-        # Se houver um modelo Commission, usar esse modelo.
-        commissions_monthly_data = db.query(
-            extract('year', LeadPurchase.created_at).label('year'),
-            extract('month', LeadPurchase.created_at).label('month'),
-            func.sum(LeadPurchase.amount).label('total_amount')
-        ).filter(
-            LeadPurchase.created_at >= one_year_ago,
-            LeadPurchase.status == 'aprovado' # Considerar apenas comissões aprovadas/pagas
-        ).group_by('year', 'month').order_by('year', 'month').all()
-        
-        commissions_evolution_labels = []
-        commissions_evolution_values = []
-        commissions_month_map = {}
-        for i in range(12):
-            dt = today - timedelta(days=(11-i)*30)
-            month_key = (dt.year, dt.month)
-            commissions_month_map[month_key] = 0
-            commissions_evolution_labels.append(dt.strftime("%b/%y"))
-            
-        for year, month, total_amount in commissions_monthly_data:
-             if (year, month) in commissions_month_map:
-                 commissions_month_map[(year, month)] = total_amount or 0
-                 
-        commissions_evolution_values = [commissions_month_map.get((datetime.strptime(label, "%b/%y").year, datetime.strptime(label, "%b/%y").month), 0) for label in commissions_evolution_labels]
-        # Ajuste final para garantir 12 valores
-        if len(commissions_evolution_values) < 12:
-             commissions_evolution_values.extend([0] * (12 - len(commissions_evolution_values)))
-        commissions_evolution_values = commissions_evolution_values[-12:]
-        commissions_evolution_labels = commissions_evolution_labels[-12:]
-
-        # Montar resposta
-        return {
-            "total_leads": total_leads,
-            "qualified_leads": qualified_leads,
-            "qualified_rate": qualified_rate,
-            "converted_leads": converted_leads,
-            "conversion_rate": conversion_rate,
-            "estimated_revenue": f"{estimated_revenue:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-            "average_ticket": f"{average_ticket:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-            "leads_evolution_data": {
-                "labels": leads_evolution_labels,
-                "datasets": [{
-                    "label": "Leads",
-                    "data": leads_evolution_values,
-                    "backgroundColor": "#2196F3",
-                    "borderColor": "#2196F3",
-                    "tension": 0.1
-                }]
-            },
-            "conversion_by_source_data": {
-                "labels": conversion_source_labels,
-                "datasets": [{
-                    "label": "Origem",
-                    "data": conversion_source_values,
-                    "backgroundColor": pie_colors[:len(conversion_source_labels)]
-                }]
-            },
-            "lead_status_data": {
-                "labels": lead_status_labels,
-                "datasets": [{
-                    "label": "Status",
-                    "data": lead_status_values,
-                    "backgroundColor": pie_colors[:len(lead_status_labels)] # Reutilizar cores
-                }]
-            },
-            "commissions_evolution_data": {
-                "labels": commissions_evolution_labels,
-                "datasets": [{
-                    "label": "Comissões (R$)",
-                    "data": commissions_evolution_values,
-                    "backgroundColor": "#2ecc71", # Verde para comissões
-                    "borderColor": "#2ecc71",
-                    "tension": 0.1
-                }]
-            }
-        }
+        stats, etag, age = load_dashboard_panel(db, current_user, panel, start_date, end_date, granularity)
+    except (NotFoundError, ValidationError):
+        raise
     except Exception as e:
-        # Em produção, registrar o erro em um sistema de log
-        print(f"Erro ao obter estatísticas do dashboard: {e}")
+        logger.error("Erro ao calcular painel do dashboard", {"panel": panel, "error": str(e)})
+        raise ServiceUnavailableError(message="Painel temporariamente indisponível", retry_after=5, details={"panel": panel})
+    return conditional_response(request, stats, etag, age)
+
+
+def stats_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Chaves de `current` cujo valor difere de `previous`"""
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+class DashboardFeed:
+    """
+    Recalcula as estatísticas uma vez por alteração e envia as diferenças
+    a todos os assinantes do stream deste worker
+    
+    Cada assinante recebe um evento "snapshot" com o estado completo ao
+    conectar e depois eventos "delta" só com as chaves alteradas. O cálculo
+    roda enquanto houver assinantes, uma vez por perfil, e o resultado
+    também abastece o cache usado por /stats. Além das alterações avisadas
+    neste worker, as estatísticas são recalculadas a cada refresh_seconds,
+    para refletir as escritas dos outros workers.
+    """
+    def __init__(self, broadcaster: EventBroadcaster, debounce_seconds: float, refresh_seconds: float = 0):
+        self.broadcaster = broadcaster
+        self.debounce_seconds = debounce_seconds
+        self.refresh_seconds = refresh_seconds
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # perfil -> último snapshot enviado (base dos deltas)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self.computations = 0
+    
+    def notify(self):
+        """Sinaliza alteração dos agregados (chamado de qualquer thread após o commit)"""
+        loop, changed = self._loop, self._changed
+        if loop is None or changed is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(changed.set)
+        except RuntimeError:
+            # Event loop encerrado entre a verificação e a chamada
+            pass
+    
+    def _compute(self, scope: str, generation: int) -> Dict[str, Any]:
+        period = get_series_period(None, None, "month")
+        if DASHBOARD_PARALLEL_PANELS:
+            computed = _run_panels({
+                panel: partial(compute_panel, panel, None, period) for panel in DASHBOARD_PANELS
+            })
+        else:
+            computed = {}
+            for panel in DASHBOARD_PANELS:
+                try:
+                    computed[panel] = compute_panel(panel, None, period)
+                except Exception as e:
+                    computed[panel] = e
+        outcomes: Dict[str, Any] = {}
+        for panel, result in computed.items():
+            if isinstance(result, Exception):
+                # O painel fica fora do delta até voltar a ser calculado
+                outcomes[panel] = result
+                continue
+            snapshot = _dashboard_snapshot(result)
+            dashboard_cache.put(_panel_key(scope, panel, period), snapshot, generation)
+            outcomes[panel] = (snapshot, 0.0)
+        stats, etag, _ = _merge_panels(outcomes)
+        self.computations += 1
+        return {"stats": stats, "etag": etag, "computed_at": stats.pop("computed_at")}
+    
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+    
+    async def subscribe(self, current_user):
+        """
+        Registra um assinante e retorna (assinante, evento snapshot inicial)
         
-        # Retornar dados de exemplo para desenvolvimento
-        # Gerar 12 meses de exemplo
-        example_labels = [(today - timedelta(days=(11-i)*30)).strftime("%b/%y") for i in range(12)]
+        Raises:
+            ServiceUnavailableError: Se o worker atingiu o limite de conexões
+        """
+        scope = get_dashboard_scope(current_user)
+        if scope not in self.broadcaster.groups():
+            # Sem assinantes o perfil deixou de ser recalculado: o último snapshot está velho
+            self._last.pop(scope, None)
+        subscriber = self.broadcaster.subscribe(scope)
+        try:
+            self._ensure_running()
+            snapshot = self._last.get(scope)
+            if snapshot is None:
+                snapshot = await asyncio.to_thread(self._compute, scope, dashboard_cache.generation)
+                snapshot = self._last.setdefault(scope, snapshot)
+        except BaseException:
+            self.broadcaster.unsubscribe(subscriber)
+            raise
+        return subscriber, format_sse("snapshot", self._event_data(snapshot))
+    
+    @staticmethod
+    def _event_data(snapshot: Dict[str, Any], stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         return {
-            "total_leads": 124,
-            "qualified_leads": 78,
-            "qualified_rate": 62.9,
-            "converted_leads": 42,
-            "conversion_rate": 33.8,
-            "estimated_revenue": "126.000,00",
-            "average_ticket": "3.000,00",
-            "leads_evolution_data": {
-                "labels": example_labels,
-                "datasets": [{
-                    "label": "Leads",
-                    "data": [random.randint(50, 150) for _ in range(12)],
-                    "backgroundColor": "#2196F3",
-                    "borderColor": "#2196F3",
-                    "tension": 0.1
-                }]
-            },
-            "conversion_by_source_data": {
-                "labels": ["Facebook", "Google", "Instagram", "Indicação", "Site", "Outros"],
-                "datasets": [{
-                    "label": "Origem",
-                    "data": [35, 45, 25, 20, 15, 10],
-                    "backgroundColor": ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#34495e"]
-                }]
-            },
-            "lead_status_data": {
-                "labels": ["Novo", "Contato", "Qualificado", "Proposta", "Fechado", "Perdido"],
-                "datasets": [{
-                    "label": "Status",
-                    "data": [30, 25, 20, 15, 10, 5],
-                    "backgroundColor": ["#3498db", "#2ecc71", "#f39c12", "#9b59b6", "#2c3e50", "#e74c3c"]
-                }]
-            },
-            "commissions_evolution_data": {
-                 "labels": example_labels,
-                 "datasets": [{
-                     "label": "Comissões (R$)",
-                     "data": [random.randint(1000, 5000) for _ in range(12)],
-                     "backgroundColor": "#2ecc71",
-                     "borderColor": "#2ecc71",
-                     "tension": 0.1
-                 }]
-            }
+            **(snapshot["stats"] if stats is None else stats),
+            "etag": snapshot["etag"],
+            "computed_at": snapshot["computed_at"],
         }
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        refreshed_at = loop.time()
+        try:
+            while self.broadcaster.connections:
+                timeout = self.broadcaster.heartbeat_seconds
+                if self.refresh_seconds > 0:
+                    timeout = min(timeout, max(refreshed_at + self.refresh_seconds - loop.time(), 0))
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                    # Agrupa escritas em sequência num único recálculo
+                    await asyncio.sleep(self.debounce_seconds)
+                except asyncio.TimeoutError:
+                    if self.refresh_seconds <= 0 or loop.time() - refreshed_at < self.refresh_seconds:
+                        continue
+                self._changed.clear()
+                refreshed_at = loop.time()
+                generation = dashboard_cache.generation
+                for scope in self.broadcaster.groups():
+                    try:
+                        snapshot = await asyncio.to_thread(self._compute, scope, generation)
+                    except Exception as e:
+                        logger.error("Falha ao recalcular estatísticas do stream", {"scope": scope, "error": str(e)})
+                        continue
+                    previous = self._last.get(scope)
+                    self._last[scope] = snapshot
+                    if previous is None or previous["stats"] == snapshot["stats"]:
+                        continue
+                    delta = stats_delta(previous["stats"], snapshot["stats"])
+                    self.broadcaster.publish(
+                        scope,
+                        format_sse("delta", self._event_data(snapshot, delta)),
+                        resync_message=format_sse("snapshot", self._event_data(snapshot))
+                    )
+        finally:
+            # Sem assinantes, a base dos deltas deixa de ser mantida
+            self._last.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Retorna conexões e recálculos do stream"""
+        return {**self.broadcaster.stats(), "computations": self.computations}
+
+
+dashboard_feed = DashboardFeed(
+    EventBroadcaster(
+        "dashboard",
+        max_connections=DASHBOARD_STREAM_MAX_CONNECTIONS,
+        heartbeat_seconds=DASHBOARD_STREAM_HEARTBEAT_SECONDS
+    ),
+    debounce_seconds=DASHBOARD_STREAM_DEBOUNCE_SECONDS,
+    refresh_seconds=DASHBOARD_STREAM_REFRESH_SECONDS
+)
+add_change_listener(dashboard_feed.notify)
+
+
+@router.get("/stream")
+async def stream_dashboard_stats(
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: dict = Depends(get_current_principal)
+):
+    """
+    Stream SSE das estatísticas do dashboard (período padrão dos gráficos)
+    
+    Envia "snapshot" com o estado completo ao conectar e "delta" com as
+    chaves alteradas após cada escrita de leads ou compras (as feitas em
+    outros workers aparecem no recálculo periódico). Responde 503
+    com Retry-After quando o worker atinge o limite de conexões.
+    """
+    # A sessão da autenticação não fica presa durante o stream
+    await db.close()
+    subscriber, initial = await dashboard_feed.subscribe(current_user)
+    return StreamingResponse(
+        dashboard_feed.broadcaster.events(subscriber, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Cores para os gráficos de pizza/doughnut
+PIE_COLORS = ["#3498db", "#2ecc71", "#e74c3c", "#f39c12", "#9b59b6", "#34495e"]
 
+
+def _format_brl(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def compute_cards_panel(db: Session, start_date: date, end_date: date, granularity: str) -> Dict[str, Any]:
+    """Cards do dashboard (últimos 30 dias, em uma única leitura); ignora o período dos gráficos"""
+    thirty_days_ago = datetime.now() - timedelta(days=30)
+    total_leads, qualified_leads, converted_leads = get_card_counts(db, thirty_days_ago)
+    
+    qualified_rate = round((qualified_leads / total_leads * 100), 1) if total_leads > 0 else 0
+    conversion_rate = round((converted_leads / total_leads * 100), 1) if total_leads > 0 else 0
+    
+    average_ticket = 3000
+    estimated_revenue = converted_leads * average_ticket
+    return {
+        "total_leads": total_leads,
+        "qualified_leads": qualified_leads,
+        "qualified_rate": qualified_rate,
+        "converted_leads": converted_leads,
+        "conversion_rate": conversion_rate,
+        "estimated_revenue": _format_brl(estimated_revenue),
+        "average_ticket": _format_brl(average_ticket),
+    }
+
+
+def compute_leads_evolution_panel(db: Session, start_date: date, end_date: date, granularity: str) -> Dict[str, Any]:
+    """Evolução de leads no período (agregado diário, uma consulta agrupada por intervalo)"""
+    leads_series = bucket_totals(
+        db, LeadDailyStat.day, [func.sum(LeadDailyStat.lead_count)],
+        start_date, end_date, granularity
+    )
+    return {
+        "leads_evolution_data": {
+            "labels": [bucket_label(day, granularity) for day, _ in leads_series],
+            "datasets": [{
+                "label": "Leads",
+                "data": [int(count) for _, (count,) in leads_series],
+                "backgroundColor": "#2196F3",
+                "borderColor": "#2196F3",
+                "tension": 0.1
+            }]
+        }
+    }
+
+
+def compute_breakdown_panel(db: Session, start_date: date, end_date: date, granularity: str) -> Dict[str, Any]:
+    """Conversão por origem e status dos leads (totais), do mesmo GROUP BY (source, status)"""
+    sources_data, statuses_data = get_source_status_breakdown(db)
+    
+    conversion_source_labels = [s[0] for s in sources_data if s[0]]
+    conversion_source_values = [s[1] for s in sources_data if s[0]]
+    # Limitar a 5 fontes principais + 'Outros'
+    if len(conversion_source_labels) > 5:
+        other_count = sum(conversion_source_values[5:])
+        conversion_source_labels = conversion_source_labels[:5] + ["Outros"]
+        conversion_source_values = conversion_source_values[:5] + [other_count]
+    
+    lead_status_labels = [s[0] for s in statuses_data if s[0]]
+    lead_status_values = [s[1] for s in statuses_data if s[0]]
+    return {
+        "conversion_by_source_data": {
+            "labels": conversion_source_labels,
+            "datasets": [{
+                "label": "Origem",
+                "data": conversion_source_values,
+                "backgroundColor": PIE_COLORS[:len(conversion_source_labels)]
+            }]
+        },
+        "lead_status_data": {
+            "labels": lead_status_labels,
+            "datasets": [{
+                "label": "Status",
+                "data": lead_status_values,
+                "backgroundColor": PIE_COLORS[:len(lead_status_labels)] # Reutilizar cores
+            }]
+        },
+    }
+
+
+def compute_commissions_panel(db: Session, start_date: date, end_date: date, granularity: str) -> Dict[str, Any]:
+    """Comissões aprovadas no período, nos mesmos intervalos da evolução de leads"""
+    # Assumindo que LeadPurchase.amount representa o valor da comissão e created_at a data
+    # Se houver um modelo Commission, usar esse modelo.
+    commissions_series = bucket_totals(
+        db, PurchaseDailyStat.day, [func.sum(PurchaseDailyStat.amount)],
+        start_date, end_date, granularity,
+        PurchaseDailyStat.status == 'aprovado' # Considerar apenas comissões aprovadas/pagas
+    )
+    return {
+        "commissions_evolution_data": {
+            "labels": [bucket_label(day, granularity) for day, _ in commissions_series],
+            "datasets": [{
+                "label": "Comissões (R$)",
+                "data": [float(amount) for _, (amount,) in commissions_series],
+                "backgroundColor": "#2ecc71", # Verde para comissões
+                "borderColor": "#2ecc71",
+                "tension": 0.1
+            }]
+        }
+    }
+
+
+# Painéis do dashboard, carregados e guardados em cache separadamente
+DASHBOARD_PANELS = {
+    "cards": compute_cards_panel,
+    "leads_evolution": compute_leads_evolution_panel,
+    "breakdown": compute_breakdown_panel,
+    "commissions": compute_commissions_panel,
+}
+# Painéis que dependem do período e da granularidade escolhidos
+SERIES_PANELS = {"leads_evolution", "commissions"}
+
+
+def compute_dashboard_stats(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    granularity: str = "month"
+) -> Dict[str, Any]:
+    """
+    Calcula as estatísticas do dashboard a partir dos agregados diários
+    (últimos 30 dias para cards, período escolhido para os gráficos de evolução)
+    """
+    stats: Dict[str, Any] = {}
+    for compute in DASHBOARD_PANELS.values():
+        stats.update(compute(db, start_date, end_date, granularity))
+    return stats
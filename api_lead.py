@@ -6,27 +6,42 @@ Este módulo define as rotas da API para operações CRUD de leads,
 incluindo criação, leitura, atualização e exclusão.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import os
+import queue
+
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Query, Request, Response
+from pydantic import ValidationError as PydanticValidationError
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 # Importar funções CRUD
 from crud_lead import (
     create_lead as crud_create_lead,
-    get_leads as crud_get_leads,
+    create_leads_bulk as crud_create_leads_bulk,
+    get_leads_page as crud_get_leads_page,
     get_lead as crud_get_lead,
     update_lead as crud_update_lead,
     delete_lead as crud_delete_lead
 )
 
 # Importar schemas e dependências
-from schemas_lead import Lead as LeadSchema, LeadCreate, LeadUpdate
-from database import get_db
-from core_security import get_current_active_user
+from schemas_lead import (
+    Lead as LeadSchema, LeadBulkItemResult, LeadBulkResponse, LeadCreate, LeadImportJob, LeadUpdate
+)
+from database import get_db, get_read_db
+import lead_import
+from error_handlers import AuthorizationError, ServiceUnavailableError, ValidationError
+from lead_search import search_leads
+from pagination import set_next_cursor
+from core_security import get_current_active_user, get_current_principal
 
 # Criar router com prefixo
 router = APIRouter(prefix="/leads")
 
+# Máximo de itens por requisição em POST /leads/bulk
+BULK_LEAD_MAX_ITEMS = int(os.getenv("BULK_LEAD_MAX_ITEMS", "5000"))
+
 
 @router.post("/", response_model=LeadSchema, status_code=status.HTTP_201_CREATED)
 def create_lead(
@@ -45,58 +60,246 @@ def create_lead(
     Returns:
         O lead criado
     """
-    # Adicionar o ID do usuário atual como criador do lead
-    return crud_create_lead(db=db, lead=lead_in, created_by_id=current_user.id)
+    # Adicionar o ID do usuário atual como criador do lead; o lead criado por
+    # um usuário comum fica sob sua responsabilidade, senão ele não o enxergaria
+    assigned_to_id = None if current_user.is_superuser else current_user.id
+    return crud_create_lead(db=db, lead=lead_in, created_by_id=current_user.id, assigned_to_id=assigned_to_id)
+
+
+@router.post("/bulk", response_model=LeadBulkResponse)
+def create_leads_bulk(
+    items: List[Dict[str, Any]] = Body(..., max_length=BULK_LEAD_MAX_ITEMS),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Cria vários leads em uma única transação
+    
+    Cada item é validado separadamente: os válidos são inseridos em lotes
+    (INSERT multi-linha, BULK_LEAD_BATCH_SIZE por lote) e os inválidos são
+    devolvidos com os erros de cada campo, sem impedir os demais.
+    
+    Args:
+        items: Leads a criar, no formato de LeadCreate
+        db: Sessão do banco de dados
+        current_user: Usuário autenticado que está criando os leads
+        
+    Returns:
+        Totais e o resultado de cada item, na ordem enviada
+    """
+    results: List[LeadBulkItemResult] = []
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, LeadCreate.model_validate(item)))
+        except PydanticValidationError as e:
+            errors = {".".join(str(loc) for loc in error["loc"]): error["msg"] for error in e.errors()}
+            results.append(LeadBulkItemResult(index=index, status="invalid", errors=errors))
+    
+    # Como em create_lead, os leads de um usuário comum ficam sob sua responsabilidade
+    assigned_to_id = None if current_user.is_superuser else current_user.id
+    created = crud_create_leads_bulk(
+        db, [lead for _, lead in valid], created_by_id=current_user.id, assigned_to_id=assigned_to_id
+    )
+    results.extend(
+        LeadBulkItemResult(index=index, status="created", id=lead_id)
+        for (index, _), lead_id in zip(valid, created)
+    )
+    results.sort(key=lambda result: result.index)
+    return LeadBulkResponse(created=len(created), failed=len(items) - len(created), results=results)
+
+
+@router.post("/import/jobs", response_model=LeadImportJob, status_code=status.HTTP_201_CREATED)
+def create_lead_import(
+    format: str = Query(..., description="Formato do arquivo: csv ou ndjson"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Cria um job de importação de leads
+    
+    O arquivo é enviado depois, em PUT /leads/import/jobs/{job_id}; com o
+    id em mãos, o andamento pode ser acompanhado em GET durante o envio.
+    
+    Raises:
+        ValidationError: Se o formato não for suportado
+    """
+    # Como em create_lead, os leads de um usuário comum ficam sob sua responsabilidade
+    assigned_to_id = None if current_user.is_superuser else current_user.id
+    return lead_import.create_job(format, created_by_id=current_user.id, assigned_to_id=assigned_to_id).to_dict()
+
+
+def _get_own_import_job(job_id: str, current_user) -> "lead_import.ImportJob":
+    job = lead_import.get_job(job_id)
+    if not current_user.is_superuser and job.created_by_id != current_user.id:
+        raise AuthorizationError("Sem permissão para acessar esta importação")
+    return job
+
+
+@router.put("/import/jobs/{job_id}", response_model=LeadImportJob)
+async def upload_lead_import(
+    job_id: str,
+    request: Request,
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Recebe o arquivo de um job de importação e grava os leads em blocos
+    
+    O corpo (CSV ou NDJSON, conforme o job) é lido em pedaços e processado
+    num pool próprio à medida que chega, com memória constante. A resposta traz
+    o resultado final; linhas inválidas são listadas sem interromper a
+    importação.
+    
+    Args:
+        job_id: Job criado em POST /leads/import/jobs
+        request: Requisição com o arquivo no corpo
+        current_user: Usuário autenticado (dono do job)
+        
+    Returns:
+        O job concluído (ou com falha)
+        
+    Raises:
+        NotFoundError: Se o job não existir
+        AuthorizationError: Se o job for de outro usuário
+        ValidationError: Se o job já tiver recebido um arquivo
+        ServiceUnavailableError: Se o worker já estiver com LEAD_IMPORT_MAX_CONCURRENT importações
+    """
+    job = await asyncio.to_thread(_get_own_import_job, job_id, current_user)
+    if not lead_import.import_slots.acquire(blocking=False):
+        raise ServiceUnavailableError(
+            message="Muitas importações em andamento; tente novamente em instantes",
+            retry_after=5,
+            details={"max_concurrent": lead_import.IMPORT_MAX_CONCURRENT}
+        )
+    try:
+        await asyncio.to_thread(lead_import.start_job, job)
+        
+        chunks: "queue.Queue" = queue.Queue(maxsize=lead_import.IMPORT_QUEUE_CHUNKS)
+        worker = asyncio.get_running_loop().run_in_executor(
+            lead_import.import_executor, lead_import.run_import, job, lead_import.iter_queue(chunks)
+        )
+        received = False
+        try:
+            async for data in request.stream():
+                if data:
+                    # Com a fila cheia, espera a thread consumir (contrapressão)
+                    await asyncio.to_thread(chunks.put, data)
+            received = True
+        finally:
+            # Corpo interrompido (ex.: ClientDisconnect): o job termina como falho
+            await asyncio.to_thread(chunks.put, None if received else lead_import.ABORTED)
+            await worker
+    finally:
+        lead_import.import_slots.release()
+    return job.to_dict()
+
+
+@router.get("/import/jobs/{job_id}", response_model=LeadImportJob)
+def get_lead_import(
+    job_id: str,
+    current_user = Depends(get_current_principal)
+):
+    """
+    Retorna o andamento de uma importação (linhas lidas, criadas e inválidas)
+    
+    Raises:
+        NotFoundError: Se o job não existir ou tiver expirado
+        AuthorizationError: Se o job for de outro usuário
+    """
+    return _get_own_import_job(job_id, current_user).to_dict()
 
 
 @router.get("/", response_model=List[LeadSchema])
 def read_leads(
-    skip: int = Query(0, ge=0, description="Número de registros para pular (paginação)"),
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor da resposta anterior)"),
+    skip: int = Query(0, ge=0, description="Número de registros para pular (paginação legada; ignorado com cursor)"),
     limit: int = Query(100, ge=1, le=200, description="Número máximo de registros a retornar"),
     assigned_to_id: Optional[int] = Query(None, description="Filtrar leads por ID do usuário responsável"),
     status: Optional[str] = Query(None, description="Filtrar leads por status"),
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_active_user)
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_principal)
 ):
     """
     Recupera uma lista de leads com opções de filtragem e paginação
     
+    Os leads vêm do mais recente para o mais antigo. Quando há mais
+    registros, o cursor da próxima página é enviado no cabeçalho
+    X-Next-Cursor (e em Link, rel="next"); basta repeti-lo em `cursor`.
+    
     Args:
-        skip: Número de registros para pular (paginação)
+        request: Requisição (base do link da próxima página)
+        response: Resposta (recebe os cabeçalhos de paginação)
+        cursor: Cursor opaco da próxima página
+        skip: Número de registros para pular (paginação legada)
         limit: Número máximo de registros a retornar
         assigned_to_id: ID do usuário responsável para filtrar
         status: Status do lead para filtrar
-        db: Sessão do banco de dados
+        db: Sessão somente leitura do banco de dados
         current_user: Usuário autenticado
         
     Returns:
         Lista de leads que correspondem aos critérios de filtragem
+        
+    Raises:
+        ValidationError: Se o cursor for inválido
     """
     # Se não for admin, mostrar apenas leads atribuídos ao usuário
     if not current_user.is_superuser and assigned_to_id is None:
         assigned_to_id = current_user.id
         
-    return crud_get_leads(
+    leads, next_cursor = crud_get_leads_page(
         db, 
         skip=skip, 
         limit=limit, 
         assigned_to_id=assigned_to_id,
-        status=status
+        status=status,
+        cursor=cursor
     )
+    set_next_cursor(request, response, next_cursor)
+    return leads
+
+
+# Declarada antes de /{lead_id} para que "search" não seja lido como ID
+@router.get("/search", response_model=List[LeadSchema])
+def search_leads_endpoint(
+    q: str = Query(..., min_length=3, max_length=200, description="Trechos de nome, email ou telefone"),
+    limit: int = Query(20, ge=1, le=100, description="Número máximo de resultados"),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_principal)
+):
+    """
+    Busca leads por trechos de nome, email ou telefone, usando o índice textual
+    
+    Args:
+        q: Texto da busca; cada termo com pelo menos 3 caracteres
+        limit: Número máximo de resultados
+        db: Sessão somente leitura do banco de dados
+        current_user: Usuário autenticado
+        
+    Returns:
+        Leads que contêm todos os termos, do mais relevante para o menos
+        
+    Raises:
+        ValidationError: Se nenhum termo tiver o tamanho mínimo
+    """
+    # Se não for admin, buscar apenas entre os leads atribuídos ao usuário
+    assigned_to_id = None if current_user.is_superuser else current_user.id
+    return search_leads(db, q, limit=limit, assigned_to_id=assigned_to_id)
 
 
 @router.get("/{lead_id}", response_model=LeadSchema)
 def read_lead(
     lead_id: int,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_active_user)
+    db: Session = Depends(get_read_db),
+    current_user = Depends(get_current_principal)
 ):
     """
     Recupera um lead específico pelo ID
     
     Args:
         lead_id: ID do lead a ser recuperado
-        db: Sessão do banco de dados
+        db: Sessão somente leitura do banco de dados
         current_user: Usuário autenticado
         
     Returns:
@@ -1,15 +1,27 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query, HTTPException, Path, Body
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, date
 from pydantic import BaseModel, Field
-from database import get_db
+from database import get_db, get_read_db
 from models_plans import Plan, Client, LeadUsage, LeadPurchase
+from models_rollups import PurchaseDailyStat
+from rollups import purchase_rollup_entry, record_purchase_change
+from schemas_plans import PlanInDB
+from cache import TTLCache
+from time_buckets import bucket_label, bucket_totals, months_back
 import sqlalchemy as sa
+import os
 
 router = APIRouter(prefix="/leads", tags=["leads"])
 admin_router = APIRouter(prefix="/admin", tags=["admin"])
 
+# Cache de planos por worker (planos mudam raramente)
+# Alterações feitas neste worker invalidam o cache no commit; nos demais, valem após o TTL
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "300"))
+plan_cache = TTLCache("plans", maxsize=256, ttl=PLAN_CACHE_TTL)
+
 # Modelos Pydantic para API
 class LeadUsageResponse(BaseModel):
     """Modelo Pydantic para resposta de uso de leads"""
@@ -42,6 +54,21 @@ class FinancialReportResponse(BaseModel):
     total_leads_sold: int
     purchases_by_status: dict
     revenue_by_client: List[dict]
+    revenue_by_period: Optional[List[dict]] = None
+
+class LeadUsagePoint(BaseModel):
+    """Modelo Pydantic para um intervalo do histórico de uso de leads"""
+    period_start: date
+    label: str
+    total_consumed: int
+
+class LeadUsageHistoryResponse(BaseModel):
+    """Modelo Pydantic para resposta do histórico de uso de leads"""
+    client_id: int
+    granularity: str
+    start_date: date
+    end_date: date
+    points: List[LeadUsagePoint]
 
 # Função auxiliar para obter cliente pelo ID
 def get_client_by_id(db: Session, client_id: int):
@@ -51,6 +78,58 @@ def get_client_by_id(db: Session, client_id: int):
         raise HTTPException(status_code=404, detail="Cliente não encontrado")
     return client
 
+# Funções auxiliares para o cache de planos
+def invalidate_plan_cache(plan_id: Optional[int] = None):
+    """Remove um plano do cache (ou todos, se plan_id não for informado)"""
+    if plan_id is None:
+        plan_cache.clear()
+    else:
+        plan_cache.invalidate(plan_id)
+
+@sa.event.listens_for(Plan, "after_insert")
+@sa.event.listens_for(Plan, "after_update")
+@sa.event.listens_for(Plan, "after_delete")
+def _mark_changed_plan(mapper, connection, target):
+    """Anota na sessão os planos criados, editados ou removidos pelo ORM"""
+    session = sa.orm.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_plan_ids", set()).add(target.id)
+
+@sa.event.listens_for(Session, "after_commit")
+def _invalidate_changed_plans(session):
+    """Invalida o cache dos planos alterados só depois do commit (leitores concorrentes não recarregam a versão antiga)"""
+    for plan_id in session.info.pop("changed_plan_ids", ()):
+        invalidate_plan_cache(plan_id)
+
+@sa.event.listens_for(Session, "after_rollback")
+def _discard_changed_plans(session):
+    session.info.pop("changed_plan_ids", None)
+
+def get_plan(db: Session, plan_id: Optional[int]) -> Optional[PlanInDB]:
+    """Obtém um plano pelo ID a partir do cache, recarregando todos os planos em caso de falta"""
+    if plan_id is None:
+        return None
+    plan = plan_cache.get(plan_id)
+    if plan is None:
+        # Planos são poucos: uma única consulta aquece o cache para todos os clientes
+        plans = {row.id: PlanInDB.model_validate(row) for row in db.query(Plan).all()}
+        for cached_id, cached_plan in plans.items():
+            plan_cache.set(cached_id, cached_plan)
+        plan = plans.get(plan_id)
+    return plan
+
+def get_client_with_plan(db: Session, client_id: int):
+    """
+    Obtém um cliente e seu plano sem o carregamento tardio de `client.plan`
+
+    A consulta do cliente é a única ida ao banco quando o plano está em cache.
+    """
+    client = get_client_by_id(db, client_id)
+    plan = get_plan(db, client.plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plano do cliente não encontrado")
+    return client, plan
+
 # Função auxiliar para obter ou criar registro de uso de leads
 def get_or_create_lead_usage(db: Session, client_id: int, usage_date: date = None):
     """Obtém ou cria um registro de uso de leads para o cliente na data especificada"""
@@ -71,7 +150,15 @@ def get_or_create_lead_usage(db: Session, client_id: int, usage_date: date = Non
             total_consumed=0
         )
         db.add(lead_usage)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Outra requisição criou o registro do dia (índice único client_id + date)
+            db.rollback()
+            return db.query(LeadUsage).filter(
+                LeadUsage.client_id == client_id,
+                LeadUsage.date == usage_date
+            ).one()
         db.refresh(lead_usage)
     
     return lead_usage
@@ -93,11 +180,8 @@ def get_lead_usage(
     Returns:
         LeadUsageResponse: Informações de uso de leads
     """
-    # Obter cliente e verificar se existe
-    client = get_client_by_id(db, client_id)
-    
-    # Obter plano do cliente
-    plan = client.plan
+    # Obter cliente e plano (plano vindo do cache)
+    client, plan = get_client_with_plan(db, client_id)
     
     # Obter ou criar registro de uso para hoje
     today = date.today()
@@ -130,6 +214,55 @@ def get_lead_usage(
         extra_leads_available=extra_leads_available
     )
 
+# Rota para o histórico de uso de leads
+@router.get("/usage/history", response_model=LeadUsageHistoryResponse,
+           summary="Histórico de uso de leads",
+           description="Retorna o consumo de leads do cliente por dia, semana ou mês")
+def get_lead_usage_history(
+    client_id: int = Query(..., description="ID do cliente"),
+    start_date: Optional[date] = Query(None, description="Data inicial (padrão: últimos 12 meses)"),
+    end_date: Optional[date] = Query(None, description="Data final (padrão: hoje)"),
+    granularity: str = Query("month", description="Intervalo: day, week ou month"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retorna o consumo de leads do cliente por intervalo, com zero nos
+    intervalos sem uso.
+    
+    Args:
+        client_id: ID do cliente
+        start_date: Data inicial do período
+        end_date: Data final do período
+        granularity: Intervalo da série (day, week ou month)
+        db: Sessão somente leitura do banco de dados
+        
+    Returns:
+        LeadUsageHistoryResponse: Série de consumo do cliente
+    """
+    get_client_by_id(db, client_id)
+    
+    end_date = end_date or date.today()
+    start_date = start_date or months_back(end_date, 12)
+    try:
+        series = bucket_totals(
+            db, LeadUsage.date, [sa.func.sum(LeadUsage.total_consumed)],
+            start_date, end_date, granularity,
+            LeadUsage.client_id == client_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    return LeadUsageHistoryResponse(
+        client_id=client_id,
+        granularity=granularity,
+        start_date=start_date,
+        end_date=end_date,
+        points=[
+            LeadUsagePoint(period_start=day, label=bucket_label(day, granularity), total_consumed=int(consumed))
+            for day, (consumed,) in series
+        ]
+    )
+
 # Rota para comprar leads adicionais
 @router.post("/purchase", response_model=LeadPurchaseResponse, status_code=201,
             summary="Comprar leads adicionais",
@@ -150,12 +283,12 @@ def purchase_leads(
     Returns:
         LeadPurchaseResponse: Informações da compra registrada
     """
-    # Obter cliente e verificar se existe
-    client = get_client_by_id(db, client_id)
+    # Obter cliente e plano (plano vindo do cache)
+    client, plan = get_client_with_plan(db, client_id)
     
     # Calcular valor da compra
     quantity = purchase_data.quantity
-    price_per_lead = client.plan.extra_lead_price
+    price_per_lead = plan.extra_lead_price
     amount = quantity * price_per_lead
     
     # Criar registro de compra
@@ -167,6 +300,8 @@ def purchase_leads(
     )
     
     db.add(purchase)
+    db.flush()
+    record_purchase_change(db, None, purchase_rollup_entry(purchase))
     db.commit()
     db.refresh(purchase)
     
@@ -179,15 +314,19 @@ def purchase_leads(
 def get_financial_report(
     start_date: Optional[date] = Query(None, description="Data inicial"),
     end_date: Optional[date] = Query(None, description="Data final"),
-    db: Session = Depends(get_db)
+    granularity: Optional[str] = Query(None, description="Inclui a receita por intervalo: day, week ou month"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Gera um relatório financeiro de vendas de leads.
     
+    Lê o agregado diário purchase_daily_stats em vez da tabela de compras.
+    
     Args:
         start_date: Data inicial para filtro
         end_date: Data final para filtro
-        db: Sessão do banco de dados
+        granularity: Se informado, inclui a receita aprovada por intervalo
+        db: Sessão somente leitura do banco de dados
         
     Returns:
         FinancialReportResponse: Relatório financeiro
@@ -199,67 +338,77 @@ def get_financial_report(
         # Padrão: último mês
         start_date = date(end_date.year, end_date.month - 1 if end_date.month > 1 else 12, 1)
     
-    # Consulta base para compras no período
-    query = db.query(LeadPurchase).filter(
-        sa.func.date(LeadPurchase.created_at) >= start_date,
-        sa.func.date(LeadPurchase.created_at) <= end_date
-    )
-    
-    # Total de receita (apenas compras aprovadas)
-    total_revenue = db.query(sa.func.sum(LeadPurchase.amount)).filter(
-        sa.func.date(LeadPurchase.created_at) >= start_date,
-        sa.func.date(LeadPurchase.created_at) <= end_date,
-        LeadPurchase.status == "aprovado"
-    ).scalar() or 0
+    in_period = (PurchaseDailyStat.day >= start_date, PurchaseDailyStat.day <= end_date)
     
-    # Total de leads vendidos
-    total_leads_sold = db.query(sa.func.sum(LeadPurchase.quantity)).filter(
-        sa.func.date(LeadPurchase.created_at) >= start_date,
-        sa.func.date(LeadPurchase.created_at) <= end_date,
-        LeadPurchase.status == "aprovado"
-    ).scalar() or 0
-    
-    # Compras por status
+    # Compras por status (os totais vêm da linha "aprovado")
     purchases_by_status = {}
+    total_revenue = 0
+    total_leads_sold = 0
     status_counts = db.query(
-        LeadPurchase.status,
-        sa.func.count(LeadPurchase.id).label('count'),
-        sa.func.sum(LeadPurchase.amount).label('total')
-    ).filter(
-        sa.func.date(LeadPurchase.created_at) >= start_date,
-        sa.func.date(LeadPurchase.created_at) <= end_date
-    ).group_by(LeadPurchase.status).all()
+        PurchaseDailyStat.status,
+        sa.func.sum(PurchaseDailyStat.purchase_count).label('count'),
+        sa.func.sum(PurchaseDailyStat.amount).label('total'),
+        sa.func.sum(PurchaseDailyStat.quantity).label('quantity')
+    ).filter(*in_period).group_by(PurchaseDailyStat.status).all()
     
-    for status, count, total in status_counts:
+    for status, count, total, quantity in status_counts:
+        if not count:
+            continue
         purchases_by_status[status] = {
-            "count": count,
-            "total": float(total) if total else 0
+            "count": int(count),
+            "total": round(float(total), 2) if total else 0
         }
+        if status == "aprovado":
+            total_revenue = total or 0
+            total_leads_sold = quantity or 0
     
     # Receita por cliente
     revenue_by_client = []
     client_revenues = db.query(
         Client.id,
         Client.name,
-        sa.func.sum(LeadPurchase.amount).label('revenue'),
-        sa.func.sum(LeadPurchase.quantity).label('leads_purchased')
-    ).join(LeadPurchase).filter(
-        sa.func.date(LeadPurchase.created_at) >= start_date,
-        sa.func.date(LeadPurchase.created_at) <= end_date,
-        LeadPurchase.status == "aprovado"
+        sa.func.sum(PurchaseDailyStat.amount).label('revenue'),
+        sa.func.sum(PurchaseDailyStat.quantity).label('leads_purchased')
+    ).join(Client, Client.id == PurchaseDailyStat.client_id).filter(
+        *in_period,
+        PurchaseDailyStat.status == "aprovado",
+        PurchaseDailyStat.purchase_count > 0
     ).group_by(Client.id, Client.name).order_by(sa.desc('revenue')).all()
     
     for client_id, client_name, revenue, leads_purchased in client_revenues:
         revenue_by_client.append({
             "client_id": client_id,
             "client_name": client_name,
-            "revenue": float(revenue) if revenue else 0,
+            "revenue": round(float(revenue), 2) if revenue else 0,
             "leads_purchased": int(leads_purchased) if leads_purchased else 0
         })
     
+    # Receita aprovada por intervalo (opcional, uma consulta agrupada)
+    revenue_by_period = None
+    if granularity:
+        try:
+            series = bucket_totals(
+                db, PurchaseDailyStat.day,
+                [sa.func.sum(PurchaseDailyStat.amount), sa.func.sum(PurchaseDailyStat.quantity)],
+                start_date, end_date, granularity,
+                PurchaseDailyStat.status == "aprovado"
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        revenue_by_period = [
+            {
+                "period_start": day,
+                "label": bucket_label(day, granularity),
+                "revenue": round(float(revenue), 2),
+                "leads_sold": int(quantity)
+            }
+            for day, (revenue, quantity) in series
+        ]
+    
     return FinancialReportResponse(
-        total_revenue=float(total_revenue),
+        total_revenue=round(float(total_revenue), 2),
         total_leads_sold=int(total_leads_sold) if total_leads_sold else 0,
         purchases_by_status=purchases_by_status,
-        revenue_by_client=revenue_by_client
+        revenue_by_client=revenue_by_client,
+        revenue_by_period=revenue_by_period
     )
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from crud_user import *
 from schemas_user import User as UserSchema, UserCreate, UserUpdate
-from database import get_db
+from database import get_db, get_read_db
+from pagination import set_next_cursor
 # Import authentication dependency later
 # from core_security import get_current_active_superuser # Example dependency
 
@@ -28,19 +29,23 @@ def create_user(
 
 @router.get("/", response_model=List[UserSchema])
 def read_users(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: models_user.User = Depends(get_current_active_superuser) # Add auth later
 ):
-    """Retrieve a list of users."""
-    users = get_users(db, skip=skip, limit=limit)
+    """Retrieve a list of users, newest first; the next page cursor is sent in X-Next-Cursor."""
+    users, next_cursor = get_users_page(db, skip=skip, limit=limit, cursor=cursor)
+    set_next_cursor(request, response, next_cursor)
     return users
 
 @router.get("/{user_id}", response_model=UserSchema)
 def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: models_user.User = Depends(get_current_active_superuser) # Add auth later
 ):
     """Retrieve a specific user by ID."""
@@ -0,0 +1,111 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Benchmark das consultas dos cards e gráficos de origem/status do dashboard
+
+Popula um banco SQLite temporário com leads sintéticos (1 milhão por
+padrão) e compara a abordagem original (três COUNTs e dois GROUP BYs na
+tabela leads) com a atual (agregação condicional em uma leitura e um único
+GROUP BY por origem e status, sobre o agregado diário lead_daily_stats).
+
+Uso:
+    python benchmarks/bench_dashboard.py --leads 1000000 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, desc, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, get_engine
+import models
+from models import Lead
+from api_dashboard import get_card_counts, get_source_status_breakdown
+from rollups import rebuild_rollups
+
+SOURCES = ["Facebook", "Google", "Instagram", "Indicação", "Site", "WhatsApp", "Evento", None]
+STATUSES = ["novo", "contato", "qualificado", "proposta", "fechado", "perdido"]
+
+
+def populate(engine, total: int, batch_size: int = 50000):
+    """Insere `total` leads distribuídos nos últimos 365 dias"""
+    now = datetime.now()
+    rng = random.Random(42)
+    with engine.begin() as conn:
+        for start in range(0, total, batch_size):
+            conn.execute(insert(Lead), [
+                {
+                    "name": f"Lead {i}",
+                    "source": rng.choice(SOURCES),
+                    "status": rng.choice(STATUSES),
+                    "created_at": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+                }
+                for i in range(start, min(start + batch_size, total))
+            ])
+
+
+def previous_queries(db, since):
+    """Consultas anteriores: três COUNTs no período e dois GROUP BYs na tabela"""
+    db.query(func.count(Lead.id)).filter(Lead.created_at >= since).scalar()
+    db.query(func.count(Lead.id)).filter(
+        and_(Lead.created_at >= since, Lead.status.in_(["qualificado", "proposta", "fechado"]))
+    ).scalar()
+    db.query(func.count(Lead.id)).filter(
+        and_(Lead.created_at >= since, Lead.status == "fechado")
+    ).scalar()
+    db.query(Lead.source, func.count(Lead.id).label('count')).group_by(Lead.source).order_by(desc('count')).all()
+    db.query(Lead.status, func.count(Lead.id).label('count')).group_by(Lead.status).order_by(desc('count')).all()
+
+
+def current_queries(db, since):
+    """Consultas atuais: agregação condicional e GROUP BY (source, status) no agregado diário"""
+    get_card_counts(db, since)
+    get_source_status_breakdown(db)
+
+
+def timed(func, db, since, repeat: int) -> list:
+    durations = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func(db, since)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das consultas do dashboard")
+    parser.add_argument("--leads", type=int, default=1_000_000, help="Quantidade de leads sintéticos")
+    parser.add_argument("--repeat", type=int, default=5, help="Execuções de cada abordagem")
+    parser.add_argument("--database", help="Arquivo SQLite a usar (padrão: temporário)")
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(tempfile.mkdtemp(), "bench_dashboard.db")
+    engine = get_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    if engine.connect().execute(func.count(Lead.id).select()).scalar() < args.leads:
+        print(f"Populando {args.leads} leads em {path}...")
+        populate(engine, args.leads)
+
+    db = sessionmaker(bind=engine)()
+    started_at = time.perf_counter()
+    rebuild_rollups(db)
+    print(f"Agregados reconstruídos em {time.perf_counter() - started_at:.1f} s")
+    since = datetime.now() - timedelta(days=30)
+    timed(current_queries, db, since, 1)  # aquece o cache de páginas
+
+    for label, func_ in (("anterior (5 consultas)", previous_queries), ("atual (2 consultas)", current_queries)):
+        durations = timed(func_, db, since, args.repeat)
+        print(f"{label:<24} mediana {statistics.median(durations):9.1f} ms   min {min(durations):9.1f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Benchmark da busca textual de leads
+
+Popula um banco SQLite temporário com leads sintéticos (1 milhão por
+padrão), indexados no FTS5 (trigramas) como o crud_lead faz, e mede a
+latência p50/p99 de buscas por trechos de nome, email e telefone com
+lead_search.search_leads.
+
+Uso:
+    python benchmarks/bench_lead_search.py --leads 1000000 --queries 500
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, get_engine
+import models
+from models import Lead
+from lead_search import index_leads, search_leads
+
+FIRST_NAMES = ["Maria", "João", "Ana", "Pedro", "Juliana", "Carlos", "Fernanda", "Lucas", "Patrícia", "Rafael"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Pereira", "Costa", "Rodrigues", "Almeida", "Lima", "Gomes", "Ribeiro"]
+
+
+def fake_lead(rng, i: int) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "name": f"{first} {last} {i}",
+        "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+        "phone": f"({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+    }
+
+
+def populate(engine, total: int, batch_size: int = 50000):
+    """Insere `total` leads e os indexa no FTS5"""
+    rng = random.Random(42)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for start in range(0, total, batch_size):
+            rows = [fake_lead(rng, i) for i in range(start, min(start + batch_size, total))]
+            leads = db.scalars(insert(Lead).returning(Lead), rows).all()
+            index_leads(db, leads)
+            db.commit()
+            db.expunge_all()
+
+
+def sample_queries(rng, total: int, count: int) -> list:
+    queries = []
+    for _ in range(count):
+        i = rng.randrange(total)
+        kind = rng.choice(("name", "email", "phone", "two_terms"))
+        if kind == "name":
+            queries.append(rng.choice(LAST_NAMES)[1:5] + f" {i}")
+        elif kind == "email":
+            queries.append(f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}{i}")
+        elif kind == "phone":
+            queries.append(f"9{rng.randint(1000, 9999)}")
+        else:
+            queries.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da busca textual de leads")
+    parser.add_argument("--leads", type=int, default=1_000_000, help="Quantidade de leads sintéticos")
+    parser.add_argument("--queries", type=int, default=500, help="Buscas medidas")
+    parser.add_argument("--limit", type=int, default=20, help="Resultados por busca")
+    parser.add_argument("--database", help="Arquivo SQLite a usar (padrão: temporário)")
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(tempfile.mkdtemp(), "bench_lead_search.db")
+    engine = get_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    if engine.connect().execute(func.count(Lead.id).select()).scalar() < args.leads:
+        print(f"Populando e indexando {args.leads} leads em {path}...")
+        started_at = time.perf_counter()
+        populate(engine, args.leads)
+        print(f"Concluído em {time.perf_counter() - started_at:.1f} s")
+
+    queries = sample_queries(random.Random(7), args.leads, args.queries)
+    db = sessionmaker(bind=engine)()
+    for query in queries[:20]:
+        search_leads(db, query, limit=args.limit)  # aquece o cache de páginas
+
+    durations = []
+    for query in queries:
+        started_at = time.perf_counter()
+        search_leads(db, query, limit=args.limit)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    durations.sort()
+    p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+    print(f"{len(durations)} buscas   p50 {statistics.median(durations):7.2f} ms   p99 {p99:7.2f} ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Benchmark do custo do hash de senha (bcrypt)
+
+Mede, para cada custo (BCRYPT_ROUNDS), a latência de um login (verificação
+da senha) em p50/p99 e a vazão em logins por segundo por núcleo, com uma
+thread por núcleo, como o pool de hash da aplicação.
+
+Uso:
+    python benchmarks/bench_password_hash.py --rounds 10 11 12 13 --logins 100
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def measure(rounds: int, logins: int, workers: int) -> dict:
+    """Executa `logins` verificações com o custo `rounds` e retorna as métricas"""
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    hashed = context.hash("senha-do-benchmark")
+
+    def login(_):
+        started_at = time.perf_counter()
+        context.verify("senha-do-benchmark", hashed)
+        return (time.perf_counter() - started_at) * 1000
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started_at
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "rounds": rounds,
+        "p50_ms": percentiles[49],
+        "p99_ms": percentiles[98],
+        "logins_per_sec_per_core": logins / elapsed / workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do custo do bcrypt")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13],
+                        help="Custos (log2 das iterações) a medir")
+    parser.add_argument("--logins", type=int, default=50,
+                        help="Verificações por custo")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Threads em paralelo (padrão: um por núcleo)")
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'p50 (ms)':>10} {'p99 (ms)':>10} {'logins/s/núcleo':>16}")
+    for rounds in args.rounds:
+        result = measure(rounds, max(args.logins, 2), args.workers)
+        print(
+            f"{result['rounds']:>6} {result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f} "
+            f"{result['logins_per_sec_per_core']:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Executor limitado para tarefas de CPU
+
+Este módulo implementa um pool de threads com limite de tarefas pendentes,
+usado para tirar do event loop operações caras como o hash bcrypt. Quando
+o pool está saturado, novas tarefas são recusadas imediatamente em vez de
+formar uma fila longa, e profundidade da fila e latência ficam disponíveis
+como métricas.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+
+class ExecutorSaturatedError(Exception):
+    """Erro lançado quando o executor não aceita mais tarefas"""
+
+
+def _percentile(sorted_samples, fraction: float) -> float:
+    index = min(len(sorted_samples) - 1, int(round(fraction * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class BoundedExecutor:
+    """
+    Pool de threads com limite de concorrência e de fila
+
+    Args:
+        name: Nome do executor (prefixo das threads e métricas)
+        max_workers: Número de tarefas executadas em paralelo
+        max_queue: Número de tarefas aguardando além das em execução
+        latency_samples: Quantidade de latências recentes mantidas para os percentis
+    """
+    def __init__(self, name: str, max_workers: int, max_queue: int, latency_samples: int = 1000):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_ms = deque(maxlen=latency_samples)
+        self._latency_ms = deque(maxlen=latency_samples)
+
+    @property
+    def capacity(self) -> int:
+        """Total de tarefas aceitas ao mesmo tempo (em execução + na fila)"""
+        return self.max_workers + self.max_queue
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Executa `func(*args)` no pool sem bloquear o event loop
+
+        Raises:
+            ExecutorSaturatedError: Se já houver `capacity` tarefas pendentes
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise ExecutorSaturatedError(f"Executor {self.name} saturado")
+            self._pending += 1
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_ms.append((started_at - submitted_at) * 1000)
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self._latency_ms.append((time.perf_counter() - submitted_at) * 1000)
+
+        def release(_future):
+            # Chamado ao concluir ou ao cancelar uma tarefa ainda na fila
+            with self._lock:
+                self._pending -= 1
+
+        future = self._executor.submit(task)
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        """Encerra as threads do pool"""
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna fila, execução e latências (ms) do executor"""
+        with self._lock:
+            wait_ms = sorted(self._wait_ms)
+            latency_ms = sorted(self._latency_ms)
+            stats = {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+        for label, samples in (("wait", wait_ms), ("latency", latency_ms)):
+            stats[f"{label}_p50_ms"] = round(_percentile(samples, 0.50), 3) if samples else 0.0
+            stats[f"{label}_p99_ms"] = round(_percentile(samples, 0.99), 3) if samples else 0.0
+        return stats
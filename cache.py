@@ -0,0 +1,258 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Caches em memória
+
+Este módulo implementa um cache em memória por worker, com limite de
+tamanho (LRU), expiração por tempo (TTL) e contadores de acertos e erros,
+para dados lidos com frequência e alterados raramente.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import logger
+
+# Todos os caches criados, para exposição das métricas
+_registry: Dict[str, Any] = {}
+
+# Marcador de ausência (permite armazenar None como valor)
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache LRU com expiração por entrada
+
+    Args:
+        name: Nome do cache nas métricas
+        maxsize: Número máximo de entradas; a menos usada recentemente é descartada
+        ttl: Tempo de vida padrão das entradas (segundos)
+    """
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Retorna o valor armazenado ou `default` se ausente ou expirado"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Armazena um valor; `ttl` substitui o tempo de vida padrão"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Remove uma entrada, se existir"""
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self.invalidations += 1
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna tamanho e contadores do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache de valores caros de calcular, servidos vencidos enquanto são recalculados
+
+    Uma entrada é nova por `ttl` segundos. Depois disso, e por até mais
+    `stale_ttl` segundos, ela continua sendo servida enquanto um único
+    recálculo roda em segundo plano. Sem entrada utilizável, a primeira
+    requisição calcula o valor e as concorrentes aguardam esse mesmo cálculo.
+
+    Args:
+        name: Nome do cache nas métricas
+        ttl: Tempo em que a entrada é considerada nova (segundos)
+        stale_ttl: Tempo adicional em que a entrada vencida ainda pode ser servida
+    """
+    def __init__(self, name: str, ttl: float = 60.0, stale_ttl: float = 300.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # chave -> (valor, calculado_em, novo_até)
+        self._data: Dict[Hashable, Tuple[Any, float, float]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-refresh")
+        # Incrementada a cada invalidação; recálculos iniciados antes dela gravam a entrada já vencida
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.invalidations = 0
+        _registry[name] = self
+
+    def get(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        refresh: Optional[Callable[[], Any]] = None
+    ) -> Tuple[Any, float]:
+        """
+        Retorna o valor da chave e sua idade em segundos
+
+        Args:
+            key: Chave da entrada
+            compute: Calcula o valor na requisição atual (sem entrada utilizável)
+            refresh: Calcula o valor em segundo plano; padrão: `compute`
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, computed_at, fresh_until = entry
+                if now < fresh_until:
+                    self.hits += 1
+                    return value, now - computed_at
+                if now - computed_at < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = self._executor.submit(
+                            self._compute_and_store, key, refresh or compute, self._generation, True
+                        )
+                    return value, now - computed_at
+
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            generation = self._generation
+
+        if not leader:
+            return future.result(), 0.0
+
+        try:
+            value = self._compute_and_store(key, compute, generation, False)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value, 0.0
+
+    def _compute_and_store(self, key: Hashable, compute: Callable[[], Any], generation: int, background: bool):
+        try:
+            value = compute()
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if background:
+                    self.refresh_errors += 1
+            if background:
+                logger.error(f"Falha ao recalcular o cache {self.name}", {"key": str(key), "error": str(e)})
+            raise
+        now = time.monotonic()
+        with self._lock:
+            fresh_until = now + self.ttl if generation == self._generation else now
+            self._data[key] = (value, now, fresh_until)
+            self._inflight.pop(key, None)
+            if background:
+                self.refreshes += 1
+        return value
+
+    @property
+    def generation(self) -> int:
+        """Contador de invalidações; capture-o antes de calcular um valor para put()"""
+        return self._generation
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """
+        Grava um valor calculado fora do cache
+
+        Args:
+            key: Chave da entrada
+            value: Valor calculado
+            generation: Valor de `generation` antes do cálculo; se houve
+                invalidação desde então, a entrada é gravada já vencida
+        """
+        now = time.monotonic()
+        with self._lock:
+            fresh = generation is None or generation == self._generation
+            self._data[key] = (value, now, now + self.ttl if fresh else now)
+
+    def invalidate(self):
+        """Marca todas as entradas como vencidas; a próxima leitura dispara o recálculo"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._data = {key: (value, computed_at, 0.0) for key, (value, computed_at, _) in self._data.items()}
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna tamanho e contadores do cache"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "size": len(self._data),
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "invalidations": self.invalidations,
+                "max_age_seconds": round(max((now - entry[1] for entry in self._data.values()), default=0.0), 3),
+            }
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Retorna as métricas de todos os caches deste worker"""
+    return {name: cache.stats() for name, cache in _registry.items()}
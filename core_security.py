@@ -8,15 +8,25 @@ de permissões de usuários.
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
+import hashlib
 import os
-from typing import Optional
+import time
+from typing import Optional, Tuple
 
+import logger
 import models_user
-from database import get_db
+from bounded_executor import BoundedExecutor, ExecutorSaturatedError
+from cache import TTLCache
+from database import get_async_read_db, AsyncPrimaryReadSessionLocal, AsyncSessionLocal
+from error_handlers import ServiceUnavailableError
+from schemas_user import UserPrincipal
+from token_versions import TokenVersionMap
 
 # Configuração de segurança
 # Em produção, estas variáveis devem vir de variáveis de ambiente
@@ -27,8 +37,46 @@ SECRET_KEY = os.getenv(
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-# Configuração do hash de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cache dos usuários autenticados, indexado pelo `sub` do token (email)
+# Desativações e alterações invalidam a entrada neste worker; nos demais valem após o TTL
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+user_cache = TTLCache("users", maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
+
+# Cache de tokens já verificados (sha256 do token -> claims), até o `exp` do token
+# Evita repetir a verificação HMAC a cada requisição (ex.: polling do dashboard)
+JWT_CACHE_MAXSIZE = int(os.getenv("JWT_CACHE_MAXSIZE", "4096"))
+token_cache = TTLCache(
+    "jwt",
+    maxsize=JWT_CACHE_MAXSIZE,
+    ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+# Versões de token por usuário, para validar tokens sem consultar a tabela users
+# Revogações feitas em outro worker valem após, no máximo, este intervalo
+TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "30"))
+token_versions = TokenVersionMap(
+    AsyncPrimaryReadSessionLocal,
+    refresh_interval=TOKEN_VERSION_REFRESH_SECONDS
+)
+
+# Configuração do hash de senha, compartilhada por toda a aplicação
+# BCRYPT_ROUNDS define o custo (cada +1 dobra o tempo); hashes com outro custo
+# são refeitos no próximo login bem-sucedido
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Pool dedicado ao bcrypt (~200 ms de CPU por chamada), fora do event loop
+# O bcrypt libera o GIL, então as threads verificam senhas em paralelo
+# Com PASSWORD_HASH_WORKERS em execução e PASSWORD_HASH_MAX_QUEUE na fila,
+# novos logins recebem 503 imediatamente em vez de aguardar
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+password_executor = BoundedExecutor(
+    "password-hash",
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_MAX_QUEUE
+)
 
 # Configuração do OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
@@ -61,10 +109,26 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica a senha e, se o hash estiver desatualizado, gera um novo
+    
+    Args:
+        plain_password: Senha em texto plano
+        hashed_password: Hash da senha armazenada
+        
+    Returns:
+        Tupla (senha válida, novo hash ou None se o atual estiver em dia)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[models_user.User]:
     """
     Autentica um usuário verificando email e senha
     
+    Se o hash usar um custo diferente de BCRYPT_ROUNDS, ele é refeito e salvo.
+    
     Args:
         db: Sessão do banco de dados
         email: Email do usuário
@@ -76,11 +140,147 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[models
     user = db.query(models_user.User).filter(models_user.User.email == email).first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        logger.info("Hash de senha atualizado", {"user_id": user.id, "bcrypt_rounds": BCRYPT_ROUNDS})
+    return user
+
+
+async def _run_password_task(func, *args):
+    try:
+        return await password_executor.run(func, *args)
+    except ExecutorSaturatedError:
+        logger.warning("Pool de hash de senha saturado", password_executor.stats())
+        raise ServiceUnavailableError(
+            message="Servidor ocupado, tente novamente em instantes",
+            retry_after=1
+        )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica a senha no pool de hash, sem bloquear o event loop
+    
+    Args:
+        plain_password: Senha em texto plano
+        hashed_password: Hash da senha armazenada
+        
+    Returns:
+        True se a senha corresponder ao hash, False caso contrário
+        
+    Raises:
+        ServiceUnavailableError: Se o pool de hash estiver saturado
+    """
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Gera o hash bcrypt da senha no pool de hash, sem bloquear o event loop
+    
+    Args:
+        password: Senha em texto plano
+        
+    Returns:
+        Hash da senha
+        
+    Raises:
+        ServiceUnavailableError: Se o pool de hash estiver saturado
+    """
+    return await _run_password_task(get_password_hash, password)
+
+
+async def authenticate_user_async(email: str, password: str) -> Optional[models_user.User]:
+    """
+    Versão assíncrona de authenticate_user, para rotas async
+    
+    A verificação (e o rehash, quando necessário) roda no pool de hash. O
+    usuário é lido numa sessão curta de leitura do banco principal, fechada
+    antes do bcrypt, para que nenhuma conexão ou lock de escrita fique preso
+    durante o hash; uma sessão de escrita só é aberta para gravar o rehash.
+    
+    Args:
+        email: Email do usuário
+        password: Senha em texto plano
+        
+    Returns:
+        Objeto User (desanexado da sessão) se a autenticação for bem-sucedida,
+        False caso contrário
+        
+    Raises:
+        ServiceUnavailableError: Se o pool de hash estiver saturado
+    """
+    async with AsyncPrimaryReadSessionLocal() as db:
+        result = await db.execute(
+            select(models_user.User).where(models_user.User.email == email)
+        )
+        user = result.scalars().first()
+    if not user:
+        return False
+    valid, new_hash = await _run_password_task(verify_and_update_password, password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(models_user.User)
+                .where(models_user.User.id == user.id)
+                .values(hashed_password=new_hash)
+            )
+            await db.commit()
+        user.hashed_password = new_hash
+        logger.info("Hash de senha atualizado", {"user_id": user.id, "bcrypt_rounds": BCRYPT_ROUNDS})
     return user
 
 
+def invalidate_user_cache(*emails: Optional[str]):
+    """
+    Remove usuários do cache de autenticação
+    
+    Deve ser chamada sempre que dados do usuário mudarem (ativação,
+    permissões, senha, email ou exclusão).
+    
+    Args:
+        emails: Emails (sub do token) dos usuários alterados
+    """
+    for email in emails:
+        if email:
+            user_cache.invalidate(email)
+
+
+def revoke_user_tokens(db_user: models_user.User):
+    """
+    Revoga os tokens emitidos para o usuário incrementando token_version
+    
+    Deve ser chamada antes do commit; após o commit, publique a nova versão
+    com publish_user_change.
+    
+    Args:
+        db_user: Usuário carregado na sessão que fará o commit
+    """
+    db_user.token_version = (db_user.token_version or 0) + 1
+
+
+def publish_user_change(db_user: models_user.User, *previous_emails: Optional[str], deleted: bool = False):
+    """
+    Propaga a alteração de um usuário (já commitada) para os caches deste worker
+    
+    Args:
+        db_user: Usuário alterado
+        previous_emails: Emails anteriores do usuário, se o email mudou
+        deleted: True se o usuário foi excluído
+    """
+    invalidate_user_cache(db_user.email, *previous_emails)
+    if deleted or not db_user.is_active:
+        token_versions.discard(db_user.id)
+    else:
+        token_versions.set(db_user.id, db_user.token_version or 0)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Cria um token JWT com os dados fornecidos
@@ -102,45 +302,163 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
-) -> models_user.User:
+def create_user_access_token(user, expires_delta: Optional[timedelta] = None) -> str:
     """
-    Obtém o usuário atual a partir do token JWT
+    Cria o token JWT de um usuário com as claims de autorização
+    
+    Além do `sub` (email), o token carrega o ID (`uid`), a flag de
+    administrador (`su`) e a versão de token (`ver`), que permitem
+    autorizar rotas de leitura sem consultar o banco.
     
     Args:
-        token: Token JWT
-        db: Sessão do banco de dados
+        user: Usuário autenticado (User ou UserPrincipal)
+        expires_delta: Tempo de expiração do token
         
     Returns:
-        Objeto User correspondente ao token
-        
-    Raises:
-        HTTPException: Se o token for inválido ou o usuário não for encontrado
+        Token JWT codificado
     """
-    credentials_exception = HTTPException(
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "su": bool(user.is_superuser),
+            "ver": user.token_version or 0,
+        },
+        expires_delta=expires_delta
+    )
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Verifica a assinatura e a expiração do token e retorna suas claims
+    
+    Tokens já verificados ficam em cache, indexados pelo hash do token, até
+    o seu `exp`; a revogação continua sendo checada pela versão de token.
+    
+    Args:
+        token: Token JWT
+        
+    Returns:
+        Claims do token
+        
+    Raises:
+        HTTPException: Se o token for inválido, expirado ou não tiver `sub`
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is not None:
+        return dict(payload)
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
     
-    user = db.query(models_user.User).filter(models_user.User.email == email).first()
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        token_cache.set(digest, payload, ttl=expires_at - time.time())
+    return dict(payload)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), 
+    db: AsyncSession = Depends(get_async_read_db)
+) -> UserPrincipal:
+    """
+    Obtém o usuário atual a partir do token JWT
+    
+    O usuário é buscado no banco apenas quando não está no cache
+    (USER_CACHE_TTL segundos por entrada).
+    
+    Args:
+        token: Token JWT
+        db: Sessão assíncrona somente leitura do banco de dados
+        
+    Returns:
+        UserPrincipal correspondente ao token
+        
+    Raises:
+        HTTPException: Se o token for inválido ou o usuário não for encontrado
+    """
+    payload = decode_access_token(token)
+    email: str = payload["sub"]
+    
+    user = user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        result = await db.execute(
+            select(models_user.User).where(models_user.User.email == email)
+        )
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise _credentials_exception()
+        user = UserPrincipal.model_validate(db_user)
+        user_cache.set(email, user)
+    
+    # Tokens com versão só valem enquanto a versão do usuário não mudar
+    version = payload.get("ver")
+    if version is not None and version != user.token_version:
+        raise _credentials_exception()
     return user
 
 
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_read_db)
+) -> UserPrincipal:
+    """
+    Autoriza a requisição apenas pelas claims do token, para rotas de leitura
+    
+    A revogação é verificada no mapa de versões em memória, que contém só
+    usuários ativos; a tabela users é consultada para tokens sem claims de
+    autorização (emitidos antes delas), de usuários criados após a última
+    recarga do mapa e de usuários inativos, que são recusados pelo caminho
+    completo. O principal não inclui full_name nem created_at.
+    
+    Args:
+        token: Token JWT
+        db: Sessão assíncrona somente leitura (usada apenas no caminho completo)
+        
+    Returns:
+        UserPrincipal montado a partir das claims
+        
+    Raises:
+        HTTPException: Se o token for inválido ou revogado, ou o usuário estiver inativo
+    """
+    payload = decode_access_token(token)
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    
+    if user_id is not None and version is not None:
+        await token_versions.refresh_if_due()
+        current_version = token_versions.get(user_id)
+        if current_version is not None:
+            if current_version != version:
+                raise _credentials_exception()
+            # Claims já verificadas pela assinatura; dispensa a validação do pydantic
+            return UserPrincipal.model_construct(
+                id=user_id,
+                email=payload["sub"],
+                is_active=True,
+                is_superuser=bool(payload.get("su")),
+                token_version=version,
+            )
+    
+    return await get_current_active_user(await get_current_user(token=token, db=db))
+
+
 async def get_current_active_user(
-    current_user: models_user.User = Depends(get_current_user)
-) -> models_user.User:
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> UserPrincipal:
     """
     Verifica se o usuário atual está ativo
     
@@ -148,7 +466,7 @@ async def get_current_active_user(
         current_user: Usuário atual obtido do token JWT
         
     Returns:
-        Objeto User se o usuário estiver ativo
+        UserPrincipal se o usuário estiver ativo
         
     Raises:
         HTTPException: Se o usuário estiver inativo
@@ -162,8 +480,8 @@ async def get_current_active_user(
 
 
 async def get_current_active_superuser(
-    current_user: models_user.User = Depends(get_current_active_user)
-) -> models_user.User:
+    current_user: UserPrincipal = Depends(get_current_active_user)
+) -> UserPrincipal:
     """
     Verifica se o usuário atual é um superusuário (admin) ativo
     
@@ -171,7 +489,7 @@ async def get_current_active_superuser(
         current_user: Usuário atual obtido do token JWT
         
     Returns:
-        Objeto User se o usuário for um superusuário ativo
+        UserPrincipal se o usuário for um superusuário ativo
         
     Raises:
         HTTPException: Se o usuário não for um superusuário
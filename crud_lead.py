@@ -1,8 +1,22 @@
+import csv
+import io
+import os
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
 from models_plans import LeadPurchase, Client
+from models_lead import Lead
+from database import lock_for_update
 from typing import Optional, List
 from datetime import date
 from schemas_lead import LeadCreate, LeadUpdate
+from lead_search import index_lead, index_leads, unindex_lead
+from pagination import keyset_paginate
+from rollups import (
+    lead_rollup_key, purchase_rollup_entry, record_lead_change, record_leads_created, record_purchase_change
+)
+
+# Leads por INSERT multi-linha na criação em lote
+BULK_LEAD_BATCH_SIZE = int(os.getenv("BULK_LEAD_BATCH_SIZE", "500"))
 
 # Funções originais para compra de leads
 def get_lead_purchase(db: Session, purchase_id: int):
@@ -10,8 +24,15 @@ def get_lead_purchase(db: Session, purchase_id: int):
     return db.query(LeadPurchase).filter(LeadPurchase.id == purchase_id).first()
 
 def get_lead_purchases(db: Session, client_id: Optional[int] = None, 
-                      status: Optional[str] = None, skip: int = 0, limit: int = 100):
+                      status: Optional[str] = None, skip: int = 0, limit: int = 100,
+                      cursor: Optional[str] = None):
     """Obtém uma lista de compras de leads com filtros opcionais."""
+    return get_lead_purchases_page(db, client_id, status, skip, limit, cursor)[0]
+
+def get_lead_purchases_page(db: Session, client_id: Optional[int] = None,
+                            status: Optional[str] = None, skip: int = 0, limit: int = 100,
+                            cursor: Optional[str] = None):
+    """Obtém uma página de compras de leads (mais recentes primeiro) e o cursor da próxima."""
     query = db.query(LeadPurchase)
     
     if client_id:
@@ -20,7 +41,7 @@ def get_lead_purchases(db: Session, client_id: Optional[int] = None,
     if status:
         query = query.filter(LeadPurchase.status == status)
     
-    return query.offset(skip).limit(limit).all()
+    return keyset_paginate(query, LeadPurchase.created_at, LeadPurchase.id, limit, cursor=cursor, skip=skip)
 
 def create_lead_purchase(db: Session, client_id: int, quantity: int, amount: float):
     """Cria uma nova compra de leads."""
@@ -31,6 +52,8 @@ def create_lead_purchase(db: Session, client_id: int, quantity: int, amount: flo
         status="pendente"
     )
     db.add(db_purchase)
+    db.flush()
+    record_purchase_change(db, None, purchase_rollup_entry(db_purchase))
     db.commit()
     db.refresh(db_purchase)
     return db_purchase
@@ -41,8 +64,12 @@ def update_lead_purchase_status(db: Session, purchase_id: int, status: str):
     if not db_purchase:
         return None
     
+    # O agregado é ajustado a partir do status atual, lido já com o lock de escrita
+    lock_for_update(db, db_purchase)
+    previous_entry = purchase_rollup_entry(db_purchase)
     db_purchase.status = status
     db.add(db_purchase)
+    record_purchase_change(db, previous_entry, purchase_rollup_entry(db_purchase))
     db.commit()
     db.refresh(db_purchase)
     return db_purchase
@@ -58,47 +85,142 @@ def get_financial_report(db: Session, start_date: date, end_date: date):
         "revenue_by_client": []
     }
 
-# Funções adicionadas para compatibilidade com api_lead.py
-def create_lead(db: Session, lead: LeadCreate):
+# Funções de leads usadas pelo api_lead.py
+# Toda escrita ajusta o agregado lead_daily_stats e o índice de busca na mesma transação
+def create_lead(db: Session, lead: LeadCreate, created_by_id: Optional[int] = None,
+                assigned_to_id: Optional[int] = None):
     """Cria um novo lead."""
-    # Implementação simplificada para resolver a dependência
-    # Em produção, substitua por uma implementação real
-    db_lead = Client(
+    db_lead = Lead(
         name=lead.name,
         email=lead.email,
         phone=lead.phone,
-        status="novo"
+        source=lead.source,
+        status=lead.status or "novo",
+        notes=lead.notes,
+        created_by_id=created_by_id,
+        assigned_to_id=assigned_to_id
     )
     db.add(db_lead)
+    db.flush()
+    record_lead_change(db, None, lead_rollup_key(db_lead))
+    index_lead(db, db_lead)
     db.commit()
     db.refresh(db_lead)
     return db_lead
 
-def get_leads(db: Session, skip: int = 0, limit: int = 100, assigned_to_id: Optional[int] = None):
+def create_leads_bulk(db: Session, leads: List[LeadCreate], created_by_id: Optional[int] = None,
+                      batch_size: Optional[int] = None, assigned_to_id: Optional[int] = None) -> List[int]:
+    """Cria vários leads em uma transação, com um INSERT multi-linha por lote; retorna os IDs na ordem."""
+    batch_size = batch_size or BULK_LEAD_BATCH_SIZE
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    created: List[Lead] = []
+    for start in range(0, len(leads), batch_size):
+        rows = [
+            {
+                "name": lead.name,
+                "email": lead.email,
+                "phone": lead.phone,
+                "source": lead.source,
+                "status": lead.status or "novo",
+                "notes": lead.notes,
+                "created_by_id": created_by_id,
+                "assigned_to_id": assigned_to_id,
+            }
+            for lead in leads[start:start + batch_size]
+        ]
+        # RETURNING traz id e created_at de todo o lote na mesma ida ao banco;
+        # render_nulls mantém as mesmas colunas em todas as linhas (um único INSERT)
+        batch = db.scalars(
+            insert(Lead).returning(Lead, sort_by_parameter_order=not sqlite).execution_options(render_nulls=True),
+            rows
+        ).all()
+        if sqlite:
+            # O SQLite numera as linhas de um INSERT multi-linha em ordem, mas o
+            # RETURNING não garante a ordem (e pedi-la faria um INSERT por linha)
+            batch.sort(key=lambda lead: lead.id)
+        index_leads(db, batch, new=True)
+        created.extend(batch)
+    record_leads_created(db, (lead_rollup_key(lead) for lead in created))
+    ids = [lead.id for lead in created]
+    db.commit()
+    return ids
+
+def copy_leads(db: Session, leads: List[LeadCreate], created_by_id: Optional[int] = None,
+               assigned_to_id: Optional[int] = None) -> int:
+    """Insere vários leads com COPY (PostgreSQL), sem retornar IDs; o commit fica com quem chama."""
+    # created_at vem do relógio do banco, como func.now() gravado numa coluna sem fuso
+    created_at = db.scalar(select(func.localtimestamp()))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for lead in leads:
+        writer.writerow([
+            lead.name, lead.email, lead.phone, lead.source, lead.status or "novo", lead.notes,
+            created_by_id, assigned_to_id, created_at.isoformat()
+        ])
+    buffer.seek(0)
+    
+    copy_sql = (
+        "COPY leads (name, email, phone, source, status, notes, created_by_id, assigned_to_id, created_at) "
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+    
+    # O índice de busca do PostgreSQL é mantido pelo próprio banco; só o agregado é ajustado
+    record_leads_created(db, (
+        (created_at.date(), lead.source or "", lead.status or "novo", assigned_to_id or 0) for lead in leads
+    ))
+    return len(leads)
+
+def get_leads(db: Session, skip: int = 0, limit: int = 100, assigned_to_id: Optional[int] = None,
+              status: Optional[str] = None, cursor: Optional[str] = None):
     """Obtém uma lista de leads."""
-    query = db.query(Client)
+    return get_leads_page(db, skip, limit, assigned_to_id, status, cursor)[0]
+
+def get_leads_page(db: Session, skip: int = 0, limit: int = 100, assigned_to_id: Optional[int] = None,
+                   status: Optional[str] = None, cursor: Optional[str] = None):
+    """Obtém uma página de leads (mais recentes primeiro) e o cursor da próxima."""
+    query = db.query(Lead)
     
     if assigned_to_id:
-        query = query.filter(Client.assigned_to_id == assigned_to_id)
+        query = query.filter(Lead.assigned_to_id == assigned_to_id)
+    
+    if status:
+        query = query.filter(Lead.status == status)
     
-    return query.offset(skip).limit(limit).all()
+    return keyset_paginate(query, Lead.created_at, Lead.id, limit, cursor=cursor, skip=skip)
 
 def get_lead(db: Session, lead_id: int):
     """Obtém um lead pelo ID."""
-    return db.query(Client).filter(Client.id == lead_id).first()
+    return db.query(Lead).filter(Lead.id == lead_id).first()
 
 def update_lead(db: Session, db_lead, lead_in: LeadUpdate):
     """Atualiza um lead."""
+    # O agregado é ajustado a partir dos valores atuais, lidos já com o lock de escrita
+    lock_for_update(db, db_lead)
+    previous_key = lead_rollup_key(db_lead)
     for key, value in lead_in.dict(exclude_unset=True).items():
         setattr(db_lead, key, value)
     
     db.add(db_lead)
+    record_lead_change(db, previous_key, lead_rollup_key(db_lead))
+    index_lead(db, db_lead)
     db.commit()
     db.refresh(db_lead)
     return db_lead
 
 def delete_lead(db: Session, db_lead):
     """Exclui um lead."""
+    lock_for_update(db, db_lead)
+    record_lead_change(db, lead_rollup_key(db_lead), None)
+    unindex_lead(db, db_lead.id)
     db.delete(db_lead)
     db.commit()
     return db_lead
@@ -1,9 +1,7 @@
 from sqlalchemy.orm import Session
 from models_user import User
-from passlib.context import CryptContext
-
-# Configuração do hashing de senha
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from core_security import pwd_context, publish_user_change, revoke_user_tokens
+from pagination import keyset_paginate
 
 def get_user(db: Session, user_id: int):
     """Obtém um usuário pelo ID."""
@@ -13,9 +11,13 @@ def get_user_by_email(db: Session, email: str):
     """Obtém um usuário pelo email."""
     return db.query(User).filter(User.email == email).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
     """Obtém uma lista de usuários."""
-    return db.query(User).offset(skip).limit(limit).all()
+    return get_users_page(db, skip, limit, cursor)[0]
+
+def get_users_page(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    """Obtém uma página de usuários (mais recentes primeiro) e o cursor da próxima."""
+    return keyset_paginate(db.query(User), User.created_at, User.id, limit, cursor=cursor, skip=skip)
 
 def create_user(db: Session, user):
     """Cria um novo usuário."""
@@ -35,12 +37,20 @@ def create_user(db: Session, user):
 def update_user(db: Session, db_user, user_in):
     """Atualiza um usuário existente."""
     update_data = user_in.dict(exclude_unset=True)
+    previous_email = db_user.email
     
     # Se a senha estiver sendo atualizada, hash ela
     if "password" in update_data and update_data["password"]:
         update_data["hashed_password"] = pwd_context.hash(update_data["password"])
         del update_data["password"]
     
+    # Senha, email, ativação e permissões nos tokens revogam os tokens emitidos
+    if "hashed_password" in update_data or any(
+        field in update_data and update_data[field] != getattr(db_user, field)
+        for field in ("email", "is_active", "is_superuser")
+    ):
+        revoke_user_tokens(db_user)
+    
     # Atualiza os atributos do usuário
     for field, value in update_data.items():
         setattr(db_user, field, value)
@@ -48,12 +58,14 @@ def update_user(db: Session, db_user, user_in):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    publish_user_change(db_user, previous_email)
     return db_user
 
 def delete_user(db: Session, db_user):
     """Exclui um usuário."""
     db.delete(db_user)
     db.commit()
+    publish_user_change(db_user, deleted=True)
     return db_user
 
 def verify_password(plain_password, hashed_password):
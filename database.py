@@ -6,25 +6,500 @@ Este módulo configura a conexão com o banco de dados, define a sessão
 e fornece funções para acesso ao banco de dados.
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Any, Callable, Dict, Optional
+from contextlib import contextmanager
+import asyncio
 import os
+import re
+import threading
+import time
+
+import logger
+import query_metrics  # Registra os eventos de contagem de consultas por requisição
 
 # Configuração do banco de dados
 # Prioriza variáveis de ambiente para facilitar o deploy em diferentes ambientes
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./autocred.db")
 
-# Criar engine do SQLAlchemy com configurações específicas para SQLite
-# Para outros bancos de dados, remover connect_args
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-)
+# Perfil do pool de conexões
+# Os valores padrão consideram 4 workers do uvicorn (start.sh) contra o Postgres:
+# 4 x (DB_POOL_SIZE + DB_MAX_OVERFLOW) deve ficar abaixo do max_connections do servidor
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))  # Espera máxima por uma conexão (segundos)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Recicla conexões antigas (segundos, -1 desativa)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Modo de produção do SQLite (apenas para bancos em arquivo)
+# Ativa WAL e pragmas de desempenho em toda conexão, mantém um pool separado
+# para leituras e serializa as escritas em uma única conexão; o BEGIN IMMEDIATE
+# só é emitido na primeira escrita da transação
+SQLITE_PRODUCTION_MODE = os.getenv("SQLITE_PRODUCTION_MODE", "true").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))  # Bytes
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-64000"))  # Negativo = KiB (64 MB)
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", str(DB_POOL_SIZE)))
+
+# Réplica de leitura (opcional) para as rotas somente leitura
+# Sem READ_REPLICA_URL, as leituras usam o banco principal
+READ_REPLICA_URL = os.getenv("READ_REPLICA_URL", "")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))  # Intervalo entre verificações (segundos)
+
+# Drivers assíncronos usados pelas rotas async (aiosqlite e asyncpg)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+}
+
+
+class PoolStats:
+    """
+    Contadores de uso do pool de conexões
+
+    Registra quantas conexões foram obtidas, quanto tempo as requisições
+    esperaram por uma conexão livre e quantas esperas estouraram o timeout.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zera todos os contadores"""
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total_ms = 0.0
+            self.wait_max_ms = 0.0
+
+    def record_checkout(self, wait_ms: float):
+        """Registra uma conexão obtida do pool e o tempo de espera"""
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def record_timeout(self, wait_ms: float):
+        """Registra uma espera que estourou DB_POOL_TIMEOUT"""
+        with self._lock:
+            self.timeouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna uma cópia dos contadores atuais"""
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.wait_total_ms, 3),
+                "wait_avg_ms": round(self.wait_total_ms / attempts, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mede o tempo de espera por conexão e os timeouts
+
+    Cada instância (inclusive as recriadas por engine.dispose()) mantém
+    seus próprios contadores em `self.stats`.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout((time.perf_counter() - start) * 1000)
+            raise
+        self.stats.record_checkout((time.perf_counter() - start) * 1000)
+        return connection
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    """Indica se a URL aponta para um SQLite em memória (sem pool configurável)"""
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+
+def is_sqlite_production_url(url: str) -> bool:
+    """Indica se a URL deve usar o modo de produção do SQLite"""
+    return SQLITE_PRODUCTION_MODE and url.startswith("sqlite") and not _is_sqlite_memory(url)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Aplica WAL e os pragmas de desempenho a cada nova conexão SQLite"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+
+def _set_sqlite_query_only(dbapi_connection, connection_record):
+    """Impede escritas acidentais pelas conexões do pool de leitura"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=1")
+    cursor.close()
+
+
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    """Desativa o BEGIN implícito do driver; o escritor emite o próprio na primeira escrita"""
+    dbapi_connection.isolation_level = None
+
+
+# Instruções que não escrevem (ou que já abrem a transação, ver
+# lock_for_update); as demais abrem a transação de escrita
+_SQLITE_READ_STATEMENT = re.compile(r"\s*(SELECT|PRAGMA|EXPLAIN|BEGIN)\b", re.IGNORECASE)
+
+
+def _sqlite_in_transaction(dbapi_connection) -> bool:
+    # sqlite3 expõe in_transaction direto; no aiosqlite, na conexão do driver
+    return getattr(dbapi_connection, "driver_connection", dbapi_connection).in_transaction
+
+
+def _begin_immediate_on_write(conn, cursor, statement, parameters, context, executemany):
+    """
+    Obtém o lock de escrita (BEGIN IMMEDIATE) antes da primeira escrita da transação
+
+    Leituras anteriores rodam em autocommit, sem lock e sem prender um
+    snapshot; a partir da primeira escrita, tudo fica na mesma transação
+    até o commit ou rollback. O BEGIN respeita o busy_timeout.
+    """
+    if _SQLITE_READ_STATEMENT.match(statement) or _sqlite_in_transaction(conn.connection.dbapi_connection):
+        return
+    cursor.execute("BEGIN IMMEDIATE")
+
+
+def lock_for_update(db: Session, instance):
+    """
+    Relê um registro com o lock de escrita, antes de um read-modify-write
+
+    No escritor do SQLite as leituras rodam sem transação, então um valor
+    lido antes da primeira escrita pode já ter sido alterado por outro
+    worker. Aqui a transação de escrita (BEGIN IMMEDIATE) é aberta antes da
+    releitura; no PostgreSQL a releitura usa SELECT ... FOR UPDATE.
+
+    Args:
+        db: Sessão de escrita
+        instance: Registro carregado pela sessão (descarta alterações não gravadas)
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite":
+        dbapi_connection = connection.connection.dbapi_connection
+        if not _sqlite_in_transaction(dbapi_connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+    db.refresh(instance, with_for_update=True)
+
+
+def configure_sqlite_engine(target_engine, role: str = "writer"):
+    """
+    Registra os eventos do modo de produção do SQLite em uma engine
+
+    Args:
+        target_engine: Engine síncrona ou assíncrona
+        role: "writer" (BEGIN IMMEDIATE na primeira escrita) ou "reader" (query_only)
+
+    Returns:
+        A própria engine, para encadeamento
+    """
+    sync_engine = getattr(target_engine, "sync_engine", target_engine)
+    event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+    if role == "writer":
+        event.listen(sync_engine, "connect", _disable_driver_transactions)
+        event.listen(sync_engine, "before_cursor_execute", _begin_immediate_on_write)
+    else:
+        event.listen(sync_engine, "connect", _set_sqlite_query_only)
+    return target_engine
+
+
+def get_engine_options(url: str) -> Dict[str, Any]:
+    """
+    Monta os argumentos de create_engine para a URL informada
+
+    Args:
+        url: URL de conexão do SQLAlchemy
+
+    Returns:
+        Dicionário com connect_args e, quando aplicável, o perfil do pool
+    """
+    options: Dict[str, Any] = {
+        "connect_args": {"check_same_thread": False} if url.startswith("sqlite") else {},
+    }
+    # SQLite em memória usa um pool próprio (uma conexão por thread)
+    if _is_sqlite_memory(url):
+        return options
+
+    options.update({
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    })
+    return options
+
+
+def get_engine(url: Optional[str] = None, **overrides):
+    """
+    Cria uma engine do SQLAlchemy com o perfil de pool configurado
+
+    Args:
+        url: URL de conexão (padrão: DATABASE_URL)
+        **overrides: Argumentos que substituem os valores do perfil
+
+    Returns:
+        Engine: Engine configurada
+    """
+    url = url or DATABASE_URL
+    options = get_engine_options(url)
+    # Pools sem fila (ex.: NullPool nas migrações) não aceitam o perfil de tamanho
+    poolclass = overrides.get("poolclass")
+    if poolclass is not None and not issubclass(poolclass, QueuePool):
+        for key in ("pool_size", "max_overflow", "pool_timeout"):
+            options.pop(key, None)
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+def get_async_url(url: str) -> str:
+    """
+    Converte uma URL síncrona para o driver assíncrono equivalente
+
+    Args:
+        url: URL de conexão do SQLAlchemy (ex.: postgresql://...)
+
+    Returns:
+        URL com o driver assíncrono (ex.: postgresql+asyncpg://...)
+    """
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+def get_async_engine(url: Optional[str] = None, **overrides):
+    """
+    Cria uma AsyncEngine com o mesmo perfil de pool da engine síncrona
+
+    Args:
+        url: URL de conexão síncrona ou assíncrona (padrão: DATABASE_URL)
+        **overrides: Argumentos que substituem os valores do perfil
+
+    Returns:
+        AsyncEngine: Engine assíncrona configurada
+    """
+    url = get_async_url(url or DATABASE_URL)
+    options: Dict[str, Any] = {}
+    if not _is_sqlite_memory(url):
+        options.update({
+            "poolclass": AsyncAdaptedQueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        })
+    options.update(overrides)
+    return create_async_engine(url, **options)
+
+
+def measure_replica_lag(connection) -> float:
+    """
+    Mede o atraso de replicação de uma conexão com a réplica
+
+    Args:
+        connection: Conexão aberta com a réplica
+
+    Returns:
+        Atraso em segundos; 0 quando o banco não é uma réplica em streaming
+        (ex.: SQLite ou um segundo Postgres independente em testes locais)
+    """
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    lag = connection.execute(text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )).scalar()
+    return float(lag) if lag is not None else 0.0
+
+
+class ReplicaRouter:
+    """
+    Decide se as leituras vão para a réplica ou para o banco principal
+
+    A réplica é verificada no máximo uma vez por `check_interval` segundos.
+    Se estiver inacessível ou com atraso acima de `max_lag_seconds`, as
+    leituras voltam para o banco principal até a próxima verificação.
+    """
+    def __init__(
+        self,
+        replica_engine=None,
+        max_lag_seconds: float = REPLICA_MAX_LAG_SECONDS,
+        check_interval: float = REPLICA_CHECK_INTERVAL,
+        lag_probe: Callable[[Any], float] = measure_replica_lag
+    ):
+        self.replica_engine = replica_engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._healthy = False
+        self.last_lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def check_due(self) -> bool:
+        """Indica se a réplica precisa ser verificada novamente"""
+        if self.replica_engine is None:
+            return False
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def check(self) -> bool:
+        """
+        Verifica conectividade e atraso da réplica
+
+        Returns:
+            True se a réplica pode atender leituras
+        """
+        healthy, lag, error = False, None, None
+        try:
+            with self.replica_engine.connect() as connection:
+                lag = self.lag_probe(connection)
+            healthy = lag <= self.max_lag_seconds
+            if not healthy:
+                error = f"atraso de {lag:.1f}s acima do limite de {self.max_lag_seconds}s"
+        except Exception as e:
+            error = str(e)
+
+        if healthy != self._healthy:
+            log_method = logger.info if healthy else logger.warning
+            log_method(
+                "Réplica de leitura disponível" if healthy else "Réplica de leitura indisponível, usando banco principal",
+                {"lag_seconds": lag, "error": error}
+            )
+        self._healthy, self.last_lag, self.last_error = healthy, lag, error
+        self._checked_at = time.monotonic()
+        return healthy
+
+    def mark_unhealthy(self, error: str):
+        """Desvia as leituras para o banco principal até a próxima verificação"""
+        if self._healthy:
+            logger.warning("Falha na réplica de leitura, usando banco principal", {"error": error})
+        self._healthy = False
+        self.last_error = error
+        self._checked_at = time.monotonic()
+
+    def use_replica(self) -> bool:
+        """
+        Indica se a próxima leitura deve usar a réplica
+
+        Apenas uma thread executa a verificação; as demais usam o último resultado.
+        """
+        if self.replica_engine is None:
+            self.primary_reads += 1
+            return False
+        if self.check_due() and self._lock.acquire(blocking=False):
+            try:
+                if self.check_due():
+                    self.check()
+            finally:
+                self._lock.release()
+        if self._healthy:
+            self.replica_reads += 1
+        else:
+            self.primary_reads += 1
+        return self._healthy
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna o estado da réplica e a distribuição das leituras"""
+        return {
+            "configured": self.replica_engine is not None,
+            "healthy": self._healthy,
+            "lag_seconds": self.last_lag,
+            "max_lag_seconds": self.max_lag_seconds,
+            "last_error": self.last_error,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+# Criar engine do SQLAlchemy com o perfil de pool definido pelas variáveis de ambiente
+# No modo de produção do SQLite, a engine principal é o escritor serializado:
+# uma única conexão, e as demais requisições de escrita aguardam no pool
+SQLITE_WRITER_POOL = {"pool_size": 1, "max_overflow": 0}
+if is_sqlite_production_url(DATABASE_URL):
+    engine = configure_sqlite_engine(get_engine(DATABASE_URL, **SQLITE_WRITER_POOL), "writer")
+    sqlite_read_engine = configure_sqlite_engine(
+        get_engine(DATABASE_URL, pool_size=SQLITE_READ_POOL_SIZE), "reader"
+    )
+else:
+    engine = get_engine(DATABASE_URL)
+    sqlite_read_engine = None
+# Conexões disponíveis para leituras no banco principal (base para dimensionar
+# os workers que abrem sessões de leitura próprias)
+READ_POOL_SIZE = SQLITE_READ_POOL_SIZE if sqlite_read_engine is not None else DB_POOL_SIZE
 
 # Criar sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessão de leitura no banco principal: o pool de leitura do SQLite quando ativo
+PrimaryReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=sqlite_read_engine)
+    if sqlite_read_engine is not None else SessionLocal
+)
+
+# Engine e sessão assíncronas para rotas `async def`, que não podem bloquear o event loop
+# ASYNC_DATABASE_URL permite apontar para outro driver; por padrão deriva de DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", get_async_url(DATABASE_URL))
+if is_sqlite_production_url(ASYNC_DATABASE_URL):
+    async_engine = configure_sqlite_engine(
+        get_async_engine(ASYNC_DATABASE_URL, **SQLITE_WRITER_POOL), "writer"
+    )
+    async_sqlite_read_engine = configure_sqlite_engine(
+        get_async_engine(ASYNC_DATABASE_URL, pool_size=SQLITE_READ_POOL_SIZE), "reader"
+    )
+else:
+    async_engine = get_async_engine(ASYNC_DATABASE_URL)
+    async_sqlite_read_engine = None
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncPrimaryReadSessionLocal = (
+    sessionmaker(bind=async_sqlite_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if async_sqlite_read_engine is not None else AsyncSessionLocal
+)
+
+# Engines e sessões da réplica de leitura (quando configurada)
+replica_engine = get_engine(READ_REPLICA_URL) if READ_REPLICA_URL else None
+ReadSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else SessionLocal
+)
+async_replica_engine = get_async_engine(READ_REPLICA_URL) if READ_REPLICA_URL else None
+AsyncReadSessionLocal = (
+    sessionmaker(bind=async_replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if async_replica_engine is not None else AsyncSessionLocal
+)
+replica_router = ReplicaRouter(replica_engine)
+
 # Base para modelos declarativos
 Base = declarative_base()
 
@@ -47,6 +522,138 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Função para obter uma sessão assíncrona do banco de dados
+
+    Yields:
+        AsyncSession: Sessão assíncrona do banco de dados
+
+    Note:
+        Deve ser usada pelas rotas `async def`; as consultas são aguardadas
+        com `await`, liberando o event loop enquanto o banco responde
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db():
+    """
+    Função para obter uma sessão somente leitura do banco de dados
+
+    Yields:
+        Session: Sessão da réplica de leitura, ou do banco principal quando
+        a réplica não está configurada, está inacessível ou atrasada
+        (no modo de produção do SQLite, o pool de leitura do arquivo principal)
+
+    Note:
+        Use apenas em rotas que não escrevem no banco de dados
+    """
+    use_replica = replica_router.use_replica()
+    db = ReadSessionLocal() if use_replica else PrimaryReadSessionLocal()
+    try:
+        yield db
+    except OperationalError as e:
+        if use_replica:
+            replica_router.mark_unhealthy(str(e))
+        raise
+    finally:
+        db.close()
+
+
+@contextmanager
+def statement_timeout(db: Session, seconds: float):
+    """
+    Limita o tempo das consultas da sessão dentro do bloco
+
+    No PostgreSQL usa SET LOCAL statement_timeout, que vale para cada
+    consulta até o fim da transação. No SQLite, um progress handler
+    interrompe a consulta em andamento quando o prazo do bloco termina.
+    Em outros bancos, não tem efeito.
+
+    Args:
+        db: Sessão (o limite é aplicado na conexão que ela usa)
+        seconds: Tempo máximo em segundos
+
+    Raises:
+        OperationalError: Quando uma consulta passa do limite
+    """
+    connection = db.connection()
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text(f"SET LOCAL statement_timeout = {max(1, int(seconds * 1000))}"))
+        yield
+        return
+    if dialect != "sqlite":
+        yield
+        return
+
+    driver_connection = connection.connection.driver_connection
+    deadline = time.monotonic() + seconds
+    # Chamado a cada N instruções da VM do SQLite; valor verdadeiro interrompe a consulta
+    driver_connection.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+    try:
+        yield
+    finally:
+        driver_connection.set_progress_handler(None, 0)
+
+
+async def get_async_read_db():
+    """
+    Função para obter uma sessão assíncrona somente leitura do banco de dados
+
+    Yields:
+        AsyncSession: Sessão da réplica de leitura ou do banco principal,
+        com as mesmas regras de get_read_db
+
+    Note:
+        A verificação periódica da réplica roda em uma thread para não
+        bloquear o event loop
+    """
+    if replica_router.check_due():
+        use_replica = await asyncio.to_thread(replica_router.use_replica)
+    else:
+        use_replica = replica_router.use_replica()
+    session_factory = AsyncReadSessionLocal if use_replica else AsyncPrimaryReadSessionLocal
+    async with session_factory() as db:
+        try:
+            yield db
+        except OperationalError as e:
+            if use_replica:
+                replica_router.mark_unhealthy(str(e))
+            raise
+
+
+def get_pool_stats(target_engine=None) -> Dict[str, Any]:
+    """
+    Retorna o estado atual do pool de conexões
+
+    Args:
+        target_engine: Engine a inspecionar (padrão: engine principal)
+
+    Returns:
+        Dicionário com tamanho do pool, conexões em uso, overflow,
+        tempo de espera por conexão e quantidade de timeouts
+    """
+    pool = (target_engine or engine).pool
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.stats.snapshot())
+
+    return stats
+
+
 def create_db_and_tables():
     """
     Função para criar o banco de dados e tabelas
@@ -6,12 +6,13 @@ Este módulo implementa handlers de exceções e utilitários para
 garantir um tratamento de erros robusto e consistente.
 """
 
-from fastapi import Request, status
+from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from jose.exceptions import JWTError
 from typing import Dict, Any, Optional, Callable, Type
+import functools
 
 import logger
 
@@ -25,12 +26,14 @@ class AutocredError(Exception):
         message: str, 
         status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR,
         error_code: str = "internal_error",
-        details: Optional[Dict[str, Any]] = None
+        details: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
     ):
         self.message = message
         self.status_code = status_code
         self.error_code = error_code
         self.details = details or {}
+        self.headers = headers
         super().__init__(self.message)
 
 
@@ -92,6 +95,30 @@ class DatabaseError(AutocredError):
         )
 
 
+class RateLimitError(AutocredError):
+    """Erro para clientes que excederam um limite de requisições"""
+    def __init__(self, message: str, retry_after: int = 60, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            error_code="rate_limited",
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class ServiceUnavailableError(AutocredError):
+    """Erro para serviços temporariamente sobrecarregados"""
+    def __init__(self, message: str, retry_after: int = 1, details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            error_code="service_unavailable",
+            details=details,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
 # Handlers para exceções específicas
 async def autocred_exception_handler(request: Request, exc: AutocredError) -> JSONResponse:
     """
@@ -119,7 +146,8 @@ async def autocred_exception_handler(request: Request, exc: AutocredError) -> JS
             "message": exc.message,
             "error_code": exc.error_code,
             "details": exc.details
-        }
+        },
+        headers=exc.headers
     )
 
 
@@ -304,11 +332,13 @@ def handle_errors(
         Decorador configurado
     """
     def decorator(func):
+        # wraps preserva a assinatura, usada pelo FastAPI para montar as dependências
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             try:
                 return await func(*args, **kwargs)
-            except AutocredError:
-                # Exceções personalizadas já têm tratamento adequado
+            except (AutocredError, HTTPException):
+                # Exceções personalizadas e HTTP já têm tratamento adequado
                 raise
             except SQLAlchemyError as e:
                 # Converter para DatabaseError
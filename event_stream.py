@@ -0,0 +1,161 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Distribuição de eventos via Server-Sent Events (SSE)
+
+Este módulo mantém os assinantes de streams SSE deste worker, agrupados
+(por exemplo, por perfil de acesso). Um evento publicado para um grupo é
+calculado uma vez e copiado para a fila de cada assinante.
+
+- Limite de conexões: acima de max_connections, novas assinaturas recebem
+  503 com Retry-After.
+- Contrapressão: cada assinante tem uma fila limitada. Se um cliente lento
+  deixa a fila encher, ela é descartada e substituída por um evento de
+  ressincronização (o estado completo), então o cliente nunca fica com
+  deltas faltando.
+- Heartbeat: sem eventos por heartbeat_seconds, um comentário SSE é enviado
+  para manter a conexão aberta em proxies e detectar clientes desconectados.
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, AsyncIterator, Dict, Hashable, Optional, Set
+
+import logger
+from error_handlers import ServiceUnavailableError
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Formata um evento SSE com dados em JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscriber:
+    """Assinante de um grupo, com fila própria e limitada"""
+
+    def __init__(self, group: Hashable, queue_size: int):
+        self.group = group
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+
+class EventBroadcaster:
+    """
+    Distribui eventos SSE para os assinantes deste worker
+
+    Args:
+        name: Nome do stream nas métricas e logs
+        max_connections: Máximo de assinantes simultâneos no worker
+        queue_size: Eventos pendentes por assinante antes da ressincronização
+        heartbeat_seconds: Intervalo máximo sem envio antes de um heartbeat
+    """
+
+    def __init__(self, name: str, max_connections: int = 100, queue_size: int = 8, heartbeat_seconds: float = 15.0):
+        self.name = name
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._groups: Dict[Hashable, Set[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.rejected = 0
+        self.resyncs = 0
+
+    @property
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._groups.values())
+
+    def groups(self):
+        """Grupos com ao menos um assinante"""
+        with self._lock:
+            return [group for group, subscribers in self._groups.items() if subscribers]
+
+    def subscribe(self, group: Hashable) -> Subscriber:
+        """
+        Registra um assinante no grupo
+
+        Raises:
+            ServiceUnavailableError: Se o worker já atingiu max_connections
+        """
+        with self._lock:
+            if sum(len(subscribers) for subscribers in self._groups.values()) >= self.max_connections:
+                self.rejected += 1
+                raise ServiceUnavailableError(
+                    message="Limite de conexões em tempo real atingido; tente novamente em instantes",
+                    retry_after=30,
+                    details={"stream": self.name}
+                )
+            subscriber = Subscriber(group, self.queue_size)
+            self._groups.setdefault(group, set()).add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """Remove o assinante (chamado ao encerrar a conexão)"""
+        with self._lock:
+            subscribers = self._groups.get(subscriber.group)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._groups[subscriber.group]
+
+    def publish(self, group: Hashable, message: str, resync_message: Optional[str] = None):
+        """
+        Enfileira uma mensagem SSE para todos os assinantes do grupo
+
+        Deve ser chamado no event loop dos assinantes.
+
+        Args:
+            group: Grupo de destino
+            message: Evento já formatado (format_sse)
+            resync_message: Evento com o estado completo, enviado no lugar da
+                fila de um assinante que não está acompanhando
+        """
+        with self._lock:
+            subscribers = list(self._groups.get(group, ()))
+        self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.queue.put_nowait(resync_message or message)
+                subscriber.resyncs += 1
+                self.resyncs += 1
+                logger.warning(f"Assinante lento no stream {self.name}; fila substituída", {"group": str(group)})
+
+    async def events(self, subscriber: Subscriber, initial: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Gera as mensagens do assinante, com heartbeat, até a desconexão
+
+        Args:
+            subscriber: Assinante retornado por subscribe
+            initial: Mensagem enviada logo após a conexão
+        """
+        try:
+            yield f"retry: {int(self.heartbeat_seconds * 1000)}\n\n"
+            if initial is not None:
+                yield initial
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna conexões e contadores do stream"""
+        with self._lock:
+            groups = {str(group): len(subscribers) for group, subscribers in self._groups.items()}
+        return {
+            "connections": sum(groups.values()),
+            "max_connections": self.max_connections,
+            "groups": groups,
+            "published": self.published,
+            "rejected": self.rejected,
+            "resyncs": self.resyncs,
+        }
@@ -0,0 +1,366 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Importação de leads em CSV ou NDJSON
+
+Este módulo importa arquivos grandes de leads com memória constante: o
+corpo da requisição é lido em pedaços, as linhas são interpretadas uma a
+uma e validadas com LeadCreate, e os leads válidos são gravados em blocos
+de LEAD_IMPORT_CHUNK_SIZE, cada bloco na sua própria transação. Em memória
+ficam apenas alguns pedaços do corpo em trânsito e um bloco de leads.
+
+- PostgreSQL: cada bloco é gravado com COPY (crud_lead.copy_leads).
+- Demais bancos: INSERT multi-linha em lotes (crud_lead.create_leads_bulk),
+  que também atualiza o índice de busca do SQLite.
+
+O andamento fica num job (ImportJob), gravado na tabela lead_imports a
+cada bloco, para que qualquer worker o consulte pelo id enquanto o envio
+acontece. Jobs terminados são removidos após LEAD_IMPORT_JOB_TTL segundos.
+
+CSV: a primeira linha traz os nomes das colunas (name, email, phone,
+source, status, notes); colunas desconhecidas são ignoradas e células
+vazias contam como ausentes. NDJSON: um objeto JSON por linha.
+"""
+
+import codecs
+import csv
+import json
+import os
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import delete, update
+
+import logger
+from crud_lead import copy_leads, create_leads_bulk
+from database import PrimaryReadSessionLocal, SessionLocal
+from error_handlers import NotFoundError, ValidationError
+from models_lead import LeadImport
+from schemas_lead import LeadCreate
+
+FORMATS = ("csv", "ndjson")
+
+# Leads gravados por transação
+IMPORT_CHUNK_SIZE = int(os.getenv("LEAD_IMPORT_CHUNK_SIZE", "1000"))
+# Erros detalhados guardados por job (os demais só entram na contagem)
+IMPORT_MAX_ERRORS = int(os.getenv("LEAD_IMPORT_MAX_ERRORS", "100"))
+# Pedaços do corpo aguardando processamento; com a fila cheia, a leitura
+# da requisição espera (contrapressão)
+IMPORT_QUEUE_CHUNKS = int(os.getenv("LEAD_IMPORT_QUEUE_CHUNKS", "8"))
+# Tamanho máximo de uma linha (caracteres); limita a memória de um arquivo sem quebras
+IMPORT_MAX_LINE_LENGTH = int(os.getenv("LEAD_IMPORT_MAX_LINE_LENGTH", str(1024 * 1024)))
+# Importações simultâneas por worker; acima disso o envio recebe 503
+IMPORT_MAX_CONCURRENT = int(os.getenv("LEAD_IMPORT_MAX_CONCURRENT", "4"))
+# run_import passa a maior parte do tempo esperando o corpo na fila: num pool
+# próprio, ele não ocupa as threads do executor padrão do event loop, de que
+# o próprio envio (e o resto do processo) precisa para avançar
+import_executor = ThreadPoolExecutor(max_workers=IMPORT_MAX_CONCURRENT, thread_name_prefix="lead-import")
+import_slots = threading.BoundedSemaphore(IMPORT_MAX_CONCURRENT)
+# Tempo em que um job terminado continua consultável
+IMPORT_JOB_TTL = float(os.getenv("LEAD_IMPORT_JOB_TTL", "3600"))
+
+# Marcador de envio interrompido na fila de pedaços (o fim normal é None)
+ABORTED = object()
+
+
+class ImportJob:
+    """
+    Andamento de uma importação
+
+    Args:
+        format: "csv" ou "ndjson"
+        created_by_id: Usuário dono do job (e criador dos leads)
+        assigned_to_id: Responsável pelos leads importados (None para nenhum)
+    """
+    def __init__(self, format: str, created_by_id: Optional[int], assigned_to_id: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.format = format
+        self.created_by_id = created_by_id
+        self.assigned_to_id = assigned_to_id
+        self.status = "pending"  # pending, running, completed, failed
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row: LeadImport) -> "ImportJob":
+        job = cls(row.format, row.created_by_id, row.assigned_to_id)
+        job.id = row.id
+        job.status = row.status
+        job.processed, job.created, job.failed = row.processed, row.created, row.failed
+        job.errors = list(row.errors or [])
+        job.error = row.error
+        # O SQLite devolve as datas sem fuso; são gravadas em UTC
+        job.created_at, job.started_at, job.finished_at = (
+            value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+            for value in (row.created_at, row.started_at, row.finished_at)
+        )
+        return job
+
+    def progress(self) -> Dict[str, Any]:
+        """Colunas de lead_imports que mudam durante a importação"""
+        return {
+            "status": self.status,
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": list(self.errors),
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def add_error(self, line: int, errors: Dict[str, str]):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "errors": errors})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": list(self.errors),
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def create_job(format: str, created_by_id: Optional[int], assigned_to_id: Optional[int] = None,
+               session_factory=None) -> ImportJob:
+    """
+    Registra um job de importação pendente e remove os jobs expirados
+
+    Raises:
+        ValidationError: Se o formato não for suportado
+    """
+    if format not in FORMATS:
+        raise ValidationError(
+            f"Formato de importação inválido: {format}",
+            field_errors={"format": f"Use {' ou '.join(FORMATS)}"}
+        )
+    job = ImportJob(format, created_by_id, assigned_to_id)
+    db = (session_factory or SessionLocal)()
+    try:
+        expired_before = job.created_at - timedelta(seconds=IMPORT_JOB_TTL)
+        db.execute(delete(LeadImport).where(LeadImport.finished_at < expired_before))
+        db.add(LeadImport(id=job.id, format=job.format, created_by_id=job.created_by_id,
+                          assigned_to_id=job.assigned_to_id,
+                          created_at=job.created_at, **job.progress()))
+        db.commit()
+    finally:
+        db.close()
+    return job
+
+
+def get_job(job_id: str, session_factory=None) -> ImportJob:
+    """
+    Obtém um job de importação pelo id, lendo do primário (o andamento muda a cada bloco)
+
+    Raises:
+        NotFoundError: Se o job não existir (ou já tiver expirado)
+    """
+    db = (session_factory or PrimaryReadSessionLocal)()
+    try:
+        row = db.get(LeadImport, job_id)
+        job = ImportJob.from_row(row) if row is not None else None
+    finally:
+        db.close()
+    expired = (
+        job is not None and job.finished_at is not None
+        and job.finished_at < datetime.now(timezone.utc) - timedelta(seconds=IMPORT_JOB_TTL)
+    )
+    if job is None or expired:
+        raise NotFoundError(message="Importação não encontrada", resource_type="lead_import", resource_id=job_id)
+    return job
+
+
+def save_job(job: ImportJob, session_factory=None):
+    """Grava o andamento do job em lead_imports"""
+    db = (session_factory or SessionLocal)()
+    try:
+        db.execute(update(LeadImport).where(LeadImport.id == job.id).values(**job.progress()))
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_job(job: ImportJob, session_factory=None):
+    """
+    Marca o job como em andamento, se ainda estiver pendente
+
+    A troca é condicional no banco, para que dois envios simultâneos do
+    mesmo job (em workers diferentes) não sejam aceitos.
+
+    Raises:
+        ValidationError: Se o job já tiver recebido um arquivo
+    """
+    db = (session_factory or SessionLocal)()
+    try:
+        result = db.execute(
+            update(LeadImport)
+            .where(LeadImport.id == job.id, LeadImport.status == "pending")
+            .values(status="running")
+        )
+        db.commit()
+    finally:
+        db.close()
+    if result.rowcount != 1:
+        raise ValidationError("Esta importação já recebeu um arquivo", field_errors={"job_id": job.status})
+    job.status = "running"
+
+
+def iter_queue(chunks: "queue.Queue") -> Iterator[bytes]:
+    """
+    Pedaços do corpo enviados pela requisição, até o marcador None
+
+    Raises:
+        ValueError: Se a requisição enviar ABORTED (corpo interrompido)
+    """
+    while True:
+        data = chunks.get()
+        if data is None:
+            return
+        if data is ABORTED:
+            raise ValueError("Envio do arquivo interrompido")
+        yield data
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Decodifica os pedaços (UTF-8, com ou sem BOM) e gera as linhas, com a quebra de linha
+
+    Raises:
+        ValueError: Se uma linha passar de IMPORT_MAX_LINE_LENGTH caracteres
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for data in chunks:
+        # O trecho depois da última quebra pode estar incompleto; espera o próximo pedaço
+        *lines, pending = (pending + decoder.decode(data)).split("\n")
+        for line in lines:
+            yield line + "\n"
+        if len(pending) > IMPORT_MAX_LINE_LENGTH:
+            raise ValueError(f"Linha com mais de {IMPORT_MAX_LINE_LENGTH} caracteres")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_records(format: str, lines: Iterable[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Gera (número da linha, registro) para cada lead do arquivo
+
+    O registro é um dicionário ou, se a linha não puder ser lida, a mensagem
+    de erro.
+    """
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, {
+                key: value for key, value in row.items()
+                if key is not None and value not in (None, "")
+            }
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"JSON inválido: {e}"
+            continue
+        yield line_number, record if isinstance(record, dict) else "Cada linha deve ser um objeto JSON"
+
+
+def _write_chunk(job: ImportJob, leads: List[LeadCreate], session_factory):
+    db = session_factory()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            copy_leads(db, leads, created_by_id=job.created_by_id, assigned_to_id=job.assigned_to_id)
+            db.commit()
+        else:
+            create_leads_bulk(db, leads, created_by_id=job.created_by_id, assigned_to_id=job.assigned_to_id)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    job.created += len(leads)
+
+
+def run_import(job: ImportJob, chunks: Iterable[bytes], session_factory=None) -> ImportJob:
+    """
+    Processa o arquivo de um job, gravando os leads válidos em blocos
+
+    Roda numa thread; o corpo chega por `chunks`. Se a gravação falhar ou o
+    envio for interrompido, o job termina como "failed": os blocos já
+    gravados permanecem, o bloco pendente e a linha incompleta são
+    descartados e o restante do corpo é lido, para a requisição terminar
+    normalmente. O andamento é gravado em lead_imports a cada bloco.
+
+    Args:
+        job: Job criado por create_job
+        chunks: Pedaços do corpo da requisição
+        session_factory: Fábrica de sessões de escrita, dos leads e do andamento (padrão: SessionLocal)
+
+    Returns:
+        O próprio job, atualizado
+    """
+    chunks = iter(chunks)
+    session_factory = session_factory or SessionLocal
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    pending: List[LeadCreate] = []
+    try:
+        save_job(job, session_factory)
+        for line, record in iter_records(job.format, iter_lines(chunks)):
+            job.processed += 1
+            if isinstance(record, str):
+                job.add_error(line, {"line": record})
+                continue
+            try:
+                pending.append(LeadCreate.model_validate(record))
+            except PydanticValidationError as e:
+                job.add_error(line, {".".join(str(loc) for loc in error["loc"]): error["msg"] for error in e.errors()})
+                continue
+            if len(pending) >= IMPORT_CHUNK_SIZE:
+                _write_chunk(job, pending, session_factory)
+                save_job(job, session_factory)
+                pending = []
+        if pending:
+            _write_chunk(job, pending, session_factory)
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        logger.error("Falha na importação de leads", {"job_id": job.id, "created": job.created, "error": str(e)})
+    finally:
+        try:
+            for _ in chunks:
+                pass
+        except ValueError:
+            # Envio interrompido depois de uma falha: não há mais o que ler
+            pass
+        job.finished_at = datetime.now(timezone.utc)
+        save_job(job, session_factory)
+
+    logger.info("Importação de leads concluída", {
+        "job_id": job.id, "status": job.status, "processed": job.processed,
+        "created": job.created, "failed": job.failed
+    })
+    return job
@@ -0,0 +1,183 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Busca textual de leads
+
+Este módulo mantém e consulta o índice de busca de leads por nome, email e
+telefone, aceitando trechos parciais de cada campo. O telefone também é
+indexado só com dígitos, então "99999-1234" e "999991234" encontram o mesmo
+lead.
+
+- SQLite: tabela virtual FTS5 leads_fts com tokenizer trigram, criada junto
+  com a tabela leads (models_lead) ou pela migration 0006. O crud_lead
+  atualiza a linha do lead na mesma transação da escrita. Resultados
+  ordenados pelo campo encontrado (nome, depois email, depois telefone);
+  o bm25 não é usado porque conta, a cada busca, os documentos de cada
+  termo no índice inteiro, e o custo cresceria com a tabela.
+- PostgreSQL: índice GIN pg_trgm sobre a expressão SEARCH_DOCUMENT_SQL
+  (migration 0006), mantido pelo próprio banco. Resultados ordenados por
+  word_similarity.
+
+Cada termo precisa de ao menos MIN_TERM_LENGTH caracteres (um trigrama);
+um lead é retornado quando contém todos os termos. A relevância é calculada
+só sobre os LEAD_SEARCH_RANK_CANDIDATES resultados mais recentes, então uma
+busca ampla custa o mesmo que uma específica.
+"""
+
+import os
+import re
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from error_handlers import ValidationError
+from models_lead import LEAD_SEARCH_TABLE as FTS_TABLE, Lead
+
+# Tamanho mínimo de um termo (um trigrama) e máximo de termos por busca
+MIN_TERM_LENGTH = 3
+MAX_TERMS = 8
+
+# Resultados mais recentes considerados na ordenação por relevância
+RANK_CANDIDATES = int(os.getenv("LEAD_SEARCH_RANK_CANDIDATES", "200"))
+
+# Peso de cada campo onde o termo aparece, na ordenação do SQLite
+_FIELD_WEIGHTS = (
+    ("lower(leads.name)", 3),
+    ("lower(leads.email)", 2),
+    ("(coalesce(leads.phone, '') || ' ' || found.phone_digits)", 1),
+)
+
+# Documento indexado no PostgreSQL; a consulta precisa repetir exatamente a
+# expressão do índice para que ele seja usado
+SEARCH_DOCUMENT_SQL = (
+    "(coalesce(leads.name, '') || ' ' || coalesce(leads.email, '') || ' ' || "
+    "coalesce(leads.phone, '') || ' ' || regexp_replace(coalesce(leads.phone, ''), '[^0-9]', '', 'g'))"
+)
+
+
+def _uses_fts(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def phone_digits(phone: Optional[str]) -> str:
+    """Telefone só com dígitos"""
+    return re.sub(r"\D", "", phone or "")
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Separa a busca em termos indexáveis
+
+    Raises:
+        ValidationError: Se nenhum termo tiver MIN_TERM_LENGTH caracteres
+    """
+    terms = [term for term in query.split() if len(term) >= MIN_TERM_LENGTH]
+    if not terms:
+        raise ValidationError(
+            "Informe ao menos um termo de busca",
+            field_errors={"q": f"Cada termo precisa de pelo menos {MIN_TERM_LENGTH} caracteres"}
+        )
+    return terms[:MAX_TERMS]
+
+
+def index_leads(db: Session, leads: Iterable[Lead], new: bool = False):
+    """
+    Grava (ou substitui) leads no índice de busca, na transação atual
+
+    Os leads já devem ter id (após flush). Com `new`, os leads acabaram de
+    ser inseridos e a remoção de linhas anteriores é pulada. Fora do SQLite
+    não tem efeito.
+    """
+    if not _uses_fts(db):
+        return
+    rows = [
+        {"id": lead.id, "name": lead.name, "email": lead.email, "phone": lead.phone, "digits": phone_digits(lead.phone)}
+        for lead in leads
+    ]
+    if not rows:
+        return
+    if not new:
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), rows)
+    db.execute(text(
+        f"INSERT INTO {FTS_TABLE} (rowid, name, email, phone, phone_digits) "
+        "VALUES (:id, :name, :email, :phone, :digits)"
+    ), rows)
+
+
+def index_lead(db: Session, lead: Lead):
+    """Grava (ou substitui) um lead no índice de busca"""
+    index_leads(db, [lead])
+
+
+def unindex_lead(db: Session, lead_id: int):
+    """Remove um lead do índice de busca, na transação atual"""
+    if _uses_fts(db):
+        db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": lead_id})
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_leads(db: Session, query: str, limit: int = 20, assigned_to_id: Optional[int] = None) -> List[Lead]:
+    """
+    Busca leads por trechos de nome, email ou telefone
+
+    Args:
+        db: Sessão do banco de dados
+        query: Texto digitado; termos separados por espaço
+        limit: Máximo de resultados
+        assigned_to_id: Restringe aos leads do responsável
+
+    Returns:
+        Leads que contêm todos os termos, do mais relevante para o menos
+
+    Raises:
+        ValidationError: Se nenhum termo tiver o tamanho mínimo
+    """
+    terms = search_terms(query)
+    params = {"candidates": RANK_CANDIDATES, "limit": limit}
+    owner_filter = ""
+    if assigned_to_id is not None:
+        params["assigned_to_id"] = assigned_to_id
+        owner_filter = "AND leads.assigned_to_id = :assigned_to_id"
+
+    if _uses_fts(db):
+        # Cada termo vira uma frase FTS5 (aspas escapadas); termos juntos = AND
+        params["match"] = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        # Sem filtro de responsável, os candidatos saem só do índice; o JOIN
+        # com leads fica para as linhas finais
+        owner_join = f"JOIN leads ON leads.id = {FTS_TABLE}.rowid" if owner_filter else ""
+        candidates = f"""
+            SELECT {FTS_TABLE}.rowid AS id, {FTS_TABLE}.phone_digits AS phone_digits
+            FROM {FTS_TABLE} {owner_join}
+            WHERE {FTS_TABLE} MATCH :match {owner_filter}
+            ORDER BY {FTS_TABLE}.rowid DESC LIMIT :candidates
+        """
+        scores = []
+        for position, term in enumerate(terms):
+            params[f"term_{position}"] = term.lower()
+            scores.extend(
+                f"{weight} * (instr({field}, :term_{position}) > 0)" for field, weight in _FIELD_WEIGHTS
+            )
+        relevance = f"({' + '.join(scores)}) DESC"
+    else:
+        conditions = []
+        for position, term in enumerate(terms):
+            params[f"term_{position}"] = f"%{_escape_like(term)}%"
+            conditions.append(f"{SEARCH_DOCUMENT_SQL} ILIKE :term_{position}")
+        params["query"] = " ".join(terms)
+        candidates = f"""
+            SELECT leads.id AS id FROM leads
+            WHERE {" AND ".join(conditions)} {owner_filter}
+            ORDER BY leads.id DESC LIMIT :candidates
+        """
+        relevance = f"word_similarity(:query, {SEARCH_DOCUMENT_SQL}) DESC"
+
+    statement = text(f"""
+        WITH found AS ({candidates})
+        SELECT leads.* FROM found JOIN leads ON leads.id = found.id
+        ORDER BY {relevance}, leads.id DESC
+        LIMIT :limit
+    """)
+    return db.query(Lead).from_statement(statement).params(**params).all()
@@ -15,10 +15,13 @@ import traceback
 from datetime import datetime
 from typing import Dict, Any, Optional, Union
 
+import query_metrics
+
 # Configuração básica do logger
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # 'json' ou 'text'
 LOG_FILE = os.getenv("LOG_FILE", "")  # Se vazio, logs vão para stdout
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")  # Header Server-Timing com tempo de banco
 
 # Mapeamento de níveis de log
 LOG_LEVELS = {
@@ -201,9 +204,14 @@ def log_function(level: str = "info"):
 class RequestLoggingMiddleware:
     """
     Middleware para logging de requisições HTTP
+    
+    Também acumula o número de consultas SQL e o tempo de banco de cada
+    requisição, incluídos no log de conclusão e, opcionalmente, no header
+    Server-Timing da resposta.
     """
-    def __init__(self, app):
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
         self.app = app
+        self.server_timing = server_timing
         
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -218,6 +226,15 @@ class RequestLoggingMiddleware:
         # Log de início da requisição
         request_id = f"{int(time.time() * 1000)}-{os.urandom(4).hex()}"
         start_time = time.time()
+        query_stats = query_metrics.QueryStats(request_id)
+        tracking_token = query_metrics.start_tracking(query_stats)
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", query_stats.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
         
         info(f"Requisição iniciada: {method} {path}", {
             "request_id": request_id,
@@ -229,24 +246,28 @@ class RequestLoggingMiddleware:
         
         # Processar a requisição
         try:
-            await self.app(scope, receive, send)
+            await self.app(scope, receive, send_with_timing if self.server_timing else send)
             
             # Log de conclusão da requisição
             execution_time = time.time() - start_time
             info(f"Requisição concluída: {method} {path}", {
                 "request_id": request_id,
-                "execution_time_ms": round(execution_time * 1000)
+                "execution_time_ms": round(execution_time * 1000),
+                **query_stats.as_dict()
             })
         except Exception as e:
             # Log de erro na requisição
             execution_time = time.time() - start_time
             error(f"Erro na requisição: {method} {path} - {str(e)}", {
                 "request_id": request_id,
-                "execution_time_ms": round(execution_time * 1000)
+                "execution_time_ms": round(execution_time * 1000),
+                **query_stats.as_dict()
             }, exc_info=True)
             
             # Re-lançar a exceção
             raise
+        finally:
+            query_metrics.stop_tracking(tracking_token)
 
 
 # Inicialização do módulo
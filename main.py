@@ -6,31 +6,37 @@ Este módulo configura a aplicação FastAPI, define as rotas principais
 e gerencia a autenticação e autorização dos usuários.
 """
 
+import asyncio
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-import json
+from sqlalchemy import desc, select
 from datetime import timedelta
 from typing import Dict, Any
 import os
 
 # Importar routers e dependências
 from api_lead import router as lead_router
-from api_dashboard import router as dashboard_router
+from api_dashboard import router as dashboard_router, dashboard_feed
 from api_auth import router as auth_router
 from routes import router as page_router
-from database import get_db, engine
+from database import get_db, get_async_read_db, engine, get_pool_stats, replica_router, sqlite_read_engine
+from cache import get_cache_stats
+from rate_limit import login_throttle, get_client_ip
 import models
 from core_security import (
-    create_access_token,
+    create_user_access_token,
     get_current_active_user,
+    get_current_active_superuser,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    authenticate_user
+    authenticate_user_async,
+    password_executor,
+    token_versions
 )
 from models import User
 
@@ -99,41 +105,58 @@ async def login_page(request: Request):
     Renderiza a página de login
     """
     logger.debug("Renderizando página de login")
-    return templates.TemplateResponse("login.html", {"request": request, "error": None})
+    return templates.TemplateResponse(request, "login.html", {"request": request, "error": None})
 
 
 @app.post("/login", response_class=JSONResponse)
 @handle_errors(default_message="Erro ao processar login")
 async def login_for_access_token_form(
-    form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     Processa o formulário de login e retorna um token JWT
     
     Args:
+        request: Objeto Request do FastAPI
         form_data: Dados do formulário de login
-        db: Sessão do banco de dados
         
     Returns:
         JSONResponse com o token JWT ou mensagem de erro
     """
     logger.info("Tentativa de login", {"email": form_data.username})
     
-    user = authenticate_user(db, email=form_data.username, password=form_data.password)
+    # Bloqueio por conta e por IP (429) antes de qualquer hash; a tentativa
+    # já conta como falha e é devolvida se o login der certo. O backend
+    # compartilhado (SQLite) pode esperar pelo lock, então roda fora do event loop
+    client_ip = get_client_ip(request)
+    attempt = await asyncio.to_thread(login_throttle.reserve, form_data.username, client_ip)
+    
+    # A verificação bcrypt roda no pool de hash (503 se saturado)
+    try:
+        user = await authenticate_user_async(email=form_data.username, password=form_data.password)
+    except Exception:
+        await asyncio.to_thread(login_throttle.release, attempt)
+        raise
     if not user:
         logger.warning("Falha na autenticação", {"email": form_data.username})
         raise AuthenticationError(
             message="Usuário ou senha inválidos",
             details={"email": form_data.username}
         )
+    await asyncio.to_thread(login_throttle.record_success, attempt)
+    
+    if not user.is_active:
+        logger.warning("Tentativa de login com usuário inativo", {"email": form_data.username, "user_id": user.id})
+        raise AuthenticationError(
+            message="Usuário inativo",
+            details={"email": form_data.username, "user_id": user.id}
+        )
     
     logger.info("Login bem-sucedido", {"user_id": user.id, "email": user.email})
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+    access_token = create_user_access_token(user, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -141,45 +164,24 @@ async def login_for_access_token_form(
 @handle_errors(default_message="Erro ao carregar dashboard")
 async def dashboard(
     request: Request,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_active_user)
 ):
     """
     Renderiza o dashboard financeiro (protegido por autenticação)
     
+    Apenas a estrutura da página é enviada; cada card e gráfico é carregado
+    pelo navegador de /api/dashboard/panels/{painel}, com cache próprio,
+    então a primeira resposta não espera pelas consultas de estatísticas.
+    
     Args:
         request: Objeto Request do FastAPI
         current_user: Usuário autenticado
-        db: Sessão do banco de dados
         
     Returns:
-        Template HTML do dashboard com dados do usuário e estatísticas
+        Template HTML do dashboard com dados do usuário
     """
     logger.info("Acesso ao dashboard", {"user_id": current_user.id})
-    
-    # Obter estatísticas do dashboard usando a função da API
-    from api_dashboard import get_dashboard_stats
-    dashboard_stats = get_dashboard_stats(db=db, current_user=current_user)
-
-    # Preparar contexto para o template
-    context = {
-        "request": request,
-        "user": current_user,
-        "total_leads": dashboard_stats.get("total_leads", 0),
-        "qualified_leads": dashboard_stats.get("qualified_leads", 0),
-        "qualified_rate": dashboard_stats.get("qualified_rate", 0),
-        "converted_leads": dashboard_stats.get("converted_leads", 0),
-        "conversion_rate": dashboard_stats.get("conversion_rate", 0),
-        "estimated_revenue": dashboard_stats.get("estimated_revenue", "0,00"),
-        "average_ticket": dashboard_stats.get("average_ticket", "0,00"),
-        # Converter dados dos gráficos para JSON
-        "leads_evolution_data": json.dumps(dashboard_stats.get("leads_evolution_data", {})),
-        "conversion_by_source_data": json.dumps(dashboard_stats.get("conversion_by_source_data", {})),
-        "lead_status_data": json.dumps(dashboard_stats.get("lead_status_data", {})),
-        "commissions_evolution_data": json.dumps(dashboard_stats.get("commissions_evolution_data", {}))
-    }
-    
-    return templates.TemplateResponse("financial_dashboard.html", context)
+    return templates.TemplateResponse(request, "financial_dashboard.html", {"request": request, "user": current_user})
 
 
 @app.get("/admin", response_class=HTMLResponse)
@@ -187,7 +189,7 @@ async def dashboard(
 async def admin(
     request: Request, 
     current_user: User = Depends(get_current_active_user), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Renderiza o painel administrativo de leads (protegido por autenticação e autorização)
@@ -195,7 +197,7 @@ async def admin(
     Args:
         request: Objeto Request do FastAPI
         current_user: Usuário autenticado
-        db: Sessão do banco de dados
+        db: Sessão assíncrona somente leitura do banco de dados
         
     Returns:
         Template HTML do painel administrativo com dados dos leads
@@ -217,7 +219,10 @@ async def admin(
         )
     
     # Buscar leads recentes
-    leads = db.query(models.Lead).order_by(desc(models.Lead.created_at)).limit(20).all()
+    result = await db.execute(
+        select(models.Lead).order_by(desc(models.Lead.created_at)).limit(20)
+    )
+    leads = result.scalars().all()
     
     # Formatar leads para exibição
     formatted_leads = [
@@ -233,11 +238,34 @@ async def admin(
     ]
     
     return templates.TemplateResponse(
+        request,
         "admin_leads.html", 
         {"request": request, "user": current_user, "leads": formatted_leads}
     )
 
 
+@app.get("/api/metrics", response_class=JSONResponse)
+async def metrics(current_user: User = Depends(get_current_active_superuser)):
+    """
+    Métricas operacionais deste worker (apenas administradores)
+    
+    Returns:
+        Estatísticas dos pools de conexões, da réplica de leitura, dos caches,
+        do pool de hash de senha, do bloqueio de login e do stream do dashboard
+    """
+    return {
+        "pid": os.getpid(),
+        "database_pool": get_pool_stats(),
+        "database_read_pool": get_pool_stats(sqlite_read_engine) if sqlite_read_engine is not None else None,
+        "read_replica": replica_router.stats(),
+        "caches": get_cache_stats(),
+        "password_hashing": password_executor.stats(),
+        "token_versions": token_versions.stats(),
+        "login_throttle": login_throttle.stats(),
+        "dashboard_stream": dashboard_feed.stats(),
+    }
+
+
 @app.get("/logout")
 async def logout():
     """
@@ -280,6 +308,7 @@ async def http_exception_handler(request: Request, exc: HTTPException) -> HTMLRe
     
     # Para outros erros, retornar página de erro
     return templates.TemplateResponse(
+        request,
         "error.html", 
         {
             "request": request, 
@@ -7,8 +7,10 @@ from database import Base
 from models_user import User
 from models_plans import *  # Importa todos os modelos de planos
 
+from models_lead import Lead, LeadImport
+from models_rollups import LeadDailyStat, PurchaseDailyStat
+
 # Adicione aqui outros modelos que possam existir no sistema
-# from models_lead import Lead  # Se existir
 
 # Este arquivo serve como ponto central para importação de todos os modelos
 # Facilita a criação de tabelas e migrações
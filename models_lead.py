@@ -0,0 +1,74 @@
+from sqlalchemy import DDL, JSON, Column, Integer, String, Text, DateTime, ForeignKey, Index, event
+from sqlalchemy.sql import func
+from database import Base
+
+class Lead(Base):
+    __tablename__ = "leads"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True)
+    email = Column(String, index=True)
+    phone = Column(String)
+    source = Column(String)
+    status = Column(String, default="novo")  # novo, contato, qualificado, proposta, fechado, perdido
+    notes = Column(Text)
+    assigned_to_id = Column(Integer, ForeignKey("users.id"))
+    created_by_id = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
+
+    # Índices para os filtros do dashboard (período + status), para o
+    # GROUP BY (source, status) dos gráficos, resolvido só pelo índice, e para
+    # a paginação por cursor em (created_at, id), com e sem filtros
+    __table_args__ = (
+        Index("ix_leads_created_at_status", "created_at", "status"),
+        Index("ix_leads_source_status", "source", "status"),
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        Index("ix_leads_assigned_to_id_created_at_id", "assigned_to_id", "created_at", "id"),
+        Index("ix_leads_status_created_at_id", "status", "created_at", "id"),
+    )
+    # created_at volta no próprio INSERT (RETURNING), usado pelos agregados diários
+    __mapper_args__ = {"eager_defaults": True}
+
+    def __repr__(self):
+        return f"<Lead {self.name}>"
+
+
+class LeadImport(Base):
+    # Andamento das importações (lead_import), compartilhado entre os workers
+    __tablename__ = "lead_imports"
+
+    id = Column(String(32), primary_key=True)
+    format = Column(String, nullable=False)  # csv, ndjson
+    created_by_id = Column(Integer, ForeignKey("users.id"))
+    assigned_to_id = Column(Integer, ForeignKey("users.id"))  # responsável pelos leads importados
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    processed = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return f"<LeadImport {self.id} {self.status}>"
+
+
+# Índice de busca textual no SQLite (FTS5 com trigramas, ver lead_search),
+# criado e removido junto com a tabela leads
+LEAD_SEARCH_TABLE = "leads_fts"
+event.listen(
+    Lead.__table__,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {LEAD_SEARCH_TABLE} "
+        "USING fts5(name, email, phone, phone_digits, tokenize='trigram')"
+    ).execute_if(dialect="sqlite")
+)
+event.listen(
+    Lead.__table__,
+    "after_drop",
+    DDL(f"DROP TABLE IF EXISTS {LEAD_SEARCH_TABLE}").execute_if(dialect="sqlite")
+)
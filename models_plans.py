@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -35,6 +35,11 @@ class LeadUsage(Base):
     
     # Relacionamentos
     client = relationship("Client", back_populates="lead_usages")
+    
+    # Um registro de uso por cliente e dia; também atende a soma por cliente
+    __table_args__ = (
+        Index("uq_lead_usages_client_id_date", "client_id", "date", unique=True),
+    )
 
 class LeadPurchase(Base):
     __tablename__ = 'lead_purchases'
@@ -47,3 +52,14 @@ class LeadPurchase(Base):
     
     # Relacionamentos
     client = relationship("Client", back_populates="lead_purchases")
+    
+    # Índices para o saldo de leads extras, para o relatório financeiro e
+    # para a paginação por cursor em (created_at, id)
+    __table_args__ = (
+        Index("ix_lead_purchases_client_id_status", "client_id", "status"),
+        Index("ix_lead_purchases_status_created_at", "status", "created_at"),
+        Index("ix_lead_purchases_created_at_id", "created_at", "id"),
+        Index("ix_lead_purchases_client_id_created_at_id", "client_id", "created_at", "id"),
+    )
+    # created_at volta no próprio INSERT (RETURNING), usado pelos agregados diários
+    __mapper_args__ = {"eager_defaults": True}
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index
+from sqlalchemy.sql import func
+from database import Base
+
+# Tabelas de agregados diários, mantidas por rollups.py
+# Valores nulos de origem/responsável/cliente são gravados como "" / 0 para
+# que a chave única funcione em qualquer banco
+
+class LeadDailyStat(Base):
+    __tablename__ = "lead_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    source = Column(String, nullable=False, default="")
+    status = Column(String, nullable=False, default="")
+    assigned_to_id = Column(Integer, nullable=False, default=0)
+    lead_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("uq_lead_daily_stats_key", "day", "source", "status", "assigned_to_id", unique=True),
+    )
+
+class PurchaseDailyStat(Base):
+    __tablename__ = "purchase_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    client_id = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default="")
+    purchase_count = Column(Integer, nullable=False, default=0)
+    quantity = Column(Integer, nullable=False, default=0)
+    amount = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index("uq_purchase_daily_stats_key", "day", "client_id", "status", unique=True),
+    )
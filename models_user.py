@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -13,9 +13,16 @@ class User(Base):
     full_name = Column(String)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
+    # Incrementada para revogar os tokens emitidos (senha, desativação, permissões)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    # Paginação por cursor em (created_at, id)
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
+    
     # Relacionamentos (se necessário)
     # leads = relationship("Lead", back_populates="user")
     
@@ -0,0 +1,113 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Paginação por cursor (keyset)
+
+Este módulo pagina listagens por (created_at, id), do registro mais recente
+para o mais antigo. Cada página continua logo depois da última linha da
+anterior, então o custo não cresce com a profundidade e registros novos não
+deslocam as páginas seguintes.
+
+O cursor é opaco para o cliente: base64 de um JSON com o created_at e o id
+da última linha entregue. A paginação por skip (OFFSET) continua aceita
+como alternativa legada quando nenhum cursor é enviado.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Query
+
+from error_handlers import ValidationError
+
+# Cabeçalho com o cursor da próxima página (ausente na última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """Gera o cursor que aponta para depois da linha (created_at, id)"""
+    payload = {"c": created_at.isoformat() if created_at else None, "i": row_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Lê um cursor gerado por encode_cursor
+
+    Returns:
+        Tupla (created_at, id) da última linha da página anterior
+
+    Raises:
+        ValidationError: Se o cursor estiver malformado
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload["c"]) if payload["c"] else None
+        return created_at, int(payload["i"])
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise ValidationError("Cursor de paginação inválido", field_errors={"cursor": "Valor malformado"})
+
+
+def keyset_paginate(
+    query: Query,
+    created_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Retorna uma página da consulta em ordem (created_at, id) decrescente
+
+    A posição do cursor é relida do próprio banco pelo id, para que o filtro
+    compare os valores gravados da mesma forma que o ORDER BY (no SQLite as
+    datas são texto e o formato gravado pode variar). Se a linha do cursor
+    tiver sido excluída, vale o created_at guardado no cursor.
+
+    Args:
+        query: Consulta já filtrada
+        created_column: Coluna created_at do modelo
+        id_column: Coluna id do modelo
+        limit: Tamanho da página
+        cursor: Cursor recebido da página anterior
+        skip: Registros a pular (legado; ignorado quando há cursor)
+
+    Returns:
+        Tupla (linhas da página, cursor da próxima página ou None)
+
+    Raises:
+        ValidationError: Se o cursor estiver malformado
+    """
+    query = query.order_by(created_column.desc(), id_column.desc())
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stored = select(created_column).where(id_column == row_id).scalar_subquery()
+        query = query.filter(tuple_(created_column, id_column) < tuple_(func.coalesce(stored, created_at), row_id))
+    elif skip:
+        query = query.offset(skip)
+
+    # Uma linha a mais indica se existe próxima página
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]):
+    """
+    Publica o cursor da próxima página nos cabeçalhos da resposta
+
+    O corpo continua sendo a lista de registros; o cursor vai em
+    X-Next-Cursor e num cabeçalho Link com rel="next".
+    """
+    if next_cursor is None:
+        return
+    url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    response.headers["Link"] = f'<{url}>; rel="next"'
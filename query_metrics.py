@@ -0,0 +1,136 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Métricas de consultas SQL por requisição
+
+Este módulo registra eventos do SQLAlchemy que contam as instruções SQL
+executadas e acumulam o tempo gasto no banco de dados. Os totais são
+associados à requisição atual (via contextvars) e usados pelo
+RequestLoggingMiddleware no log de conclusão e no header Server-Timing.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryStats:
+    """
+    Totais de consultas SQL de uma requisição (ou de um bloco monitorado)
+
+    Attributes:
+        request_id: ID da requisição gerado pelo RequestLoggingMiddleware
+        count: Número de instruções SQL executadas
+        duration_ms: Tempo acumulado no banco de dados (milissegundos)
+        statements: Instruções executadas (apenas quando keep_statements=True)
+    """
+    def __init__(self, request_id: Optional[str] = None, keep_statements: bool = False):
+        self.request_id = request_id
+        self.count = 0
+        self.duration_ms = 0.0
+        self.keep_statements = keep_statements
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration_ms: float):
+        """Registra uma instrução executada e sua duração"""
+        with self._lock:
+            self.count += 1
+            self.duration_ms += duration_ms
+            if self.keep_statements:
+                self.statements.append(statement)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Retorna os totais para inclusão em logs"""
+        return {
+            "db_queries": self.count,
+            "db_time_ms": round(self.duration_ms, 3),
+        }
+
+    def server_timing(self) -> str:
+        """Retorna o valor do header Server-Timing para o banco de dados"""
+        return f'db;dur={self.duration_ms:.1f};desc="{self.count} queries"'
+
+
+# Totais da requisição atual; copiado para as threads do threadpool do FastAPI
+_current_stats: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+
+# Coletores globais (ex.: testes), que recebem consultas de qualquer thread
+_global_collectors: List[QueryStats] = []
+
+
+def start_tracking(stats: QueryStats) -> contextvars.Token:
+    """
+    Passa a acumular as consultas do contexto atual em `stats`
+
+    Returns:
+        Token para restaurar o contexto anterior com stop_tracking
+    """
+    return _current_stats.set(stats)
+
+
+def stop_tracking(token: contextvars.Token):
+    """Encerra o monitoramento iniciado por start_tracking"""
+    _current_stats.reset(token)
+
+
+def get_current_stats() -> Optional[QueryStats]:
+    """Retorna os totais da requisição atual, se houver"""
+    return _current_stats.get()
+
+
+@contextmanager
+def capture_queries():
+    """
+    Captura todas as consultas executadas no bloco, em qualquer thread
+
+    Útil em testes com TestClient, que executa a aplicação em outra thread.
+
+    Yields:
+        QueryStats com contagem, duração e as instruções executadas
+    """
+    stats = QueryStats(keep_statements=True)
+    _global_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _global_collectors.remove(stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    duration_ms = (time.perf_counter() - start_times.pop()) * 1000
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration_ms)
+    for collector in list(_global_collectors):
+        collector.record(statement, duration_ms)
+
+
+def _handle_error(exception_context):
+    # Instruções com erro não disparam after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None:
+        start_times = connection.info.get("query_start_time")
+        if start_times:
+            start_times.pop()
+
+
+# Eventos registrados na classe Engine valem para todas as engines,
+# inclusive a sync_engine das engines assíncronas
+event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+event.listen(Engine, "handle_error", _handle_error)
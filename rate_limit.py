@@ -0,0 +1,400 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Limitação de tentativas de login
+
+Este módulo implementa limitadores de janela deslizante (contador da janela
+atual + fração da janela anterior) usados para bloquear tentativas de login
+por conta e por IP antes de qualquer verificação bcrypt. Cada tentativa é
+reservada (verificada e contada numa única operação atômica) antes do hash
+e devolvida se o login der certo. Os contadores ficam em memória (por
+worker) ou em um arquivo SQLite compartilhado entre os workers do uvicorn
+na mesma máquina.
+"""
+
+import ipaddress
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from error_handlers import RateLimitError
+import logger
+
+
+class MemoryBackend:
+    """Contadores por janela em memória, válidos apenas neste worker"""
+    name = "memory"
+
+    def __init__(self, sweep_every: int = 1000):
+        self._counts: Dict[str, Dict[int, int]] = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._increments = 0
+
+    def get(self, key: str, window: int) -> Tuple[int, int]:
+        """Retorna as contagens da janela `window` e da anterior"""
+        with self._lock:
+            windows = self._counts.get(key, {})
+            return windows.get(window, 0), windows.get(window - 1, 0)
+
+    def increment(self, key: str, window: int):
+        with self._lock:
+            self._increment(key, window)
+
+    def _increment(self, key: str, window: int):
+        windows = self._counts.setdefault(key, {})
+        windows[window] = windows.get(window, 0) + 1
+        for old in [w for w in windows if w < window - 1]:
+            del windows[old]
+        self._increments += 1
+        if self._increments % self._sweep_every == 0:
+            self._sweep(window)
+
+    def acquire(self, key: str, window: int, limit: int, previous_weight: float) -> bool:
+        """Conta um evento se a contagem estimada estiver abaixo do limite (atômico)"""
+        with self._lock:
+            windows = self._counts.get(key, {})
+            if windows.get(window, 0) + windows.get(window - 1, 0) * previous_weight >= limit:
+                return False
+            self._increment(key, window)
+            return True
+
+    def decrement(self, key: str, window: int):
+        with self._lock:
+            windows = self._counts.get(key, {})
+            if windows.get(window, 0) > 0:
+                windows[window] -= 1
+
+    def reset(self, key: str):
+        with self._lock:
+            self._counts.pop(key, None)
+
+    def _sweep(self, window: int):
+        # Remove chaves sem tentativas nas duas últimas janelas (ex.: IPs de ataques antigos)
+        for key in [k for k, windows in self._counts.items() if max(windows, default=0) < window - 1]:
+            del self._counts[key]
+
+    def size(self) -> int:
+        return len(self._counts)
+
+
+class SQLiteBackend:
+    """
+    Contadores por janela em um arquivo SQLite, compartilhados entre processos
+
+    Args:
+        path: Caminho do arquivo SQLite
+        sweep_every: A cada quantos incrementos remover janelas antigas
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, sweep_every: int = 1000):
+        self.path = path
+        self._sweep_every = sweep_every
+        self._increments = 0
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_counters ("
+                " key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL,"
+                " PRIMARY KEY (key, window))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, window: int) -> Tuple[int, int]:
+        counts = dict(self._connection().execute(
+            "SELECT window, count FROM rate_limit_counters WHERE key = ? AND window IN (?, ?)",
+            (key, window, window - 1)
+        ).fetchall())
+        return counts.get(window, 0), counts.get(window - 1, 0)
+
+    def increment(self, key: str, window: int):
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO rate_limit_counters (key, window, count) VALUES (?, ?, 1) "
+            "ON CONFLICT (key, window) DO UPDATE SET count = count + 1",
+            (key, window)
+        )
+        self._increments += 1
+        if self._increments % self._sweep_every == 0:
+            conn.execute("DELETE FROM rate_limit_counters WHERE window < ?", (window - 1,))
+
+    def acquire(self, key: str, window: int, limit: int, previous_weight: float) -> bool:
+        """Conta um evento se a contagem estimada estiver abaixo do limite (atômico entre processos)"""
+        conn = self._connection()
+        # BEGIN IMMEDIATE: leitura e incremento sob o lock de escrita do arquivo
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current, previous = self.get(key, window)
+            allowed = current + previous * previous_weight < limit
+            if allowed:
+                self.increment(key, window)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed
+
+    def decrement(self, key: str, window: int):
+        self._connection().execute(
+            "UPDATE rate_limit_counters SET count = count - 1 WHERE key = ? AND window = ? AND count > 0",
+            (key, window)
+        )
+
+    def reset(self, key: str):
+        self._connection().execute("DELETE FROM rate_limit_counters WHERE key = ?", (key,))
+
+    def size(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(DISTINCT key) FROM rate_limit_counters"
+        ).fetchone()[0]
+
+
+class SlidingWindowLimiter:
+    """
+    Limite de eventos por chave em uma janela deslizante
+
+    A contagem estimada é a da janela atual somada à da anterior, ponderada
+    pela fração da janela anterior que ainda está dentro do intervalo.
+
+    Args:
+        name: Nome do limitador (prefixo das chaves e métricas)
+        limit: Número máximo de eventos na janela
+        window_seconds: Duração da janela (segundos)
+        backend: MemoryBackend ou SQLiteBackend
+    """
+    def __init__(self, name: str, limit: int, window_seconds: float, backend):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.backend = backend
+        self.checks = 0
+        self.rejected = 0
+        self.hits = 0
+
+    def _window(self, now: float) -> Tuple[int, float]:
+        window = int(now // self.window_seconds)
+        elapsed = (now % self.window_seconds) / self.window_seconds
+        return window, elapsed
+
+    def count(self, key: str, now: Optional[float] = None) -> float:
+        """Retorna a contagem estimada de eventos da chave na janela deslizante"""
+        window, elapsed = self._window(time.time() if now is None else now)
+        current, previous = self.backend.get(f"{self.name}:{key}", window)
+        return current + previous * (1 - elapsed)
+
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """Indica se a chave ainda está abaixo do limite (não registra evento)"""
+        self.checks += 1
+        if self.count(key, now) >= self.limit:
+            self.rejected += 1
+            return False
+        return True
+
+    def acquire(self, key: str, now: Optional[float] = None) -> Optional[int]:
+        """
+        Registra um evento se a chave estiver abaixo do limite, numa única operação
+
+        Returns:
+            A janela em que o evento foi contado (para release), ou None se
+            o limite foi atingido
+        """
+        self.checks += 1
+        window, elapsed = self._window(time.time() if now is None else now)
+        if not self.backend.acquire(f"{self.name}:{key}", window, self.limit, 1 - elapsed):
+            self.rejected += 1
+            return None
+        self.hits += 1
+        return window
+
+    def release(self, key: str, window: int):
+        """Desconta um evento registrado por acquire"""
+        self.backend.decrement(f"{self.name}:{key}", window)
+
+    def hit(self, key: str, now: Optional[float] = None):
+        """Registra um evento para a chave"""
+        window, _ = self._window(time.time() if now is None else now)
+        self.backend.increment(f"{self.name}:{key}", window)
+        self.hits += 1
+
+    def reset(self, key: str):
+        """Zera os eventos da chave"""
+        self.backend.reset(f"{self.name}:{key}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window_seconds,
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "hits": self.hits,
+        }
+
+
+class LoginAttempt:
+    """Tentativa de login reservada por LoginThrottle.reserve"""
+    def __init__(self, account: str, ip: Optional[str]):
+        self.account = account
+        self.ip = ip
+        self.account_window: Optional[int] = None
+        self.ip_window: Optional[int] = None
+
+
+class LoginThrottle:
+    """
+    Bloqueio de tentativas de login por conta e por IP
+
+    Cada tentativa é contada como falha ao ser reservada, antes da consulta
+    ao usuário e do bcrypt; assim, uma rajada de tentativas simultâneas não
+    passa toda pela verificação. Um login bem-sucedido devolve a reserva do
+    IP e zera o contador da conta. Tentativas bloqueadas não consomem CPU de
+    hash.
+
+    Args:
+        account_limiter: Limitador de falhas por email
+        ip_limiter: Limitador de falhas por IP
+    """
+    def __init__(self, account_limiter: SlidingWindowLimiter, ip_limiter: SlidingWindowLimiter):
+        self.account_limiter = account_limiter
+        self.ip_limiter = ip_limiter
+
+    @staticmethod
+    def _account_key(email: str) -> str:
+        return (email or "").strip().lower()
+
+    def reserve(self, email: str, ip: Optional[str]) -> LoginAttempt:
+        """
+        Reserva uma tentativa de login, contando-a como falha até o resultado
+
+        Raises:
+            RateLimitError: Se a conta ou o IP excederem o limite de falhas
+        """
+        attempt = LoginAttempt(self._account_key(email), ip)
+        if ip:
+            attempt.ip_window = self.ip_limiter.acquire(ip)
+            if attempt.ip_window is None:
+                self._reject("ip", self.ip_limiter, attempt)
+        if attempt.account:
+            attempt.account_window = self.account_limiter.acquire(attempt.account)
+            if attempt.account_window is None:
+                self.release(attempt)
+                self._reject("account", self.account_limiter, attempt)
+        return attempt
+
+    def _reject(self, scope: str, limiter: SlidingWindowLimiter, attempt: LoginAttempt):
+        logger.warning("Tentativas de login bloqueadas", {"scope": scope, "email": attempt.account, "ip": attempt.ip})
+        raise RateLimitError(
+            message="Muitas tentativas de login. Tente novamente mais tarde.",
+            retry_after=math.ceil(limiter.window_seconds),
+            details={"scope": scope}
+        )
+
+    def release(self, attempt: LoginAttempt):
+        """Devolve a reserva de uma tentativa que não chegou a ser avaliada (ex.: 503)"""
+        if attempt.ip_window is not None:
+            self.ip_limiter.release(attempt.ip, attempt.ip_window)
+            attempt.ip_window = None
+        if attempt.account_window is not None:
+            self.account_limiter.release(attempt.account, attempt.account_window)
+            attempt.account_window = None
+
+    def record_success(self, attempt: LoginAttempt):
+        """Devolve a reserva do IP e zera as falhas da conta após um login bem-sucedido"""
+        self.release(attempt)
+        if attempt.account:
+            self.account_limiter.reset(attempt.account)
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna os contadores dos limitadores"""
+        return {
+            "backend": self.account_limiter.backend.name,
+            "tracked_keys": self.account_limiter.backend.size(),
+            "account": self.account_limiter.stats(),
+            "ip": self.ip_limiter.stats(),
+        }
+
+
+# Proxies (IPs ou redes) cujos cabeçalhos X-Forwarded-For/X-Real-IP são aceitos
+# O padrão cobre o loopback e as redes privadas, onde fica o nginx (container
+# na mesma rede do Docker); a porta da aplicação não deve ficar exposta sem o proxy
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv(
+        "TRUSTED_PROXIES", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+    ).split(",")
+    if network.strip()
+]
+
+
+def _is_trusted_proxy(address: Optional[str]) -> bool:
+    try:
+        ip = ipaddress.ip_address((address or "").strip())
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def get_client_ip(request) -> Optional[str]:
+    """
+    Retorna o IP do cliente, considerando os cabeçalhos do proxy
+
+    Só quando a conexão vem de um proxy confiável (TRUSTED_PROXIES) o
+    X-Forwarded-For é lido, da direita para a esquerda, pulando os proxies
+    confiáveis; o primeiro endereço restante é o cliente. Entradas à
+    esquerda, que o próprio cliente pode forjar, não são usadas. Sem
+    X-Forwarded-For, vale o X-Real-IP.
+    """
+    peer = request.client.host if request.client else None
+    if not _is_trusted_proxy(peer):
+        return peer
+    forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    for ip in reversed(forwarded):
+        if not _is_trusted_proxy(ip):
+            return ip
+    if forwarded:
+        return forwarded[0]
+    return request.headers.get("x-real-ip", "").strip() or peer
+
+
+# Configuração do bloqueio de login
+# LOGIN_THROTTLE_BACKEND=sqlite compartilha os contadores entre os workers (mesma máquina);
+# é o padrão em produção. Com "memory", cada worker conta à parte e os limites
+# efetivos ficam multiplicados pelo número de workers (4 no start.sh)
+LOGIN_THROTTLE_BACKEND = os.getenv(
+    "LOGIN_THROTTLE_BACKEND",
+    "sqlite" if os.getenv("ENVIRONMENT", "development") == "production" else "memory"
+)
+LOGIN_THROTTLE_SQLITE_PATH = os.getenv("LOGIN_THROTTLE_SQLITE_PATH", "./login_throttle.db")
+LOGIN_THROTTLE_WINDOW_SECONDS = float(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "300"))
+LOGIN_MAX_FAILURES_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "5"))
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20"))
+
+
+def create_backend(kind: str = LOGIN_THROTTLE_BACKEND):
+    """Cria o backend de contadores configurado"""
+    if kind == "sqlite":
+        return SQLiteBackend(LOGIN_THROTTLE_SQLITE_PATH)
+    if kind != "memory":
+        raise ValueError(f"LOGIN_THROTTLE_BACKEND inválido: {kind}")
+    return MemoryBackend()
+
+
+_backend = create_backend()
+login_throttle = LoginThrottle(
+    account_limiter=SlidingWindowLimiter(
+        "login_account", LOGIN_MAX_FAILURES_PER_ACCOUNT, LOGIN_THROTTLE_WINDOW_SECONDS, _backend
+    ),
+    ip_limiter=SlidingWindowLimiter(
+        "login_ip", LOGIN_MAX_FAILURES_PER_IP, LOGIN_THROTTLE_WINDOW_SECONDS, _backend
+    ),
+)
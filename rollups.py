@@ -0,0 +1,235 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Agregados diários de leads e compras
+
+Este módulo mantém as tabelas lead_daily_stats (leads por dia, origem,
+status e responsável) e purchase_daily_stats (compras por dia, cliente e
+status), lidas pelo dashboard e pelo relatório financeiro no lugar das
+tabelas completas. As contagens são ajustadas de forma incremental pelo
+crud_lead, na mesma transação da alteração, e podem ser reconstruídas a
+partir das tabelas base com:
+
+    python rollups.py
+
+Quem guarda resultados derivados dos agregados (como o cache do dashboard)
+registra uma função com add_change_listener; ela é chamada depois de cada
+commit que alterou os agregados.
+"""
+
+from collections import Counter
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, cast, delete, event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import logger
+from models_lead import Lead
+from models_plans import LeadPurchase
+from models_rollups import LeadDailyStat, PurchaseDailyStat
+
+# Chave de um lead no agregado: (dia, origem, status, responsável)
+LeadKey = Tuple[date, str, str, int]
+# Chave e valores de uma compra no agregado: ((dia, cliente, status), quantidade, valor)
+PurchaseEntry = Tuple[Tuple[date, int, str], int, float]
+
+# Funções chamadas após o commit de uma transação que alterou os agregados
+_change_listeners: List[Callable[[], None]] = []
+
+
+def add_change_listener(listener: Callable[[], None]):
+    """Registra uma função chamada sem argumentos após cada commit que altera os agregados"""
+    _change_listeners.append(listener)
+
+
+def _mark_changed(db: Session):
+    db.info["rollups_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_change_listeners(session):
+    if not session.info.pop("rollups_changed", False):
+        return
+    for listener in _change_listeners:
+        try:
+            listener()
+        except Exception as e:
+            logger.error("Falha ao notificar alteração dos agregados", {"error": str(e)})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_change_mark(session):
+    session.info.pop("rollups_changed", None)
+
+
+def lead_rollup_key(lead: Lead) -> Optional[LeadKey]:
+    """Retorna a chave do lead em lead_daily_stats (None se ainda sem created_at)"""
+    if lead.created_at is None:
+        return None
+    return (lead.created_at.date(), lead.source or "", lead.status or "", lead.assigned_to_id or 0)
+
+
+def purchase_rollup_entry(purchase: LeadPurchase) -> Optional[PurchaseEntry]:
+    """Retorna a chave e os valores da compra em purchase_daily_stats"""
+    if purchase.created_at is None:
+        return None
+    key = (purchase.created_at.date(), purchase.client_id or 0, purchase.status or "")
+    return key, purchase.quantity or 0, purchase.amount or 0.0
+
+
+def _upsert(db: Session, model, key: Dict[str, Any], increments: Dict[str, Any]):
+    """Soma `increments` à linha de `key`, criando-a se necessário"""
+    _mark_changed(db)
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = dialect_insert(table).values(**key, **increments, updated_at=func.now())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in increments},
+                "updated_at": func.now(),
+            }
+        )
+        db.execute(stmt)
+        return
+
+    # Demais bancos: UPDATE e, se a linha não existir, INSERT
+    result = db.execute(
+        update(table)
+        .where(*(table.c[name] == value for name, value in key.items()))
+        .values(**{name: table.c[name] + value for name, value in increments.items()}, updated_at=func.now())
+    )
+    if result.rowcount == 0:
+        db.execute(insert(table).values(**key, **increments, updated_at=func.now()))
+
+
+def record_lead_change(db: Session, old_key: Optional[LeadKey], new_key: Optional[LeadKey]):
+    """
+    Ajusta lead_daily_stats para um lead criado, alterado ou excluído
+
+    Args:
+        db: Sessão da alteração (o ajuste entra no mesmo commit)
+        old_key: Chave antes da alteração (None para criação)
+        new_key: Chave depois da alteração (None para exclusão)
+    """
+    if old_key == new_key:
+        return
+    for key, delta in ((old_key, -1), (new_key, 1)):
+        if key is not None:
+            day, source, lead_status, assigned_to_id = key
+            _upsert(
+                db, LeadDailyStat,
+                {"day": day, "source": source, "status": lead_status, "assigned_to_id": assigned_to_id},
+                {"lead_count": delta}
+            )
+
+
+def record_leads_created(db: Session, keys: Iterable[Optional[LeadKey]]):
+    """
+    Soma ao lead_daily_stats um lote de leads criados, com um ajuste por chave distinta
+
+    Args:
+        db: Sessão da inserção (o ajuste entra no mesmo commit)
+        keys: Chaves dos leads criados (lead_rollup_key)
+    """
+    for (day, source, lead_status, assigned_to_id), count in Counter(key for key in keys if key is not None).items():
+        _upsert(
+            db, LeadDailyStat,
+            {"day": day, "source": source, "status": lead_status, "assigned_to_id": assigned_to_id},
+            {"lead_count": count}
+        )
+
+
+def record_purchase_change(db: Session, old_entry: Optional[PurchaseEntry], new_entry: Optional[PurchaseEntry]):
+    """
+    Ajusta purchase_daily_stats para uma compra criada ou com status alterado
+
+    Args:
+        db: Sessão da alteração (o ajuste entra no mesmo commit)
+        old_entry: Chave e valores antes da alteração (None para criação)
+        new_entry: Chave e valores depois da alteração (None para exclusão)
+    """
+    if old_entry == new_entry:
+        return
+    for entry, sign in ((old_entry, -1), (new_entry, 1)):
+        if entry is not None:
+            (day, client_id, purchase_status), quantity, amount = entry
+            _upsert(
+                db, PurchaseDailyStat,
+                {"day": day, "client_id": client_id, "status": purchase_status},
+                {"purchase_count": sign, "quantity": sign * quantity, "amount": sign * amount}
+            )
+
+
+def _day(db: Session, column):
+    # No SQLite, date() gera o mesmo texto AAAA-MM-DD que o tipo Date grava
+    if db.get_bind().dialect.name == "sqlite":
+        return func.date(column)
+    return cast(column, Date)
+
+
+def rebuild_rollups(db: Session) -> Dict[str, int]:
+    """
+    Reconstrói os dois agregados a partir das tabelas leads e lead_purchases
+
+    Args:
+        db: Sessão do banco de dados (o commit é feito ao final)
+
+    Returns:
+        Quantidade de linhas gravadas em cada agregado
+    """
+    lead_day = _day(db, Lead.created_at)
+    lead_columns = (
+        lead_day,
+        func.coalesce(Lead.source, ""),
+        func.coalesce(Lead.status, ""),
+        func.coalesce(Lead.assigned_to_id, 0),
+    )
+    purchase_day = _day(db, LeadPurchase.created_at)
+    purchase_columns = (
+        purchase_day,
+        func.coalesce(LeadPurchase.client_id, 0),
+        func.coalesce(LeadPurchase.status, ""),
+    )
+
+    _mark_changed(db)
+    db.execute(delete(LeadDailyStat))
+    db.execute(delete(PurchaseDailyStat))
+    db.execute(insert(LeadDailyStat).from_select(
+        ["day", "source", "status", "assigned_to_id", "lead_count"],
+        select(*lead_columns, func.count(Lead.id))
+        .where(Lead.created_at.isnot(None))
+        .group_by(*lead_columns)
+    ))
+    db.execute(insert(PurchaseDailyStat).from_select(
+        ["day", "client_id", "status", "purchase_count", "quantity", "amount"],
+        select(
+            *purchase_columns,
+            func.count(LeadPurchase.id),
+            func.coalesce(func.sum(LeadPurchase.quantity), 0),
+            func.coalesce(func.sum(LeadPurchase.amount), 0.0)
+        )
+        .where(LeadPurchase.created_at.isnot(None))
+        .group_by(*purchase_columns)
+    ))
+    db.commit()
+
+    counts = {
+        "lead_daily_stats": db.scalar(select(func.count()).select_from(LeadDailyStat)),
+        "purchase_daily_stats": db.scalar(select(func.count()).select_from(PurchaseDailyStat)),
+    }
+    logger.info("Agregados diários reconstruídos", counts)
+    return counts
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(rebuild_rollups(session))
+    finally:
+        session.close()
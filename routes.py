@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, extract
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import calendar
 
-from database import get_db
+from database import get_async_read_db
 # Importar modelos necessários
-from models import User, Lead, Contact, Proposal, Contract, Commission
+from models import User, Lead
 # Importar dependência de autenticação JWT
 from core_security import get_current_active_user
 
@@ -33,9 +33,11 @@ def format_date(value):
     return str(value)
 
 # Rota para a página de contatos (protegida)
+# Os contatos são os próprios leads (não há modelo Contact separado)
 @router.get("/contacts", response_class=HTMLResponse)
-async def contacts_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    contacts = db.query(Contact).order_by(desc(Contact.created_at)).all()
+async def contacts_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_active_user)):
+    result = await db.execute(select(Lead).order_by(desc(Lead.created_at)))
+    contacts = result.scalars().all()
     
     # Formatar dados para exibição, se necessário
     formatted_contacts = [
@@ -52,6 +54,7 @@ async def contacts_page(request: Request, db: Session = Depends(get_db), current
     ]
     
     return templates.TemplateResponse(
+        request,
         "contacts.html", 
         {
             "request": request, 
@@ -65,6 +68,7 @@ async def contacts_page(request: Request, db: Session = Depends(get_db), current
 async def simulation_page(request: Request, current_user: User = Depends(get_current_active_user)):
     # Esta página pode não precisar de dados do DB inicialmente
     return templates.TemplateResponse(
+        request,
         "simulation.html", 
         {
             "request": request,
@@ -73,37 +77,25 @@ async def simulation_page(request: Request, current_user: User = Depends(get_cur
     )
 
 # Rota para a página de propostas (protegida)
+# Propostas, contratos e comissões ainda não têm modelos no banco: as páginas
+# são exibidas sem registros até que as tabelas existam
 @router.get("/proposals", response_class=HTMLResponse)
-async def proposals_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    proposals = db.query(Proposal).order_by(desc(Proposal.created_at)).all()
-    
-    formatted_proposals = [
-        {
-            "id": p.id,
-            "client_name": p.client_name, # Assumindo que existe esse campo ou relação
-            "loan_type": p.loan_type,
-            "amount": format_currency(p.amount),
-            "term": f"{p.term} meses",
-            "interest_rate": f"{p.interest_rate:.2f}% a.m.".replace(".", ","),
-            "created_at": format_date(p.created_at),
-            "status": p.status
-        }
-        for p in proposals
-    ]
-    
+async def proposals_page(request: Request, current_user: User = Depends(get_current_active_user)):
     return templates.TemplateResponse(
+        request,
         "proposals.html", 
         {
             "request": request, 
-            "proposals": formatted_proposals,
+            "proposals": [],
             "user": current_user
         }
     )
 
 # Rota para a página de prospecção (protegida)
 @router.get("/prospecting", response_class=HTMLResponse)
-async def prospecting_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    all_leads = db.query(Lead).order_by(desc(Lead.created_at)).all()
+async def prospecting_page(request: Request, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_active_user)):
+    result = await db.execute(select(Lead).order_by(desc(Lead.created_at)))
+    all_leads = result.scalars().all()
     
     # Filtrar por status
     new_leads = [l for l in all_leads if l.status == "novo"]
@@ -123,6 +115,7 @@ async def prospecting_page(request: Request, db: Session = Depends(get_db), curr
         }
 
     return templates.TemplateResponse(
+        request,
         "prospecting.html", 
         {
             "request": request, 
@@ -136,89 +129,40 @@ async def prospecting_page(request: Request, db: Session = Depends(get_db), curr
 
 # Rota para a página de contratos (protegida)
 @router.get("/contracts", response_class=HTMLResponse)
-async def contracts_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    contracts = db.query(Contract).order_by(desc(Contract.created_at)).all()
-    
-    formatted_contracts = [
-        {
-            "id": c.id,
-            "number": c.number,
-            "client_name": c.client_name, # Assumindo campo ou relação
-            "amount": format_currency(c.amount),
-            "institution": c.institution,
-            "created_at": format_date(c.created_at),
-            "status": c.status
-        }
-        for c in contracts
-    ]
-    
+async def contracts_page(request: Request, current_user: User = Depends(get_current_active_user)):
     return templates.TemplateResponse(
+        request,
         "contracts.html", 
         {
             "request": request, 
-            "contracts": formatted_contracts,
+            "contracts": [],
             "user": current_user
         }
     )
 
 # Rota para a página de comissões (protegida)
 @router.get("/commissions", response_class=HTMLResponse)
-async def commissions_page(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    commissions = db.query(Commission).order_by(desc(Commission.created_at)).all()
-    
-    pending_commissions_list = [c for c in commissions if c.status == "pendente"]
-    paid_commissions_list = [c for c in commissions if c.status == "pago"]
-    
-    # Calcular valores para os cards de resumo
+async def commissions_page(request: Request, current_user: User = Depends(get_current_active_user)):
     current_month = datetime.now().month
     current_year = datetime.now().year
     
-    monthly_commissions_val = db.query(func.sum(Commission.commission_amount)).filter(
-        extract('month', Commission.payment_date) == current_month, # Assumindo payment_date
-        extract('year', Commission.payment_date) == current_year,
-        Commission.status == 'pago'
-    ).scalar() or 0
-    
-    pending_commissions_val = db.query(func.sum(Commission.commission_amount)).filter(
-        Commission.status == 'pendente'
-    ).scalar() or 0
-    
-    paid_commissions_val = db.query(func.sum(Commission.commission_amount)).filter(
-        Commission.status == 'pago'
-    ).scalar() or 0
-    
-    total_paid_count = len(paid_commissions_list)
-    average_commission_val = (paid_commissions_val / total_paid_count) if total_paid_count > 0 else 0
-    
-    # Formatar dados das tabelas
-    def format_commission(comm):
-         return {
-            "id": comm.id,
-            "contract_number": comm.contract_number, # Assumindo campo ou relação
-            "client_name": comm.client_name, # Assumindo campo ou relação
-            "contract_amount": format_currency(comm.contract_amount), # Assumindo campo
-            "commission_amount": format_currency(comm.commission_amount),
-            "created_at": format_date(comm.created_at),
-            "status": comm.status
-        }
-
     return templates.TemplateResponse(
+        request,
         "commissions.html", 
         {
             "request": request, 
-            "commissions": [format_commission(c) for c in commissions],
-            "pending_commissions_list": [format_commission(c) for c in pending_commissions_list],
-            "paid_commissions_list": [format_commission(c) for c in paid_commissions_list],
-            "monthly_commissions": format_currency(monthly_commissions_val),
-            "pending_commissions": format_currency(pending_commissions_val),
-            "paid_commissions": format_currency(paid_commissions_val),
-            "average_commission": format_currency(average_commission_val),
-            "pending_count": len(pending_commissions_list),
-            "paid_count": total_paid_count,
-            "total_count": len(commissions),
+            "commissions": [],
+            "pending_commissions_list": [],
+            "paid_commissions_list": [],
+            "monthly_commissions": format_currency(0),
+            "pending_commissions": format_currency(0),
+            "paid_commissions": format_currency(0),
+            "average_commission": format_currency(0),
+            "pending_count": 0,
+            "paid_count": 0,
+            "total_count": 0,
             "current_month": calendar.month_name[current_month],
             "current_year": current_year,
             "user": current_user
         }
     )
-
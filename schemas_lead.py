@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from datetime import datetime, date
 
 # Esquema base para lead
@@ -34,6 +34,32 @@ class Lead(LeadBase):
     class Config:
         from_attributes = True  # Anteriormente orm_mode = True
 
+# Resultado de um item da criação em lote
+class LeadBulkItemResult(BaseModel):
+    index: int  # posição do item na lista enviada
+    status: str  # created, invalid
+    id: Optional[int] = None
+    errors: Optional[Dict[str, str]] = None  # campo -> mensagem, quando inválido
+
+# Resposta da criação em lote
+class LeadBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[LeadBulkItemResult]
+
+# Andamento de uma importação de leads (CSV ou NDJSON)
+class LeadImportJob(BaseModel):
+    id: str
+    format: str  # csv, ndjson
+    status: str  # pending, running, completed, failed
+    processed: int  # linhas lidas
+    created: int
+    failed: int
+    errors: List[Dict[str, Any]]  # primeiras linhas inválidas: {"line", "errors"}
+    error: Optional[str] = None  # motivo da falha do job
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 # Esquema para uso de leads
 class LeadUsageResponse(BaseModel):
     date: date
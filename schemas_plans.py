@@ -5,6 +5,8 @@ from typing import Optional
 class PlanBase(BaseModel):
     name: str
     description: Optional[str] = None
+    daily_limit: int = 10
+    extra_lead_price: float = 10.0
 
 class PlanCreate(PlanBase):
     pass
@@ -14,3 +16,6 @@ class PlanUpdate(PlanBase):
 
 class PlanInDB(PlanBase):
     id: int
+    
+    class Config:
+        from_attributes = True
@@ -28,3 +28,19 @@ class User(UserBase):
     
     class Config:
         from_attributes = True  # Anteriormente orm_mode = True
+
+# Esquema do usuário autenticado, mantido em cache pelo core_security
+# Imutável, pois a mesma instância é compartilhada entre requisições
+class UserPrincipal(BaseModel):
+    id: int
+    email: EmailStr
+    username: Optional[str] = None
+    full_name: Optional[str] = None
+    is_active: bool = True
+    is_superuser: bool = False
+    created_at: Optional[datetime] = None
+    token_version: int = 0
+    
+    class Config:
+        from_attributes = True
+        frozen = True
@@ -70,6 +70,9 @@ Base.metadata.create_all(bind=engine)
 logger.info('Tabelas criadas com sucesso')
 "
 
+# Aplicar migrações do Alembic (índices e alterações em tabelas existentes)
+alembic upgrade head
+
 # Verificar se é necessário criar usuário admin inicial
 echo "Verificando usuário administrador..."
 python -c "
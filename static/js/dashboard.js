@@ -7,6 +7,18 @@
  */
 
 document.addEventListener('DOMContentLoaded', function() {
+    // Estado das estatísticas montado a partir do stream (snapshot + deltas),
+    // declarado antes das inicializações abaixo, que já o utilizam
+    let dashboardState = null;
+    let pollingTimer = null;
+    
+    // Painéis do dashboard e os que dependem do período escolhido
+    const DASHBOARD_PANELS = ['cards', 'leads_evolution', 'breakdown', 'commissions'];
+    const SERIES_PANELS = ['leads_evolution', 'commissions'];
+    
+    // ETag da última resposta por URL; o servidor responde 304 se nada mudou
+    const dashboardEtags = {};
+    
     // Inicializar tema
     initializeTheme();
     
@@ -388,35 +400,258 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     /**
-     * Configura atualizações periódicas para o dashboard
+     * Configura as atualizações do dashboard
+     * Usa o stream SSE do servidor; sem suporte a streams no navegador ou
+     * com o limite de conexões do servidor atingido, volta à consulta
+     * periódica com ETag
      */
     function setupDashboardUpdates() {
         if (window.location.pathname.includes('/dashboard')) {
-            // Buscar dados iniciais
-            fetchDashboardData();
+            // Período e granularidade dos gráficos de evolução
+            ['series-start', 'series-end', 'series-granularity'].forEach(id => {
+                const control = document.getElementById(id);
+                if (control) {
+                    control.addEventListener('change', () => fetchDashboardPanels(SERIES_PANELS));
+                }
+            });
             
-            // Atualizar dados a cada 5 minutos
-            setInterval(fetchDashboardData, 300000);
+            // Cada painel é carregado por conta própria; o stream mantém todos atualizados
+            fetchDashboardPanels(DASHBOARD_PANELS);
+            connectDashboardStream(1000);
         }
     }
     
     /**
-     * Busca dados atualizados do dashboard via API
-     * Requer autenticação JWT
+     * Consulta periódica (a cada 5 minutos), usada quando o stream não está disponível
      */
-    function fetchDashboardData() {
+    function startDashboardPolling() {
+        if (pollingTimer === null) {
+            fetchDashboardData();
+            pollingTimer = setInterval(fetchDashboardData, 300000);
+        }
+    }
+    
+    /**
+     * Verifica se o usuário escolheu um período diferente do padrão do stream
+     * 
+     * @returns {boolean} true se houver datas ou granularidade diferente de mês
+     */
+    function isCustomSeriesPeriod() {
+        const start = document.getElementById('series-start');
+        const end = document.getElementById('series-end');
+        const granularity = document.getElementById('series-granularity');
+        return Boolean((start && start.value) || (end && end.value) ||
+            (granularity && granularity.value && granularity.value !== 'month'));
+    }
+    
+    /**
+     * Conecta ao stream SSE do dashboard (fetch, para enviar o token JWT)
+     * e reconecta com espera crescente se a conexão cair
+     * 
+     * @param {number} retryDelay - Espera antes da próxima reconexão (ms)
+     */
+    function connectDashboardStream(retryDelay) {
         const token = localStorage.getItem('access_token');
         if (!token) {
-            console.error('Token JWT não encontrado para buscar dados do dashboard.');
+            console.error('Token JWT não encontrado para o stream do dashboard.');
             return;
         }
-
-        fetch('/api/dashboard/stats', {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            startDashboardPolling();
+            return;
+        }
+        
+        fetch('/api/dashboard/stream', {
             headers: {
-                'Authorization': `Bearer ${token}`
+                'Authorization': `Bearer ${token}`,
+                'Accept': 'text/event-stream'
+            },
+            cache: 'no-store'
+        })
+        .then(response => {
+            if (response.status === 401) {
+                localStorage.removeItem('access_token');
+                window.location.href = '/login';
+                return 'stop';
+            }
+            if (response.status === 503) {
+                // Limite de conexões do worker atingido
+                startDashboardPolling();
+                return 'stop';
             }
+            if (!response.ok || !response.body) {
+                throw new Error('Erro ao abrir o stream do dashboard: ' + response.statusText);
+            }
+            // Conexão aberta: a próxima queda volta à espera inicial
+            retryDelay = 1000;
+            return readDashboardStream(response.body.getReader());
         })
+        .catch(error => {
+            console.error('Stream do dashboard interrompido:', error);
+        })
+        .then(result => {
+            if (result !== 'stop') {
+                setTimeout(() => connectDashboardStream(Math.min(retryDelay * 2, 60000)), retryDelay);
+            }
+        });
+    }
+    
+    /**
+     * Lê os eventos SSE até o fim do stream
+     * 
+     * @param {ReadableStreamDefaultReader} reader - Leitor do corpo da resposta
+     * @returns {Promise} Resolvida quando o servidor encerra o stream
+     */
+    function readDashboardStream(reader) {
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const blocks = buffer.split('\n\n');
+                buffer = blocks.pop();
+                blocks.forEach(handleDashboardStreamBlock);
+                return read();
+            });
+        }
+        return read();
+    }
+    
+    /**
+     * Trata um evento SSE: "snapshot" substitui o estado, "delta" atualiza
+     * só as chaves recebidas; heartbeats (comentários) são ignorados
+     * 
+     * @param {string} block - Texto de um evento SSE
+     */
+    function handleDashboardStreamBlock(block) {
+        let eventName = 'message';
+        const dataLines = [];
+        block.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                eventName = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+        if (dataLines.length === 0) {
+            return;
+        }
+        
+        const data = JSON.parse(dataLines.join('\n'));
+        if (eventName === 'snapshot') {
+            dashboardState = data;
+        } else if (eventName === 'delta' && dashboardState) {
+            dashboardState = { ...dashboardState, ...data };
+        } else {
+            return;
+        }
+        
+        updateElementText('dashboard-freshness', formatCacheAge(0));
+        if (isCustomSeriesPeriod()) {
+            // O stream cobre o período padrão; o período escolhido é revalidado via ETag
+            const { leads_evolution_data, commissions_evolution_data, ...panels } = dashboardState;
+            updateDashboardUI(panels);
+            fetchDashboardPanels(SERIES_PANELS);
+        } else {
+            updateDashboardUI(dashboardState);
+        }
+        // Painéis que falharam no servidor ficam marcados até o próximo cálculo
+        const unavailable = dashboardState.unavailable_panels || [];
+        DASHBOARD_PANELS.forEach(panel => {
+            setPanelState(panel, unavailable.includes(panel) ? 'error' : 'ready');
+        });
+        if (eventName === 'delta') {
+            showNotification('Dados atualizados com sucesso', 'success');
+        }
+    }
+    
+    /**
+     * Monta os parâmetros de período e granularidade escolhidos na tela
+     * 
+     * @returns {string} Query string (vazia para o padrão do servidor)
+     */
+    function seriesQueryString() {
+        const params = new URLSearchParams();
+        const start = document.getElementById('series-start');
+        const end = document.getElementById('series-end');
+        const granularity = document.getElementById('series-granularity');
+        if (start && start.value) {
+            params.set('start_date', start.value);
+        }
+        if (end && end.value) {
+            params.set('end_date', end.value);
+        }
+        if (granularity && granularity.value) {
+            params.set('granularity', granularity.value);
+        }
+        const query = params.toString();
+        return query ? `?${query}` : '';
+    }
+    
+    /**
+     * Busca os dados de todos os painéis do dashboard
+     */
+    function fetchDashboardData() {
+        fetchDashboardPanels(DASHBOARD_PANELS);
+    }
+    
+    /**
+     * Busca os painéis em paralelo; cada um é exibido assim que chega
+     * 
+     * @param {string[]} panels - Nomes dos painéis
+     */
+    function fetchDashboardPanels(panels) {
+        panels.forEach(fetchDashboardPanel);
+    }
+    
+    /**
+     * Marca o estado de carregamento de um painel na tela
+     * 
+     * @param {string} panel - Nome do painel
+     * @param {string} state - 'loading', 'ready' ou 'error'
+     */
+    function setPanelState(panel, state) {
+        document.querySelectorAll(`[data-panel="${panel}"]`).forEach(element => {
+            element.classList.toggle('panel-loading', state === 'loading');
+            element.classList.toggle('panel-error', state === 'error');
+        });
+    }
+    
+    /**
+     * Busca um painel do dashboard via API, revalidando com ETag
+     * Requer autenticação JWT
+     * 
+     * @param {string} panel - Nome do painel
+     */
+    function fetchDashboardPanel(panel) {
+        const token = localStorage.getItem('access_token');
+        if (!token) {
+            console.error('Token JWT não encontrado para buscar dados do dashboard.');
+            return;
+        }
+
+        const query = SERIES_PANELS.includes(panel) ? seriesQueryString() : '';
+        const url = `/api/dashboard/panels/${panel}${query}`;
+        const headers = {
+            'Authorization': `Bearer ${token}`
+        };
+        if (dashboardEtags[url]) {
+            headers['If-None-Match'] = dashboardEtags[url];
+        }
+
+        // A revalidação é feita aqui com a ETag, sem passar pelo cache HTTP do navegador
+        fetch(url, { headers, cache: 'no-store' })
         .then(response => {
+            updateElementText('dashboard-freshness', formatCacheAge(Number(response.headers.get('Age'))));
+            if (response.status === 304) {
+                // Dados inalterados: nada a redesenhar
+                setPanelState(panel, 'ready');
+                return null;
+            }
             if (response.status === 401) {
                  // Token inválido ou expirado
                  localStorage.removeItem('access_token');
@@ -426,15 +661,22 @@ document.addEventListener('DOMContentLoaded', function() {
             if (!response.ok) {
                 throw new Error('Erro ao buscar dados do dashboard: ' + response.statusText);
             }
+            const etag = response.headers.get('ETag');
+            if (etag) {
+                dashboardEtags[url] = etag;
+            }
             return response.json();
         })
         .then(data => {
-            updateDashboardUI(data);
+            if (data) {
+                updateDashboardUI(data);
+                setPanelState(panel, 'ready');
+            }
         })
         .catch(error => {
-            console.error('Erro ao buscar ou processar dados do dashboard:', error);
-            // Exibir mensagem de erro para o usuário em uma notificação
-            showNotification('Erro ao atualizar dados', 'error');
+            console.error(`Erro ao buscar ou processar o painel ${panel}:`, error);
+            // Só este painel fica marcado como indisponível
+            setPanelState(panel, 'error');
         });
     }
     
@@ -444,23 +686,38 @@ document.addEventListener('DOMContentLoaded', function() {
      * @param {Object} data - Dados do dashboard
      */
     function updateDashboardUI(data) {
-        // Atualizar cards
-        updateElementText('total-leads', data.total_leads);
-        updateElementText('qualified-leads', data.qualified_leads);
-        updateElementText('qualified-rate', data.qualified_rate);
-        updateElementText('converted-leads', data.converted_leads);
-        updateElementText('conversion-rate', data.conversion_rate);
-        updateElementText('estimated-revenue', `R$ ${data.estimated_revenue ?? '0,00'}`);
-        updateElementText('average-ticket', data.average_ticket);
+        // Atualizar cards (ausentes quando a resposta é de outro painel)
+        if (data.total_leads !== undefined) {
+            updateElementText('total-leads', data.total_leads);
+            updateElementText('qualified-leads', data.qualified_leads);
+            updateElementText('qualified-rate', data.qualified_rate);
+            updateElementText('converted-leads', data.converted_leads);
+            updateElementText('conversion-rate', data.conversion_rate);
+            updateElementText('estimated-revenue', `R$ ${data.estimated_revenue ?? '0,00'}`);
+            updateElementText('average-ticket', data.average_ticket);
+        }
         
         // Atualizar gráficos
         updateChart(window.leadsEvolutionChartInstance, data.leads_evolution_data);
         updateChart(window.conversionBySourceChartInstance, data.conversion_by_source_data);
         updateChart(window.leadStatusChartInstance, data.lead_status_data);
         updateChart(window.commissionsEvolutionChartInstance, data.commissions_evolution_data);
-        
-        // Mostrar notificação de sucesso
-        showNotification('Dados atualizados com sucesso', 'success');
+    }
+    
+    /**
+     * Descreve a idade dos dados servidos pelo cache do servidor
+     * 
+     * @param {number} seconds - Idade em segundos (cabeçalho Age)
+     * @returns {string} Texto de atualização exibido no cabeçalho
+     */
+    function formatCacheAge(seconds) {
+        if (seconds === undefined || seconds === null || Number.isNaN(seconds)) {
+            return '';
+        }
+        if (seconds < 60) {
+            return 'Atualizado agora';
+        }
+        return `Atualizado há ${Math.floor(seconds / 60)} min`;
     }
     
     /**
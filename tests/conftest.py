@@ -0,0 +1,43 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Fixtures compartilhadas dos testes
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+import pytest
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import LeadDailyStat
+from query_metrics import capture_queries
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Falha o teste se o bloco executar mais consultas SQL que o limite
+
+    Uso:
+        with assert_max_queries(3):
+            client.get("/api/leads/")
+    """
+    @contextmanager
+    def _assert_max_queries(max_queries: int):
+        with capture_queries() as stats:
+            yield stats
+        assert stats.count <= max_queries, (
+            f"{stats.count} consultas executadas (máximo {max_queries}):\n"
+            + "\n".join(stats.statements)
+        )
+    return _assert_max_queries
+
+
+def lead_rollup_rows(db):
+    """Linhas não vazias do agregado diário de leads, para comparar com rebuild_rollups"""
+    return sorted(
+        (row.day, row.source, row.status, row.assigned_to_id, row.lead_count)
+        for row in db.query(LeadDailyStat).filter(LeadDailyStat.lead_count != 0)
+    )
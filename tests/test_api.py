@@ -10,26 +10,32 @@ import sys
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
 # Adicionar diretório raiz ao path para importações
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Importar componentes da aplicação
 from main import app
-from database import Base, get_db
+from database import Base, get_db, get_async_db, get_read_db, get_async_read_db
 from models import User
 from core_security import get_password_hash
+import core_security
 
-# Configurar banco de dados de teste em memória
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Configurar banco de dados de teste em arquivo
+# (compartilhado entre a engine síncrona e a assíncrona)
+TEST_DATABASE_PATH = "./test_autocred.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DATABASE_PATH}"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DATABASE_PATH}")
+TestingAsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 # Sobrescrever a dependência get_db
 def override_get_db():
@@ -40,6 +46,15 @@ def override_get_db():
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+
+# Sobrescrever a dependência get_async_db
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_async_read_db] = override_get_async_db
 
 # Cliente de teste
 client = TestClient(app)
@@ -71,6 +86,16 @@ test_lead = {
 }
 
 
+# O login e o mapa de versões de token abrem as próprias sessões, fora das dependências
+@pytest.fixture(scope="module", autouse=True)
+def security_sessions():
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(core_security, "AsyncPrimaryReadSessionLocal", TestingAsyncSessionLocal)
+        mp.setattr(core_security, "AsyncSessionLocal", TestingAsyncSessionLocal)
+        mp.setattr(core_security.token_versions, "session_factory", TestingAsyncSessionLocal)
+        yield
+
+
 # Fixture para configurar o banco de dados de teste
 @pytest.fixture(scope="module")
 def setup_database():
@@ -107,6 +132,9 @@ def setup_database():
     
     # Limpar tabelas após os testes
     Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if os.path.exists(TEST_DATABASE_PATH):
+        os.remove(TEST_DATABASE_PATH)
 
 
 # Fixture para obter token de autenticação
@@ -234,6 +262,16 @@ def test_get_leads(user_token):
     assert len(response.json()) > 0
 
 
+def test_get_leads_query_budget(user_token, assert_max_queries):
+    """Teste que a listagem de leads não dispara consultas extras (N+1)"""
+    with assert_max_queries(3):
+        response = client.get(
+            "/api/leads/",
+            headers={"Authorization": f"Bearer {user_token}"}
+        )
+    assert response.status_code == 200
+
+
 def test_get_lead_by_id(user_token):
     """Teste de obtenção de lead por ID"""
     # Primeiro criar um lead
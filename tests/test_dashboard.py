@@ -0,0 +1,375 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes das estatísticas do dashboard
+"""
+
+import os
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models import Lead, Client
+from schemas_lead import LeadCreate, LeadUpdate
+from starlette.requests import Request
+import api_dashboard
+from api_dashboard import (
+    get_dashboard_stats, get_dashboard_panel, load_dashboard_stats, dashboard_cache, dashboard_feed
+)
+from api_plans import get_financial_report
+from rollups import rebuild_rollups
+from error_handlers import NotFoundError, ServiceUnavailableError, ValidationError
+import crud_lead
+from conftest import lead_rollup_rows
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Painéis em sequência na sessão do teste (o banco em memória tem uma única conexão)
+    monkeypatch.setattr(api_dashboard, "DASHBOARD_PARALLEL_PANELS", False)
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    now = datetime.now()
+    old = now - timedelta(days=90)
+    session.add_all([
+        Lead(name="A", source="Google", status="novo", created_at=now),
+        Lead(name="B", source="Google", status="qualificado", created_at=now),
+        Lead(name="C", source="Site", status="fechado", created_at=now),
+        Lead(name="D", source="Site", status="fechado", created_at=old),
+        Lead(name="E", source="Google", status="perdido", created_at=old),
+    ])
+    session.commit()
+    rebuild_rollups(session)
+    dashboard_cache.clear()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_dashboard_cards_and_breakdowns(db, assert_max_queries):
+    """Cards e gráficos de origem/status batem com os dados e usam poucas consultas"""
+    with assert_max_queries(4):
+        stats, _, _ = load_dashboard_stats(db, None)
+
+    assert stats["total_leads"] == 3
+    assert stats["qualified_leads"] == 2
+    assert stats["converted_leads"] == 1
+    assert stats["conversion_rate"] == 33.3
+
+    sources = stats["conversion_by_source_data"]
+    assert dict(zip(sources["labels"], sources["datasets"][0]["data"])) == {"Google": 3, "Site": 2}
+    assert sources["labels"][0] == "Google"
+    statuses = stats["lead_status_data"]
+    assert dict(zip(statuses["labels"], statuses["datasets"][0]["data"])) == {
+        "fechado": 2, "novo": 1, "qualificado": 1, "perdido": 1
+    }
+
+
+def test_dashboard_series_range_and_granularity(db):
+    """Os gráficos de evolução seguem o período e a granularidade escolhidos"""
+    today = date.today()
+    stats, _, _ = load_dashboard_stats(db, None, today - timedelta(days=6), today, "day")
+    leads = stats["leads_evolution_data"]
+    assert len(leads["labels"]) == 7
+    assert leads["datasets"][0]["data"][-1] == 3
+    assert len(stats["commissions_evolution_data"]["labels"]) == 7
+
+    monthly, _, _ = load_dashboard_stats(db, None)
+    assert len(monthly["leads_evolution_data"]["labels"]) == 12
+    assert sum(monthly["leads_evolution_data"]["datasets"][0]["data"]) == 5
+
+    with pytest.raises(ValidationError):
+        load_dashboard_stats(db, None, granularity="year")
+
+
+def test_dashboard_stats_cached_until_lead_write(db, assert_max_queries):
+    """A segunda leitura vem do cache e uma escrita de lead vence a entrada"""
+    first, _, _ = load_dashboard_stats(db, None)
+    with assert_max_queries(0):
+        cached, _, age = load_dashboard_stats(db, None)
+    assert cached["total_leads"] == first["total_leads"] == 3
+    assert age >= 0
+
+    invalidations = dashboard_cache.stats()["invalidations"]
+    crud_lead.create_lead(db, LeadCreate(name="F", email="f@example.com", source="Site"))
+    assert dashboard_cache.stats()["invalidations"] == invalidations + 1
+
+    key = next(iter(dashboard_cache._data))
+    # A entrada vencida ainda é servida enquanto o recálculo roda em segundo plano
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return {"total_leads": 4}
+
+    stale, _ = dashboard_cache.get(key, compute=lambda: None, refresh=refresh)
+    assert stale["stats"]["total_leads"] == 3
+    assert refreshed.wait(timeout=5)
+    dashboard_cache._executor.submit(lambda: None).result(timeout=5)
+    assert dashboard_cache.get(key, compute=lambda: None)[0] == {"total_leads": 4}
+
+
+def stats_request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/dashboard/stats",
+        "query_string": b"",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_dashboard_stats_conditional_get(db, assert_max_queries):
+    """A resposta traz ETag; If-None-Match igual responde 304 sem consultar o banco"""
+    response = get_dashboard_stats(stats_request(), db=db, current_user=None)
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert etag.startswith('"')
+
+    with assert_max_queries(0):
+        not_modified = get_dashboard_stats(stats_request(if_none_match=f'"outra", W/{etag}'), db=db, current_user=None)
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.body == b""
+
+    crud_lead.create_lead(db, LeadCreate(name="F", email="f@example.com", source="Site"))
+    dashboard_cache.clear()
+    changed = get_dashboard_stats(stats_request(if_none_match=etag), db=db, current_user=None)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_dashboard_panels_load_and_fail_independently(db, monkeypatch, assert_max_queries):
+    """Cada painel tem cache próprio e a falha de um não afeta os outros"""
+    with assert_max_queries(1):
+        cards = get_dashboard_panel(stats_request(), "cards", db=db, current_user=None)
+    assert json.loads(cards.body)["total_leads"] == 3
+    assert "leads_evolution_data" not in json.loads(cards.body)
+
+    def broken(*args):
+        raise RuntimeError("timeout")
+    monkeypatch.setitem(api_dashboard.DASHBOARD_PANELS, "commissions", broken)
+    with pytest.raises(ServiceUnavailableError):
+        get_dashboard_panel(stats_request(), "commissions", db=db, current_user=None)
+
+    leads = get_dashboard_panel(stats_request(), "leads_evolution", granularity="week", db=db, current_user=None)
+    assert sum(json.loads(leads.body)["leads_evolution_data"]["datasets"][0]["data"]) == 5
+    with assert_max_queries(0):
+        cached = get_dashboard_panel(stats_request(if_none_match=cards.headers["etag"]), "cards", db=db, current_user=None)
+    assert cached.status_code == 304
+
+    with pytest.raises(NotFoundError):
+        get_dashboard_panel(stats_request(), "inexistente", db=db, current_user=None)
+
+
+def test_dashboard_stats_degrade_per_panel(db, monkeypatch):
+    """Um painel com falha fica em unavailable_panels e os demais são devolvidos"""
+    def broken(*args):
+        raise RuntimeError("timeout")
+    monkeypatch.setitem(api_dashboard.DASHBOARD_PANELS, "commissions", broken)
+
+    stats, etag, _ = load_dashboard_stats(db, None)
+    assert stats["unavailable_panels"] == ["commissions"]
+    assert stats["total_leads"] == 3
+    assert "commissions_evolution_data" not in stats
+    assert etag is None
+
+    response = get_dashboard_stats(stats_request(), db=db, current_user=None)
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+
+
+def test_dashboard_panels_run_concurrently_with_query_timeout(tmp_path, monkeypatch):
+    """Em paralelo, cada painel usa sua sessão e uma consulta lenta é interrompida sozinha"""
+    file_engine = create_engine(f"sqlite:///{tmp_path / 'dashboard.db'}")
+    FileSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+    Base.metadata.create_all(bind=file_engine)
+    session = FileSessionLocal()
+    session.add_all([Lead(name="A", source="Google", status="novo"), Lead(name="B", source="Site", status="fechado")])
+    session.commit()
+    rebuild_rollups(session)
+    dashboard_cache.clear()
+    monkeypatch.setattr(api_dashboard, "PrimaryReadSessionLocal", FileSessionLocal)
+    monkeypatch.setattr(api_dashboard.replica_router, "use_replica", lambda: False)
+    monkeypatch.setattr(api_dashboard, "DASHBOARD_QUERY_TIMEOUT", 0.2)
+
+    threads = set()
+
+    def slow(db, *period):
+        threads.add(threading.current_thread().name)
+        db.execute(text(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+        )).scalar()
+    monkeypatch.setitem(api_dashboard.DASHBOARD_PANELS, "commissions", slow)
+
+    try:
+        stats, etag, _ = load_dashboard_stats(session, None, parallel=True)
+        assert stats["unavailable_panels"] == ["commissions"]
+        assert stats["total_leads"] == 2
+        assert sum(stats["leads_evolution_data"]["datasets"][0]["data"]) == 2
+        assert etag is None
+        assert threads and all(name.startswith("dashboard-panel") for name in threads)
+    finally:
+        session.close()
+        dashboard_cache.clear()
+        file_engine.dispose()
+
+
+def test_panel_deadline_starts_when_panel_runs(monkeypatch):
+    """Um painel que espera na fila por um worker não é dado como indisponível"""
+    monkeypatch.setattr(api_dashboard, "panel_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(api_dashboard, "DASHBOARD_QUERY_TIMEOUT", 0.2)
+
+    def panel(value):
+        time.sleep(0.3)
+        return value
+
+    try:
+        outcomes = api_dashboard._run_panels({"first": lambda: panel(1), "second": lambda: panel(2)})
+        assert outcomes == {"first": 1, "second": 2}
+    finally:
+        api_dashboard.panel_executor.shutdown(wait=True)
+
+
+def test_panel_stuck_in_queue_is_cancelled(monkeypatch):
+    """Um painel que não consegue worker é cancelado e nunca chega a rodar"""
+    monkeypatch.setattr(api_dashboard, "panel_executor", ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(api_dashboard, "DASHBOARD_QUERY_TIMEOUT", 0.1)
+    monkeypatch.setattr(api_dashboard, "DASHBOARD_PANEL_QUEUE_TIMEOUT", 0.1)
+    release = threading.Event()
+    ran = []
+
+    try:
+        outcomes = api_dashboard._run_panels({
+            "stuck": lambda: release.wait(5),
+            "queued": lambda: ran.append("queued"),
+        })
+        assert isinstance(outcomes["stuck"], TimeoutError)
+        assert isinstance(outcomes["queued"], TimeoutError)
+    finally:
+        release.set()
+        api_dashboard.panel_executor.shutdown(wait=True)
+    assert ran == []
+
+
+def test_stream_pushes_one_delta_per_change(db, monkeypatch):
+    """Uma escrita de lead gera um único recálculo e um delta para o assinante"""
+    monkeypatch.setattr(api_dashboard, "PrimaryReadSessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(api_dashboard.replica_router, "use_replica", lambda: False)
+    monkeypatch.setattr(dashboard_feed, "debounce_seconds", 0)
+
+    async def scenario():
+        subscriber, initial = await dashboard_feed.subscribe(None)
+        await asyncio.to_thread(
+            crud_lead.create_lead, db, LeadCreate(name="F", email="f@example.com", source="Site")
+        )
+        delta = await asyncio.wait_for(subscriber.queue.get(), timeout=5)
+        dashboard_feed.broadcaster.unsubscribe(subscriber)
+        return initial, delta
+
+    computations = dashboard_feed.computations
+    initial, delta = asyncio.run(scenario())
+    snapshot = json.loads(initial.split("data: ", 1)[1])
+    changes = json.loads(delta.split("data: ", 1)[1])
+    assert delta.startswith("event: delta")
+    assert snapshot["total_leads"] == 3
+    assert changes["total_leads"] == 4
+    assert "lead_status_data" in changes and "average_ticket" not in changes
+    assert dashboard_feed.computations == computations + 2
+
+
+def write_from_other_worker(db):
+    """Altera os agregados sem passar por este processo (nenhum aviso de alteração)"""
+    db.execute(text("UPDATE lead_daily_stats SET lead_count = lead_count + 1 WHERE status = 'novo'"))
+    db.commit()
+
+
+def test_stream_refreshes_writes_from_other_workers(db, monkeypatch):
+    """O recálculo periódico envia o delta de escritas que não avisaram este worker"""
+    monkeypatch.setattr(api_dashboard, "PrimaryReadSessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(api_dashboard.replica_router, "use_replica", lambda: False)
+    monkeypatch.setattr(dashboard_feed, "refresh_seconds", 0.05)
+
+    async def scenario():
+        subscriber, initial = await dashboard_feed.subscribe(None)
+        await asyncio.to_thread(write_from_other_worker, db)
+        delta = await asyncio.wait_for(subscriber.queue.get(), timeout=5)
+        dashboard_feed.broadcaster.unsubscribe(subscriber)
+        return initial, delta
+
+    initial, delta = asyncio.run(scenario())
+    assert json.loads(initial.split("data: ", 1)[1])["total_leads"] == 3
+    assert delta.startswith("event: delta")
+    assert json.loads(delta.split("data: ", 1)[1])["total_leads"] == 4
+
+
+def test_stream_reconnect_gets_fresh_snapshot(db, monkeypatch):
+    """Quem reconecta a um perfil sem assinantes recebe o estado atual, não o último guardado"""
+    monkeypatch.setattr(api_dashboard, "PrimaryReadSessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(api_dashboard.replica_router, "use_replica", lambda: False)
+    monkeypatch.setattr(dashboard_feed, "refresh_seconds", 0)
+
+    async def scenario():
+        subscriber, first = await dashboard_feed.subscribe(None)
+        dashboard_feed.broadcaster.unsubscribe(subscriber)
+        await asyncio.to_thread(write_from_other_worker, db)
+        subscriber, second = await dashboard_feed.subscribe(None)
+        dashboard_feed.broadcaster.unsubscribe(subscriber)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert json.loads(first.split("data: ", 1)[1])["total_leads"] == 3
+    assert json.loads(second.split("data: ", 1)[1])["total_leads"] == 4
+
+
+def test_crud_lead_keeps_rollup_in_sync(db):
+    """Criar, alterar e excluir leads pelo crud_lead mantém o agregado igual ao reconstruído"""
+    lead = crud_lead.create_lead(db, LeadCreate(name="F", email="f@example.com", source="Site"))
+    crud_lead.update_lead(db, lead, LeadUpdate(status="fechado", assigned_to_id=7))
+    other = crud_lead.create_lead(db, LeadCreate(name="G", email="g@example.com"))
+    crud_lead.delete_lead(db, crud_lead.get_lead(db, 1))
+
+    incremental = lead_rollup_rows(db)
+    rebuild_rollups(db)
+    assert incremental == lead_rollup_rows(db)
+    assert other.status == "novo"
+
+
+def test_financial_report_reads_purchase_rollup(db, assert_max_queries):
+    """Mudanças de status das compras refletem no relatório financeiro"""
+    db.add(Client(id=1, name="Cliente", email="cliente@example.com"))
+    db.commit()
+    first = crud_lead.create_lead_purchase(db, client_id=1, quantity=10, amount=50.0)
+    crud_lead.create_lead_purchase(db, client_id=1, quantity=5, amount=25.0)
+    crud_lead.update_lead_purchase_status(db, first.id, "aprovado")
+
+    with assert_max_queries(2):
+        report = get_financial_report(start_date=None, end_date=None, granularity=None, db=db)
+
+    assert report.total_revenue == 50.0
+    assert report.total_leads_sold == 10
+    assert report.purchases_by_status == {
+        "aprovado": {"count": 1, "total": 50.0},
+        "pendente": {"count": 1, "total": 25.0},
+    }
+    assert report.revenue_by_client == [
+        {"client_id": 1, "client_name": "Cliente", "revenue": 50.0, "leads_purchased": 10}
+    ]
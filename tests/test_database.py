@@ -0,0 +1,235 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da camada de banco de dados
+
+Este módulo testa o perfil do pool de conexões, suas estatísticas, o
+roteamento de leituras para a réplica e o modo de produção do SQLite.
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import (
+    Base,
+    get_engine,
+    lock_for_update,
+    get_pool_stats,
+    configure_sqlite_engine,
+    InstrumentedQueuePool,
+    ReplicaRouter
+)
+import models  # Registra todas as tabelas em Base
+import crud_lead
+from rollups import rebuild_rollups
+from schemas_lead import LeadCreate, LeadUpdate
+from conftest import lead_rollup_rows
+
+
+@pytest.fixture
+def small_pool_engine(tmp_path):
+    engine = get_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_file_engine_uses_instrumented_pool(small_pool_engine):
+    """Engines com arquivo usam o pool instrumentado"""
+    assert isinstance(small_pool_engine.pool, InstrumentedQueuePool)
+
+
+def test_memory_engine_keeps_default_pool():
+    """SQLite em memória mantém o pool padrão do SQLAlchemy"""
+    engine = get_engine("sqlite:///:memory:")
+    assert not isinstance(engine.pool, InstrumentedQueuePool)
+    assert get_pool_stats(engine)["pool_class"] == type(engine.pool).__name__
+
+
+def test_pool_stats_track_checkouts_and_timeouts(small_pool_engine):
+    """Estatísticas registram conexões em uso e esperas que estouram o timeout"""
+    conn = small_pool_engine.connect()
+    conn.execute(text("SELECT 1"))
+
+    stats = get_pool_stats(small_pool_engine)
+    assert stats["checked_out"] == 1
+    assert stats["checkouts"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        small_pool_engine.connect()
+
+    conn.close()
+    stats = get_pool_stats(small_pool_engine)
+    assert stats["checked_out"] == 0
+    assert stats["timeouts"] == 1
+    assert stats["wait_max_ms"] >= 50
+
+
+# Testes do roteamento para a réplica (dois arquivos SQLite)
+@pytest.fixture
+def replica_engine(tmp_path):
+    engine = get_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_replica_router_uses_healthy_replica(replica_engine):
+    """Leituras vão para a réplica quando ela responde dentro do limite de atraso"""
+    router = ReplicaRouter(replica_engine, max_lag_seconds=5, check_interval=60)
+    assert router.use_replica() is True
+    assert router.stats()["replica_reads"] == 1
+
+
+def test_replica_router_falls_back_when_lagging(replica_engine):
+    """Réplica atrasada além do limite desvia as leituras para o principal"""
+    router = ReplicaRouter(replica_engine, max_lag_seconds=5, check_interval=60, lag_probe=lambda conn: 30.0)
+    assert router.use_replica() is False
+    assert router.stats()["lag_seconds"] == 30.0
+    assert router.stats()["primary_reads"] == 1
+
+
+def test_replica_router_falls_back_when_unreachable(tmp_path):
+    """Réplica inacessível desvia as leituras para o principal"""
+    engine = get_engine(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    router = ReplicaRouter(engine, check_interval=60)
+    assert router.use_replica() is False
+    assert router.stats()["last_error"]
+
+
+def test_replica_router_rechecks_after_interval(replica_engine):
+    """A réplica volta a ser usada após a próxima verificação bem-sucedida"""
+    lag = {"value": 30.0}
+    router = ReplicaRouter(replica_engine, max_lag_seconds=5, check_interval=0, lag_probe=lambda conn: lag["value"])
+    assert router.use_replica() is False
+    lag["value"] = 1.0
+    assert router.use_replica() is True
+
+
+# Testes do modo de produção do SQLite
+@pytest.fixture
+def sqlite_engines(tmp_path):
+    url = f"sqlite:///{tmp_path / 'wal.db'}"
+    writer = configure_sqlite_engine(get_engine(url, pool_size=1, max_overflow=0), "writer")
+    reader = configure_sqlite_engine(get_engine(url, pool_size=2), "reader")
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value INTEGER)"))
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+def test_sqlite_connections_use_wal_and_pragmas(sqlite_engines):
+    """Toda conexão recebe WAL, busy_timeout e synchronous=NORMAL"""
+    writer, reader = sqlite_engines
+    for engine in (writer, reader):
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_sqlite_readers_do_not_block_on_open_write(sqlite_engines):
+    """Leituras continuam durante uma transação de escrita aberta"""
+    writer, reader = sqlite_engines
+    with writer.begin() as write_conn:
+        write_conn.execute(text("INSERT INTO items (value) VALUES (1)"))
+        with reader.connect() as read_conn:
+            assert read_conn.execute(text("SELECT COUNT(*) FROM items")).scalar() == 0
+    with reader.connect() as read_conn:
+        assert read_conn.execute(text("SELECT COUNT(*) FROM items")).scalar() == 1
+
+
+def test_sqlite_writer_locks_only_from_first_write(sqlite_engines, tmp_path):
+    """Leituras pelo escritor não prendem o lock; a primeira escrita obtém o BEGIN IMMEDIATE"""
+    writer, _ = sqlite_engines
+    other = sqlite3.connect(str(tmp_path / "wal.db"), timeout=0, isolation_level=None)
+    with writer.connect() as conn:
+        conn.execute(text("SELECT COUNT(*) FROM items")).scalar()
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+
+        conn.execute(text("INSERT INTO items (value) VALUES (1)"))
+        with pytest.raises(sqlite3.OperationalError):
+            other.execute("BEGIN IMMEDIATE")
+        conn.commit()
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("ROLLBACK")
+    other.close()
+
+
+def test_update_reads_rollup_key_under_write_lock(tmp_path):
+    """Dois workers atualizando o mesmo lead não desalinham o agregado diário"""
+    url = f"sqlite:///{tmp_path / 'workers.db'}"
+    worker_a, worker_b = (configure_sqlite_engine(get_engine(url, pool_size=1, max_overflow=0)) for _ in range(2))
+    Base.metadata.create_all(bind=worker_a)
+    SessionA, SessionB = (sessionmaker(autocommit=False, autoflush=False, bind=engine) for engine in (worker_a, worker_b))
+    with SessionA() as db:
+        lead_id = crud_lead.create_lead(db, LeadCreate(name="Ana", email="ana@example.com")).id
+
+    db_a, db_b = SessionA(), SessionB()
+    stale = crud_lead.get_lead(db_a, lead_id)  # lido antes da escrita do outro worker
+    crud_lead.update_lead(db_b, crud_lead.get_lead(db_b, lead_id), LeadUpdate(status="qualificado"))
+    crud_lead.update_lead(db_a, stale, LeadUpdate(status="fechado"))
+
+    incremental = lead_rollup_rows(db_a)
+    rebuild_rollups(db_a)
+    assert incremental == lead_rollup_rows(db_a)
+    assert [row[2] for row in incremental] == ["fechado"]
+
+    # Depois de lock_for_update, outro worker não consegue escrever até o commit
+    lock_for_update(db_a, stale)
+    other = sqlite3.connect(str(tmp_path / "workers.db"), timeout=0, isolation_level=None)
+    with pytest.raises(sqlite3.OperationalError):
+        other.execute("BEGIN IMMEDIATE")
+    db_a.rollback()
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("ROLLBACK")
+    other.close()
+    db_a.close()
+    db_b.close()
+    worker_a.dispose()
+    worker_b.dispose()
+
+
+def test_sqlite_reader_pool_is_read_only(sqlite_engines):
+    """O pool de leitura recusa escritas"""
+    _, reader = sqlite_engines
+    with pytest.raises(Exception):
+        with reader.begin() as conn:
+            conn.execute(text("INSERT INTO items (value) VALUES (1)"))
+
+
+def test_sqlite_concurrent_writes_are_serialized(sqlite_engines):
+    """Escritas concorrentes passam pelo escritor único sem 'database is locked'"""
+    writer, _ = sqlite_engines
+    errors = []
+
+    def write_many():
+        try:
+            for i in range(20):
+                with writer.begin() as conn:
+                    conn.execute(text("INSERT INTO items (value) VALUES (:v)"), {"v": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with writer.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM items")).scalar() == 80
@@ -0,0 +1,68 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da distribuição de eventos SSE
+"""
+
+import asyncio
+import os
+import sys
+import pytest
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_stream import EventBroadcaster, format_sse
+from error_handlers import ServiceUnavailableError
+
+
+def test_connection_cap_per_worker():
+    """Acima do limite, novas assinaturas recebem 503 até uma conexão sair"""
+    broadcaster = EventBroadcaster("teste", max_connections=2)
+    first = broadcaster.subscribe("admin")
+    broadcaster.subscribe("user")
+
+    with pytest.raises(ServiceUnavailableError) as exc:
+        broadcaster.subscribe("user")
+    assert exc.value.headers["Retry-After"] == "30"
+
+    broadcaster.unsubscribe(first)
+    broadcaster.subscribe("admin")
+    assert broadcaster.stats()["rejected"] == 1
+    assert broadcaster.stats()["groups"] == {"admin": 1, "user": 1}
+
+
+def test_slow_subscriber_gets_resync_instead_of_gaps():
+    """Com a fila cheia, o assinante lento recebe só o estado completo"""
+    async def scenario():
+        broadcaster = EventBroadcaster("teste", queue_size=2)
+        slow = broadcaster.subscribe("user")
+        other = broadcaster.subscribe("admin")
+        for version in range(3):
+            broadcaster.publish("user", format_sse("delta", {"v": version}), format_sse("snapshot", {"v": version}))
+        return slow, other, broadcaster
+
+    slow, other, broadcaster = asyncio.run(scenario())
+    assert slow.queue.qsize() == 1
+    assert slow.queue.get_nowait() == format_sse("snapshot", {"v": 2})
+    assert other.queue.empty()
+    assert broadcaster.stats()["resyncs"] == 1
+
+
+def test_events_send_initial_heartbeat_and_unsubscribe():
+    """O stream começa pelo estado inicial, envia heartbeat e libera a vaga ao fechar"""
+    async def scenario():
+        broadcaster = EventBroadcaster("teste", heartbeat_seconds=0.01)
+        subscriber = broadcaster.subscribe("user")
+        events = broadcaster.events(subscriber, initial=format_sse("snapshot", {"v": 1}))
+        received = [await events.__anext__() for _ in range(3)]
+        broadcaster.publish("user", format_sse("delta", {"v": 2}))
+        received.append(await events.__anext__())
+        await events.aclose()
+        return received, broadcaster.connections
+
+    received, connections = asyncio.run(scenario())
+    assert received[0] == "retry: 10\n\n"
+    assert received[1] == 'event: snapshot\ndata: {"v": 1}\n\n'
+    assert received[2] == ": heartbeat\n\n"
+    assert received[3] == 'event: delta\ndata: {"v": 2}\n\n'
+    assert connections == 0
@@ -0,0 +1,86 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da criação de leads em lote
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models import Lead
+from api_lead import create_leads_bulk, read_lead
+from lead_search import search_leads
+from rollups import rebuild_rollups
+import crud_lead
+from conftest import lead_rollup_rows
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_bulk_reports_each_item(db, monkeypatch, assert_max_queries):
+    """Itens válidos são inseridos em lotes e os inválidos voltam com os erros, na ordem enviada"""
+    monkeypatch.setattr(crud_lead, "BULK_LEAD_BATCH_SIZE", 2)
+    items = [
+        {"name": "Maria Silva", "email": "maria@example.com", "source": "Google"},
+        {"name": "Sem email"},
+        {"name": "João Souza", "email": "joao@example.com", "phone": "(11) 98888-5678"},
+        {"name": "Ana", "email": "não-é-email"},
+        {"name": "Pedro Lima", "email": "pedro@example.com", "status": "qualificado"},
+    ]
+
+    # 3 válidos em lotes de 2: um INSERT e um registro no índice de busca por
+    # lote, mais um ajuste do agregado por (dia, origem, status)
+    with assert_max_queries(7):
+        response = create_leads_bulk(items=items, db=db, current_user=SimpleNamespace(id=None, is_superuser=True))
+
+    assert (response.created, response.failed) == (3, 2)
+    assert [(result.index, result.status) for result in response.results] == [
+        (0, "created"), (1, "invalid"), (2, "created"), (3, "invalid"), (4, "created")
+    ]
+    assert "email" in response.results[1].errors
+    assert "email" in response.results[3].errors
+
+    ids = [result.id for result in response.results if result.id]
+    leads = {lead.id: lead for lead in db.query(Lead)}
+    assert [leads[lead_id].name for lead_id in ids] == ["Maria Silva", "João Souza", "Pedro Lima"]
+    assert leads[ids[0]].status == "novo"
+    assert [lead.name for lead in search_leads(db, "98888")] == ["João Souza"]
+
+    incremental = lead_rollup_rows(db)
+    rebuild_rollups(db)
+    assert incremental == lead_rollup_rows(db)
+    assert sum(row[-1] for row in incremental) == 3
+
+
+def test_bulk_leads_of_regular_user_are_assigned_to_them(db):
+    """Um usuário comum lista e lê de volta os leads que criou em lote"""
+    user = SimpleNamespace(id=7, is_superuser=False)
+    items = [{"name": "Maria Silva", "email": "maria@example.com"}, {"name": "João Souza", "email": "joao@example.com"}]
+    response = create_leads_bulk(items=items, db=db, current_user=user)
+
+    ids = [result.id for result in response.results]
+    assert sorted(lead.id for lead in crud_lead.get_leads(db, assigned_to_id=user.id)) == sorted(ids)
+    assert read_lead(lead_id=ids[0], db=db, current_user=user).name == "Maria Silva"
+    assert {row[3] for row in lead_rollup_rows(db)} == {user.id}
@@ -0,0 +1,222 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da importação de leads em CSV e NDJSON
+"""
+
+import asyncio
+import os
+import queue
+import sys
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import ClientDisconnect, Request
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models import Lead
+from api_lead import create_lead_import, get_lead_import, upload_lead_import
+from error_handlers import AuthorizationError, NotFoundError, ServiceUnavailableError, ValidationError
+from lead_search import search_leads
+from rollups import rebuild_rollups
+import lead_import
+from conftest import lead_rollup_rows
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(lead_import, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(lead_import, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(lead_import, "PrimaryReadSessionLocal", TestingSessionLocal)
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def in_pieces(body: str, size: int = 7):
+    """Corpo em pedaços pequenos, cortando linhas e caracteres UTF-8 ao meio"""
+    data = body.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_csv_import_in_chunks(db):
+    """CSV com BOM, coluna desconhecida e linhas inválidas é gravado em blocos"""
+    body = (
+        "﻿name,email,phone,source,ignorada\r\n"
+        "João Conceição,joao@example.com,(11) 98888-5678,Google,x\r\n"
+        "Sem email,,,,\r\n"
+        "Maria Silva,maria@example.com,,Indicação,\r\n"
+        "Ana,não-é-email,,,\r\n"
+        "Pedro Lima,pedro@example.com,,,\r\n"
+    )
+    job = lead_import.create_job("csv", created_by_id=None)
+    lead_import.run_import(job, in_pieces(body), session_factory=TestingSessionLocal)
+
+    assert job.status == "completed"
+    assert (job.processed, job.created, job.failed) == (5, 3, 2)
+    assert [error["line"] for error in job.errors] == [3, 5]
+    assert "email" in job.errors[1]["errors"]
+
+    assert sorted(lead.name for lead in db.query(Lead)) == ["João Conceição", "Maria Silva", "Pedro Lima"]
+    assert [lead.name for lead in search_leads(db, "988885678")] == ["João Conceição"]
+
+    incremental = lead_rollup_rows(db)
+    rebuild_rollups(db)
+    assert incremental == lead_rollup_rows(db)
+
+
+def test_ndjson_import_reports_bad_lines(db):
+    """Linhas NDJSON malformadas viram erros sem interromper a importação"""
+    body = (
+        '{"name": "Lúcia", "email": "lucia@example.com", "notes": "linha 1\\nlinha 2"}\n'
+        "\n"
+        "{não é json}\n"
+        '["lista"]\n'
+        '{"name": "Carlos", "email": "carlos@example.com", "status": "qualificado"}'
+    )
+    job = lead_import.create_job("ndjson", created_by_id=None)
+    lead_import.run_import(job, in_pieces(body, size=5), session_factory=TestingSessionLocal)
+
+    assert (job.status, job.processed, job.created, job.failed) == ("completed", 4, 2, 2)
+    assert [error["line"] for error in job.errors] == [3, 4]
+    lucia = db.query(Lead).filter(Lead.name == "Lúcia").one()
+    assert lucia.notes == "linha 1\nlinha 2"
+
+
+def test_failed_import_drains_body_and_keeps_written_chunks(db, monkeypatch):
+    """Uma linha longa demais encerra o job como falho, mantendo os blocos já gravados"""
+    monkeypatch.setattr(lead_import, "IMPORT_MAX_LINE_LENGTH", 50)
+    chunks = iter(in_pieces("name,email\nA,a@example.com\nB,b@example.com\n" + "x" * 200 + "\nC,c@example.com\n"))
+    job = lead_import.create_job("csv", created_by_id=None)
+    lead_import.run_import(job, chunks, session_factory=TestingSessionLocal)
+
+    assert job.status == "failed"
+    assert job.created == 2
+    assert next(chunks, None) is None
+    assert db.query(Lead).count() == 2
+
+
+def test_aborted_upload_fails_and_drops_partial_line(db):
+    """Corpo interrompido: o job falha, sem gravar a linha incompleta"""
+    chunks = queue.Queue()
+    for data in in_pieces("name,email\nA,a@example.com\nB,b@example.com\nC,c@exa"):
+        chunks.put(data)
+    chunks.put(lead_import.ABORTED)
+    job = lead_import.create_job("csv", created_by_id=None)
+    lead_import.run_import(job, lead_import.iter_queue(chunks), session_factory=TestingSessionLocal)
+
+    assert job.status == "failed"
+    assert job.created == 2
+    assert [lead.name for lead in db.query(Lead)] == ["A", "B"]
+    assert lead_import.get_job(job.id).status == "failed"
+
+
+def test_client_disconnect_fails_the_job(db):
+    """Se o cliente cai no meio do envio, o job não é concluído com o corpo truncado"""
+    messages = [
+        {"type": "http.request", "body": b"name,email\nA,a@example.com\nB,b@example.com\nC,c@exa", "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+
+    async def receive():
+        return messages.pop(0)
+
+    owner = SimpleNamespace(id=1, is_superuser=False)
+    job = lead_import.create_job("csv", created_by_id=owner.id)
+    request = Request({"type": "http", "method": "PUT", "path": "/", "headers": []}, receive)
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(upload_lead_import(job_id=job.id, request=request, current_user=owner))
+
+    assert get_lead_import(job_id=job.id, current_user=owner)["status"] == "failed"
+    assert [lead.name for lead in db.query(Lead)] == ["A", "B"]
+
+
+def test_abort_after_write_failure_still_finishes_the_job(db, monkeypatch):
+    """Um envio interrompido depois de uma falha não deixa o job "running" no banco"""
+    monkeypatch.setattr(lead_import, "IMPORT_MAX_LINE_LENGTH", 10)
+    chunks = queue.Queue()
+    for data in in_pieces("name,email\n" + "x" * 50 + "\nA,a@example.com\n"):
+        chunks.put(data)
+    chunks.put(lead_import.ABORTED)
+    job = lead_import.create_job("csv", created_by_id=None)
+    lead_import.run_import(job, lead_import.iter_queue(chunks), session_factory=TestingSessionLocal)
+
+    saved = lead_import.get_job(job.id)
+    assert (saved.status, saved.finished_at is not None) == ("failed", True)
+    assert "caracteres" in saved.error
+
+
+def test_upload_rejected_when_imports_are_saturated(db, monkeypatch):
+    """Com todas as vagas de importação ocupadas, o envio recebe 503 e o job continua pendente"""
+    monkeypatch.setattr(lead_import, "import_slots", threading.BoundedSemaphore(1))
+    lead_import.import_slots.acquire()
+    owner = SimpleNamespace(id=1, is_superuser=False)
+    job = lead_import.create_job("csv", created_by_id=owner.id)
+    request = Request({"type": "http", "method": "PUT", "path": "/", "headers": []})
+
+    with pytest.raises(ServiceUnavailableError) as excinfo:
+        asyncio.run(upload_lead_import(job_id=job.id, request=request, current_user=owner))
+    assert excinfo.value.status_code == 503
+    assert lead_import.get_job(job.id).status == "pending"
+
+
+def test_job_progress_is_shared_between_workers(db):
+    """O andamento fica no banco: outro worker consulta o job e não aceita um segundo envio"""
+    job = lead_import.create_job("ndjson", created_by_id=1)
+    lead_import.start_job(job)
+    with pytest.raises(ValidationError):
+        lead_import.start_job(lead_import.get_job(job.id))
+
+    lead_import.run_import(job, [b'{"name": "Ana", "email": "ana@example.com"}\n{}\n'],
+                           session_factory=TestingSessionLocal)
+
+    other_worker = lead_import.get_job(job.id)
+    assert other_worker.to_dict() == job.to_dict()
+    assert (other_worker.status, other_worker.created, other_worker.failed) == ("completed", 1, 1)
+
+
+def test_import_of_regular_user_is_assigned_to_them(db):
+    """Os leads importados por um usuário comum ficam com ele, também no agregado"""
+    owner = SimpleNamespace(id=7, is_superuser=False)
+    job = lead_import.get_job(create_lead_import(format="csv", current_user=owner)["id"])
+    lead_import.run_import(job, [b"name,email\nA,a@example.com\nB,b@example.com\nC,c@example.com\n"],
+                           session_factory=TestingSessionLocal)
+
+    assert {lead.assigned_to_id for lead in db.query(Lead)} == {owner.id}
+    assert [row[3] for row in lead_rollup_rows(db)] == [owner.id]
+
+
+def test_job_lookup(db):
+    """Jobs só podem ser consultados pelo dono; formato e id desconhecidos são rejeitados"""
+    with pytest.raises(ValidationError):
+        lead_import.create_job("xlsx", created_by_id=1)
+    with pytest.raises(NotFoundError):
+        lead_import.get_job("inexistente")
+
+    job = lead_import.create_job("csv", created_by_id=1)
+    owner = SimpleNamespace(id=1, is_superuser=False)
+    assert get_lead_import(job_id=job.id, current_user=owner)["status"] == "pending"
+    with pytest.raises(AuthorizationError):
+        get_lead_import(job_id=job.id, current_user=SimpleNamespace(id=2, is_superuser=False))
+
+
+    # Jobs terminados há mais de LEAD_IMPORT_JOB_TTL segundos expiram
+    job.finished_at = job.created_at - timedelta(seconds=lead_import.IMPORT_JOB_TTL + 1)
+    lead_import.save_job(job)
+    with pytest.raises(NotFoundError):
+        lead_import.get_job(job.id)
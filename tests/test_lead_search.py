@@ -0,0 +1,87 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da busca textual de leads
+"""
+
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from schemas_lead import LeadCreate, LeadUpdate
+from lead_search import search_leads
+from api_lead import router
+from error_handlers import ValidationError
+import crud_lead
+import lead_search
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    for name, email, phone in [
+        ("Maria Silva", "maria.silva@example.com", "(11) 99999-1234"),
+        ("João Souza", "joao@silvaimoveis.com", "(21) 98888-5678"),
+        ("Ana Pereira", "ana@example.com", None),
+    ]:
+        crud_lead.create_lead(session, LeadCreate(name=name, email=email, phone=phone))
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def names(leads):
+    return [lead.name for lead in leads]
+
+
+def test_search_partial_fields_ranked(db):
+    """Trechos de nome, email e telefone encontram o lead; nome pesa mais que email"""
+    assert names(search_leads(db, "silva")) == ["Maria Silva", "João Souza"]
+    assert names(search_leads(db, "ereir")) == ["Ana Pereira"]
+    assert names(search_leads(db, "999991234")) == ["Maria Silva"]
+    assert names(search_leads(db, "98888-56")) == ["João Souza"]
+    assert names(search_leads(db, "silva example")) == ["Maria Silva"]
+    assert search_leads(db, 'x"y OR z*') == []
+
+    with pytest.raises(ValidationError):
+        search_leads(db, "an o")
+
+
+def test_broad_search_ranks_most_recent_candidates(db, monkeypatch):
+    """A relevância é calculada só entre os LEAD_SEARCH_RANK_CANDIDATES resultados mais recentes"""
+    monkeypatch.setattr(lead_search, "RANK_CANDIDATES", 1)
+    assert names(search_leads(db, "silva")) == ["João Souza"]
+
+
+def test_search_index_follows_crud_writes(db):
+    """Criar, alterar e excluir pelo crud_lead atualizam o índice na mesma transação"""
+    maria = search_leads(db, "Maria")[0]
+    crud_lead.update_lead(db, maria, LeadUpdate(name="Mariana Costa", email="mc@example.org", assigned_to_id=7))
+    assert names(search_leads(db, "Silva")) == ["João Souza"]
+    assert names(search_leads(db, "Costa")) == ["Mariana Costa"]
+    assert names(search_leads(db, "Costa", assigned_to_id=7)) == ["Mariana Costa"]
+    assert search_leads(db, "Costa", assigned_to_id=8) == []
+
+    crud_lead.delete_lead(db, maria)
+    assert search_leads(db, "Costa") == []
+    assert names(search_leads(db, "example")) == ["Ana Pereira"]
+
+
+def test_search_route_declared_before_lead_id():
+    """/leads/search vem antes de /leads/{lead_id}, senão "search" seria lido como ID"""
+    paths = [route.path for route in router.routes]
+    assert paths.index("/leads/search") < paths.index("/leads/{lead_id}")
@@ -0,0 +1,80 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes das migrations do Alembic
+
+Este módulo aplica as migrations em bancos SQLite temporários, tanto em
+um banco criado pelo create_all quanto em um esquema antigo sem índices.
+"""
+
+import os
+import sys
+import sqlite3
+import pytest
+from alembic import command
+from alembic.config import Config
+
+# Adicionar diretório raiz ao path para importações
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from database import Base, get_engine
+import models
+
+
+def alembic_config(db_path):
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT_DIR, "alembic"))
+    config.set_main_option("sqlalchemy.url", f"sqlite:///{db_path}")
+    return config
+
+
+def index_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_upgrade_on_create_all_schema(tmp_path):
+    """Migrations rodam sobre um banco já criado pelo create_all"""
+    db_path = tmp_path / "fresh.db"
+    engine = get_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("INSERT INTO leads (name, email, phone) VALUES ('Maria Silva', 'maria@example.com', '(11) 9999-1234')")
+
+    command.upgrade(alembic_config(db_path), "head")
+    assert {"uq_lead_usages_client_id_date", "ix_leads_created_at_id", "ix_users_created_at_id"} <= index_names(db_path)
+    # O índice de busca criado junto com a tabela é preenchido com os leads existentes
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT rowid, phone_digits FROM leads_fts WHERE leads_fts MATCH 'silva'").fetchall() == [
+            (1, "1199991234")
+        ]
+
+
+def test_upgrade_adds_indexes_and_merges_duplicate_usage(tmp_path):
+    """Esquema antigo recebe os índices e o uso duplicado é consolidado"""
+    db_path = tmp_path / "legacy.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript("""
+            CREATE TABLE leads (id INTEGER PRIMARY KEY, name VARCHAR, status VARCHAR, created_at DATETIME);
+            CREATE TABLE lead_purchases (id INTEGER PRIMARY KEY, client_id INTEGER, quantity INTEGER,
+                                         amount FLOAT, status VARCHAR, created_at DATETIME);
+            CREATE TABLE lead_usages (id INTEGER PRIMARY KEY, client_id INTEGER, date DATE, total_consumed INTEGER);
+            INSERT INTO lead_usages (client_id, date, total_consumed)
+            VALUES (1, '2026-01-01', 3), (1, '2026-01-01', 4), (2, '2026-01-01', 1);
+        """)
+
+    command.upgrade(alembic_config(db_path), "0001_composite_indexes")
+
+    assert {
+        "ix_leads_created_at_status",
+        "ix_lead_purchases_client_id_status",
+        "ix_lead_purchases_status_created_at",
+        "uq_lead_usages_client_id_date",
+    } <= index_names(db_path)
+    with sqlite3.connect(db_path) as conn:
+        usages = conn.execute("SELECT client_id, total_consumed FROM lead_usages ORDER BY client_id").fetchall()
+    assert usages == [(1, 7), (2, 1)]
+
+    command.downgrade(alembic_config(db_path), "base")
+    assert "uq_lead_usages_client_id_date" not in index_names(db_path)
@@ -0,0 +1,114 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da paginação por cursor
+"""
+
+import os
+import sys
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models import Lead, Client
+from schemas_lead import LeadCreate
+from pagination import decode_cursor, encode_cursor, set_next_cursor
+from error_handlers import ValidationError
+import crud_lead
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def all_pages(fetch, limit):
+    ids, cursor = [], None
+    while True:
+        rows, cursor = fetch(limit=limit, cursor=cursor)
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+
+
+def test_lead_pages_cover_ties_without_gaps_or_repeats(db):
+    """Leads com o mesmo created_at (gravado pelo banco ou pela aplicação) aparecem uma vez, em ordem"""
+    same_second = datetime(2026, 1, 1, 12, 0, 0)
+    db.add_all([Lead(name=f"L{i}", status="novo", created_at=same_second) for i in range(5)])
+    db.commit()
+    for i in range(4):
+        crud_lead.create_lead(db, LeadCreate(name=f"N{i}", email=f"n{i}@example.com"))
+
+    ids = all_pages(lambda **page: crud_lead.get_leads_page(db, **page), limit=2)
+    assert ids == [9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+
+def test_lead_pages_respect_filters_and_new_rows(db):
+    """O cursor mantém os filtros e leads novos não deslocam as páginas seguintes"""
+    db.add_all([
+        Lead(name=f"L{i}", status="novo" if i % 2 else "fechado", assigned_to_id=1, created_at=datetime(2026, 1, i + 1))
+        for i in range(6)
+    ])
+    db.commit()
+
+    first, cursor = crud_lead.get_leads_page(db, limit=2, assigned_to_id=1, status="novo")
+    assert [lead.id for lead in first] == [6, 4]
+    db.add(Lead(name="Novo", status="novo", assigned_to_id=1, created_at=datetime(2026, 2, 1)))
+    db.commit()
+    rest, cursor = crud_lead.get_leads_page(db, limit=2, assigned_to_id=1, status="novo", cursor=cursor)
+    assert [lead.id for lead in rest] == [2]
+    assert cursor is None
+
+    # Com a linha do cursor excluída, vale o created_at guardado no cursor
+    db.delete(first[1])
+    db.commit()
+    after_delete, _ = crud_lead.get_leads_page(db, limit=5, cursor=encode_cursor(datetime(2026, 1, 4), 4))
+    assert [lead.id for lead in after_delete] == [3, 2, 1]
+
+    # skip continua aceito como paginação legada
+    assert [lead.id for lead in crud_lead.get_leads(db, skip=1, limit=2)] == [6, 5]
+
+
+def test_lead_purchase_pages(db):
+    """Compras paginam por cursor com o filtro de cliente"""
+    db.add_all([Client(id=1, name="A", email="a@example.com"), Client(id=2, name="B", email="b@example.com")])
+    db.commit()
+    for client_id in (1, 2, 1, 1):
+        crud_lead.create_lead_purchase(db, client_id=client_id, quantity=1, amount=1.0)
+
+    ids = all_pages(lambda **page: crud_lead.get_lead_purchases_page(db, client_id=1, **page), limit=2)
+    assert ids == [4, 3, 1]
+
+
+def test_invalid_cursor_and_headers():
+    """Cursor malformado é erro de validação; o próximo cursor vai nos cabeçalhos"""
+    assert decode_cursor(encode_cursor(datetime(2026, 1, 1, 8, 30), 42)) == (datetime(2026, 1, 1, 8, 30), 42)
+    with pytest.raises(ValidationError):
+        decode_cursor("não-é-um-cursor")
+
+    request = Request({
+        "type": "http", "method": "GET", "path": "/api/leads/", "scheme": "http",
+        "server": ("testserver", 80), "query_string": b"skip=10&status=novo", "headers": [],
+    })
+    response = Response()
+    set_next_cursor(request, response, "abc")
+    assert response.headers["x-next-cursor"] == "abc"
+    assert response.headers["link"] == '<http://testserver/api/leads/?status=novo&cursor=abc>; rel="next"'
@@ -0,0 +1,81 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da consulta de clientes e planos
+"""
+
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models_plans import Plan, Client
+from api_plans import get_client_with_plan, invalidate_plan_cache, plan_cache
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    invalidate_plan_cache()
+    session = TestingSessionLocal()
+    plan = Plan(name="Básico", daily_limit=20, extra_lead_price=5.0)
+    session.add(plan)
+    session.flush()
+    session.add(Client(id=1, name="Cliente", email="cliente@example.com", plan_id=plan.id))
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_cached_plan_needs_single_query(db, assert_max_queries):
+    """Com o plano em cache, cliente e plano saem de uma única consulta"""
+    get_client_with_plan(db, 1)
+    db.expire_all()
+
+    with assert_max_queries(1):
+        client, plan = get_client_with_plan(db, 1)
+
+    assert client.id == 1
+    assert plan.daily_limit == 20
+    assert plan_cache.stats()["hits"] >= 1
+
+
+def test_editing_plan_invalidates_cache(db):
+    """Editar um plano pelo ORM remove a versão em cache"""
+    _, plan = get_client_with_plan(db, 1)
+
+    db.query(Plan).filter(Plan.id == plan.id).one().daily_limit = 50
+    db.commit()
+
+    _, plan = get_client_with_plan(db, 1)
+    assert plan.daily_limit == 50
+
+
+def test_plan_cache_is_invalidated_on_commit_only(db):
+    """O cache só é invalidado no commit; alterações desfeitas mantêm a entrada"""
+    _, plan = get_client_with_plan(db, 1)
+
+    db.query(Plan).filter(Plan.id == plan.id).one().daily_limit = 50
+    db.flush()
+    assert plan_cache.get(plan.id) is not None
+    db.rollback()
+    assert plan_cache.get(plan.id).daily_limit == 20
+
+    db.query(Plan).filter(Plan.id == plan.id).one().daily_limit = 60
+    db.flush()
+    assert plan_cache.get(plan.id) is not None
+    db.commit()
+    assert plan_cache.get(plan.id) is None
@@ -0,0 +1,70 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes das métricas de consultas por requisição
+"""
+
+import os
+import sys
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import RequestLoggingMiddleware
+from query_metrics import QueryStats, start_tracking, stop_tracking
+
+engine = create_engine("sqlite:///:memory:")
+
+app = FastAPI()
+app.add_middleware(RequestLoggingMiddleware, server_timing=True)
+
+
+@app.get("/two-queries")
+def two_queries():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    return {"ok": True}
+
+
+client = TestClient(app)
+
+
+def test_tracking_counts_queries_in_context():
+    """Consultas do contexto atual são acumuladas nos totais da requisição"""
+    stats = QueryStats("req-1")
+    token = start_tracking(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    finally:
+        stop_tracking(token)
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert stats.count == 1
+    assert stats.as_dict()["db_time_ms"] >= 0
+
+
+def test_server_timing_header_reports_request_queries():
+    """O header Server-Timing traz as consultas executadas pela rota"""
+    response = client.get("/two-queries")
+    assert response.status_code == 200
+    assert 'desc="2 queries"' in response.headers["server-timing"]
+
+
+def test_assert_max_queries_passes_within_limit(assert_max_queries):
+    """O helper aceita rotas dentro do limite de consultas"""
+    with assert_max_queries(2):
+        client.get("/two-queries")
+
+
+def test_assert_max_queries_fails_above_limit(assert_max_queries):
+    """O helper falha quando a rota excede o limite de consultas"""
+    with pytest.raises(AssertionError, match="2 consultas executadas"):
+        with assert_max_queries(1):
+            client.get("/two-queries")
@@ -0,0 +1,152 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes do bloqueio de tentativas de login
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+import pytest
+from starlette.requests import Request
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from error_handlers import AuthenticationError, RateLimitError
+import api_auth
+from rate_limit import LoginThrottle, MemoryBackend, SQLiteBackend, SlidingWindowLimiter, get_client_ip
+
+
+def make_throttle(backend, account_limit=3, ip_limit=5):
+    return LoginThrottle(
+        account_limiter=SlidingWindowLimiter("account", account_limit, 60, backend),
+        ip_limiter=SlidingWindowLimiter("ip", ip_limit, 60, backend),
+    )
+
+
+def test_sliding_window_weights_previous_window():
+    """A janela anterior conta proporcionalmente ao tempo restante"""
+    limiter = SlidingWindowLimiter("test", 10, 60, MemoryBackend())
+    for _ in range(4):
+        limiter.hit("chave", now=30)
+
+    assert limiter.count("chave", now=59) == 4
+    assert limiter.count("chave", now=75) == pytest.approx(3)
+    assert limiter.count("chave", now=125) == 0
+
+
+@pytest.mark.parametrize("backend_kind", ["memory", "sqlite"])
+def test_throttle_blocks_account_and_ip(tmp_path, backend_kind):
+    """Falhas bloqueiam a conta e o IP; sucesso zera a conta e devolve a reserva do IP"""
+    backend = MemoryBackend() if backend_kind == "memory" else SQLiteBackend(str(tmp_path / "throttle.db"))
+    throttle = make_throttle(backend)
+
+    for _ in range(3):
+        throttle.reserve("Ana@example.com", "10.0.0.1")
+
+    with pytest.raises(RateLimitError) as excinfo:
+        throttle.reserve("ana@example.com", "10.0.0.2")
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.details["scope"] == "account"
+    # A reserva do IP feita antes do bloqueio da conta é devolvida
+    assert throttle.ip_limiter.count("10.0.0.2") == 0
+
+    throttle.account_limiter.reset("ana@example.com")
+    throttle.record_success(throttle.reserve("ana@example.com", "10.0.0.1"))
+    assert throttle.account_limiter.count("ana@example.com") == 0
+    assert throttle.ip_limiter.count("10.0.0.1") == pytest.approx(3)
+
+    for _ in range(2):
+        throttle.reserve("bruno@example.com", "10.0.0.1")
+    with pytest.raises(RateLimitError) as excinfo:
+        throttle.reserve("carla@example.com", "10.0.0.1")
+    assert excinfo.value.details["scope"] == "ip"
+    assert throttle.stats()["ip"]["rejected"] == 1
+
+
+@pytest.mark.parametrize("backend_kind", ["memory", "sqlite"])
+def test_concurrent_attempts_cannot_pass_the_limit(tmp_path, backend_kind):
+    """Uma rajada simultânea só obtém reservas até o limite"""
+    path = str(tmp_path / "throttle.db")
+    backend_factory = MemoryBackend if backend_kind == "memory" else (lambda: SQLiteBackend(path))
+    shared = backend_factory()
+    throttle = make_throttle(shared, account_limit=3, ip_limit=100)
+    start = threading.Barrier(10)
+    results = []
+
+    def attempt():
+        start.wait()
+        try:
+            results.append(throttle.reserve("ana@example.com", "10.0.0.1"))
+        except RateLimitError:
+            results.append(None)
+
+    threads = [threading.Thread(target=attempt) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len([result for result in results if result is not None]) == 3
+
+    # Uma tentativa não avaliada (ex.: 503 do pool de hash) devolve a reserva
+    throttle.release(next(result for result in results if result is not None))
+    throttle.reserve("ana@example.com", "10.0.0.1")
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    """Dois workers com o mesmo arquivo enxergam os mesmos contadores"""
+    path = str(tmp_path / "throttle.db")
+    worker_a = make_throttle(SQLiteBackend(path))
+    worker_b = make_throttle(SQLiteBackend(path))
+
+    for _ in range(3):
+        worker_a.reserve("ana@example.com", "10.0.0.1")
+
+    with pytest.raises(RateLimitError):
+        worker_b.reserve("ana@example.com", "10.0.0.9")
+
+
+def make_request(peer, headers=None):
+    return Request({
+        "type": "http", "method": "POST", "path": "/login", "client": (peer, 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+
+def test_client_ip_behind_trusted_proxy():
+    """Atrás do nginx vale o X-Forwarded-For; endereços forjados à esquerda são ignorados"""
+    assert get_client_ip(make_request("172.18.0.5", {"X-Forwarded-For": "203.0.113.7"})) == "203.0.113.7"
+    assert get_client_ip(make_request(
+        "172.18.0.5", {"X-Forwarded-For": "198.51.100.1, 203.0.113.7, 10.0.0.2"}
+    )) == "203.0.113.7"
+    assert get_client_ip(make_request("172.18.0.5", {"X-Real-IP": "203.0.113.8"})) == "203.0.113.8"
+    # Conexão direta de fora do proxy: cabeçalhos não são confiáveis
+    assert get_client_ip(make_request("203.0.113.9", {"X-Forwarded-For": "198.51.100.1"})) == "203.0.113.9"
+
+
+def test_login_reserves_off_the_event_loop(monkeypatch):
+    """A reserva (que pode esperar pelo lock do SQLite) não roda na thread do event loop"""
+    throttle = make_throttle(MemoryBackend())
+    reserve, threads = throttle.reserve, []
+
+    def tracked_reserve(*args):
+        threads.append(threading.current_thread())
+        return reserve(*args)
+
+    async def authenticate(email, password):
+        return False
+
+    monkeypatch.setattr(throttle, "reserve", tracked_reserve)
+    monkeypatch.setattr(api_auth, "login_throttle", throttle)
+    monkeypatch.setattr(api_auth.core_security, "authenticate_user_async", authenticate)
+
+    with pytest.raises(AuthenticationError):
+        asyncio.run(api_auth.login_for_access_token(
+            request=make_request("10.0.0.1"), response=None,
+            form_data=SimpleNamespace(username="ana@example.com", password="errada")
+        ))
+    assert threads and threads[0] is not threading.main_thread()
+    assert throttle.account_limiter.count("ana@example.com") == 1
@@ -0,0 +1,227 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes da autenticação (core_security)
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bounded_executor import BoundedExecutor
+from database import Base, get_engine
+from error_handlers import ServiceUnavailableError
+from models_user import User
+from schemas_user import UserUpdate
+from token_versions import TokenVersionMap
+import core_security
+import crud_user
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'security.db'}"
+    engine = get_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    session = SessionLocal()
+    session.add(User(email="ana@example.com", username="ana", hashed_password="x", full_name="Ana"))
+    session.commit()
+    core_security.user_cache.clear()
+    yield session, AsyncSessionLocal
+    session.close()
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def current_user(AsyncSessionLocal, token, dependency=core_security.get_current_user):
+    async def _run():
+        async with AsyncSessionLocal() as db:
+            return await dependency(token=token, db=db)
+    return asyncio.run(_run())
+
+
+def test_current_user_is_cached(sessions, assert_max_queries):
+    """A segunda requisição com o mesmo token não consulta o banco"""
+    _, AsyncSessionLocal = sessions
+    token = core_security.create_access_token({"sub": "ana@example.com"})
+
+    first = current_user(AsyncSessionLocal, token)
+    hits = core_security.user_cache.stats()["hits"]
+    with assert_max_queries(0):
+        second = current_user(AsyncSessionLocal, token)
+
+    assert second is first
+    assert second.full_name == "Ana"
+    assert core_security.user_cache.stats()["hits"] == hits + 1
+
+
+def test_update_user_invalidates_cache(sessions):
+    """Alterar o usuário pelo crud_user remove a entrada do cache"""
+    session, AsyncSessionLocal = sessions
+    token = core_security.create_access_token({"sub": "ana@example.com"})
+    assert current_user(AsyncSessionLocal, token).is_active
+
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    crud_user.update_user(session, db_user, UserUpdate(is_active=False))
+
+    assert not current_user(AsyncSessionLocal, token).is_active
+
+
+def test_password_pool_rejects_when_saturated(monkeypatch):
+    """Com o pool de hash cheio, a verificação falha rápido com 503"""
+    executor = BoundedExecutor("test-hash", max_workers=1, max_queue=0)
+    monkeypatch.setattr(core_security, "password_executor", executor)
+    release = threading.Event()
+
+    async def _run():
+        busy = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ServiceUnavailableError) as excinfo:
+            await core_security.verify_password_async("senha", core_security.get_password_hash("senha"))
+        release.set()
+        await busy
+        return excinfo.value
+
+    error = asyncio.run(_run())
+    executor.shutdown()
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_verify_password_async_runs_in_pool():
+    """A verificação assíncrona usa o pool e registra a latência"""
+    hashed = core_security.get_password_hash("senha")
+    completed = core_security.password_executor.stats()["completed"]
+
+    assert asyncio.run(core_security.verify_password_async("senha", hashed))
+    assert not asyncio.run(core_security.verify_password_async("outra", hashed))
+    assert core_security.password_executor.stats()["completed"] == completed + 2
+
+
+def test_principal_authorizes_from_claims(sessions, monkeypatch, assert_max_queries):
+    """Com o mapa de versões carregado, a rota de leitura não consulta users"""
+    session, AsyncSessionLocal = sessions
+    monkeypatch.setattr(core_security, "token_versions", TokenVersionMap(AsyncSessionLocal))
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    token = core_security.create_user_access_token(db_user)
+    current_user(AsyncSessionLocal, token, core_security.get_current_principal)
+
+    with assert_max_queries(0):
+        principal = current_user(AsyncSessionLocal, token, core_security.get_current_principal)
+
+    assert principal.id == db_user.id
+    assert principal.email == "ana@example.com"
+    assert not principal.is_superuser
+
+
+def test_deactivation_revokes_issued_tokens(sessions, monkeypatch):
+    """Desativar o usuário incrementa a versão e invalida os tokens emitidos"""
+    session, AsyncSessionLocal = sessions
+    monkeypatch.setattr(core_security, "token_versions", TokenVersionMap(AsyncSessionLocal))
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    token = core_security.create_user_access_token(db_user)
+    current_user(AsyncSessionLocal, token, core_security.get_current_principal)
+
+    crud_user.update_user(session, db_user, UserUpdate(is_active=False))
+
+    assert db_user.token_version == 1
+    for dependency in (core_security.get_current_principal, core_security.get_current_user):
+        with pytest.raises(HTTPException) as excinfo:
+            current_user(AsyncSessionLocal, token, dependency)
+        assert excinfo.value.status_code == 401
+
+
+def test_principal_rejects_inactive_user(sessions, monkeypatch):
+    """Usuário já inativo (versão inalterada) não passa pelas claims do token"""
+    session, AsyncSessionLocal = sessions
+    versions = TokenVersionMap(AsyncSessionLocal)
+    monkeypatch.setattr(core_security, "token_versions", versions)
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    db_user.is_active = False
+    session.commit()
+    token = core_security.create_user_access_token(db_user)
+
+    with pytest.raises(HTTPException) as excinfo:
+        current_user(AsyncSessionLocal, token, core_security.get_current_principal)
+    assert excinfo.value.status_code == 403
+    assert versions.get(db_user.id) is None
+
+
+def test_decode_access_token_is_cached_until_exp():
+    """Tokens verificados vêm do cache, que respeita o exp do token"""
+    core_security.token_cache.clear()
+    token = core_security.create_access_token({"sub": "ana@example.com"})
+    hits = core_security.token_cache.hits
+
+    first = core_security.decode_access_token(token)
+    second = core_security.decode_access_token(token)
+
+    assert second == first
+    assert core_security.token_cache.hits == hits + 1
+
+    expired = core_security.create_access_token({"sub": "ana@example.com"}, timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        core_security.decode_access_token(expired)
+    assert len(core_security.token_cache) == 1
+
+
+def test_login_rehashes_outdated_hash(sessions, monkeypatch):
+    """Login bem-sucedido refaz o hash quando o custo mudou"""
+    session, AsyncSessionLocal = sessions
+    old_context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    monkeypatch.setattr(core_security, "pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    db_user.hashed_password = old_context.hash("senha-antiga")
+    session.commit()
+
+    monkeypatch.setattr(core_security, "AsyncPrimaryReadSessionLocal", AsyncSessionLocal)
+    monkeypatch.setattr(core_security, "AsyncSessionLocal", AsyncSessionLocal)
+
+    assert asyncio.run(core_security.authenticate_user_async("ana@example.com", "senha-antiga"))
+    session.refresh(db_user)
+    assert db_user.hashed_password.startswith("$2b$05$")
+    assert core_security.verify_password("senha-antiga", db_user.hashed_password)
+
+
+def test_login_releases_session_before_hashing(sessions, monkeypatch):
+    """Nenhuma sessão fica aberta enquanto o bcrypt roda"""
+    session, AsyncSessionLocal = sessions
+    db_user = crud_user.get_user_by_email(session, "ana@example.com")
+    db_user.hashed_password = core_security.get_password_hash("senha")
+    session.commit()
+    open_sessions = []
+
+    def tracked_session():
+        db = AsyncSessionLocal()
+        open_sessions.append(db)
+        return db
+
+    def verify(plain_password, hashed_password):
+        assert all(not db.in_transaction() for db in open_sessions)
+        return core_security.pwd_context.verify_and_update(plain_password, hashed_password)
+
+    monkeypatch.setattr(core_security, "AsyncPrimaryReadSessionLocal", tracked_session)
+    monkeypatch.setattr(core_security, "AsyncSessionLocal", tracked_session)
+    monkeypatch.setattr(core_security, "verify_and_update_password", verify)
+
+    user = asyncio.run(core_security.authenticate_user_async("ana@example.com", "senha"))
+    assert user.id == db_user.id
+    assert len(open_sessions) == 1
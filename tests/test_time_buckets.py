@@ -0,0 +1,87 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Testes das séries temporais por dia, semana e mês
+"""
+
+import os
+import sys
+from datetime import date
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Adicionar diretório raiz ao path para importações
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Base
+from models_plans import Client, LeadUsage
+from time_buckets import bucket_range, bucket_totals, months_back
+from api_plans import get_lead_usage_history
+
+engine = create_engine(
+    "sqlite:///:memory:",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = TestingSessionLocal()
+    session.add(Client(id=1, name="Cliente", email="cliente@example.com"))
+    session.add_all([
+        LeadUsage(client_id=1, date=date(2024, 12, 30), total_consumed=3),
+        LeadUsage(client_id=1, date=date(2025, 1, 5), total_consumed=4),
+        LeadUsage(client_id=1, date=date(2025, 3, 1), total_consumed=5),
+    ])
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_bucket_range_follows_calendar():
+    """Meses e semanas seguem o calendário, inclusive na virada do ano"""
+    assert bucket_range(date(2024, 11, 15), date(2025, 2, 3), "month") == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)
+    ]
+    assert bucket_range(date(2025, 1, 1), date(2025, 1, 13), "week") == [
+        date(2024, 12, 30), date(2025, 1, 6), date(2025, 1, 13)
+    ]
+    assert months_back(date(2025, 2, 20), 12) == date(2024, 3, 1)
+
+    with pytest.raises(ValueError):
+        bucket_range(date(2025, 1, 1), date(2025, 1, 2), "year")
+    with pytest.raises(ValueError):
+        bucket_range(date(2020, 1, 1), date(2025, 1, 1), "day")
+
+
+def test_bucket_totals_zero_fills_in_one_query(db, assert_max_queries):
+    """Intervalos sem linhas aparecem com zero e a soma sai de uma consulta"""
+    with assert_max_queries(1):
+        months = bucket_totals(
+            db, LeadUsage.date, [func.sum(LeadUsage.total_consumed)],
+            date(2024, 12, 1), date(2025, 3, 31), "month"
+        )
+    assert months == [
+        (date(2024, 12, 1), (3,)), (date(2025, 1, 1), (4,)),
+        (date(2025, 2, 1), (0,)), (date(2025, 3, 1), (5,)),
+    ]
+
+    weeks = bucket_totals(
+        db, LeadUsage.date, [func.sum(LeadUsage.total_consumed)],
+        date(2024, 12, 30), date(2025, 1, 12), "week"
+    )
+    assert weeks == [(date(2024, 12, 30), (7,)), (date(2025, 1, 6), (0,))]
+
+
+def test_lead_usage_history(db):
+    """O histórico por cliente usa a mesma série"""
+    history = get_lead_usage_history(
+        client_id=1, start_date=date(2025, 1, 1), end_date=date(2025, 1, 7), granularity="day", db=db
+    )
+    assert [point.total_consumed for point in history.points] == [0, 0, 0, 0, 4, 0, 0]
+    assert history.points[4].label == "05/01/25"
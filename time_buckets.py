@@ -0,0 +1,164 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Séries temporais por dia, semana ou mês
+
+Este módulo gera os intervalos de calendário (buckets) de um período e soma
+valores por intervalo em uma única consulta agrupada, preenchendo com zero
+os intervalos sem dados. É usado pelos gráficos do dashboard, pelo relatório
+financeiro e pelo histórico de uso de leads por cliente.
+
+Semanas começam na segunda-feira; cada intervalo é identificado pela data
+do seu primeiro dia.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, List, Sequence, Tuple
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+
+GRANULARITIES = ("day", "week", "month")
+
+# Limite de intervalos por série, para que um período longo por dia não gere
+# respostas enormes
+MAX_BUCKETS = int(os.getenv("TIME_BUCKETS_MAX", "400"))
+
+_LABEL_FORMATS = {"day": "%d/%m/%y", "week": "%d/%m/%y", "month": "%b/%y"}
+
+
+def _check_granularity(granularity: str):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidade inválida: {granularity} (use {', '.join(GRANULARITIES)})")
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Retorna o primeiro dia do intervalo que contém `day`"""
+    _check_granularity(granularity)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    """Retorna o primeiro dia do intervalo seguinte a `start`"""
+    if granularity == "day":
+        return start + timedelta(days=1)
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+def bucket_range(start: date, end: date, granularity: str) -> List[date]:
+    """
+    Gera os intervalos que cobrem o período [start, end]
+
+    Args:
+        start: Primeiro dia do período
+        end: Último dia do período (inclusive)
+        granularity: "day", "week" ou "month"
+
+    Returns:
+        Lista com o primeiro dia de cada intervalo, em ordem
+
+    Raises:
+        ValueError: Se a granularidade for inválida, o período estiver
+            invertido ou passar de MAX_BUCKETS intervalos
+    """
+    if start > end:
+        raise ValueError("A data inicial deve ser anterior à data final")
+    buckets = []
+    current = bucket_start(start, granularity)
+    while current <= end:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"O período gera mais de {MAX_BUCKETS} intervalos; use uma granularidade maior")
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def months_back(end: date, months: int) -> date:
+    """Retorna o primeiro dia do mês `months - 1` meses antes de `end` (período padrão dos gráficos)"""
+    month_index = end.year * 12 + end.month - 1 - (months - 1)
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def bucket_label(start: date, granularity: str) -> str:
+    """Rótulo do intervalo nos gráficos"""
+    return start.strftime(_LABEL_FORMATS[granularity])
+
+
+def bucket_expression(db: Session, column, granularity: str):
+    """
+    Expressão SQL com o primeiro dia do intervalo de uma coluna de data
+
+    Args:
+        db: Sessão do banco de dados (define o dialeto)
+        column: Coluna Date
+        granularity: "day", "week" ou "month"
+    """
+    _check_granularity(granularity)
+    if db.get_bind().dialect.name == "sqlite":
+        if granularity == "month":
+            return func.strftime("%Y-%m-01", column)
+        if granularity == "week":
+            # 'weekday 0' avança até o domingo; seis dias antes fica a segunda-feira
+            return func.date(column, "weekday 0", "-6 days")
+        return func.date(column)
+    if granularity == "day":
+        return cast(column, Date)
+    return cast(func.date_trunc(granularity, column), Date)
+
+
+def _as_date(value: Any) -> date:
+    # O SQLite devolve o intervalo como texto AAAA-MM-DD
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def bucket_totals(
+    db: Session,
+    column,
+    measures: Sequence,
+    start: date,
+    end: date,
+    granularity: str,
+    *criteria
+) -> List[Tuple[date, Tuple[Any, ...]]]:
+    """
+    Soma as medidas por intervalo em uma única consulta agrupada
+
+    Args:
+        db: Sessão do banco de dados
+        column: Coluna Date que define o intervalo de cada linha
+        measures: Expressões agregadas (ex.: func.sum(...)), uma por valor
+        start: Primeiro dia do período
+        end: Último dia do período (inclusive)
+        granularity: "day", "week" ou "month"
+        *criteria: Filtros adicionais da consulta
+
+    Returns:
+        Lista de (primeiro dia do intervalo, valores) cobrindo todo o período,
+        com zeros nos intervalos sem linhas
+
+    Raises:
+        ValueError: Ver bucket_range
+    """
+    buckets = bucket_range(start, end, granularity)
+    bucket = bucket_expression(db, column, granularity).label("bucket")
+    rows = db.query(bucket, *measures).filter(
+        column >= start,
+        column <= end,
+        *criteria
+    ).group_by(bucket).all()
+
+    totals = {_as_date(row[0]): tuple(value or 0 for value in row[1:]) for row in rows}
+    zeros = tuple(0 for _ in measures)
+    return [(day, totals.get(day, zeros)) for day in buckets]
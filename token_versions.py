@@ -0,0 +1,102 @@
+"""
+Autocred - Sistema de Gestão de Leads para Correspondentes Bancários
+Mapa de versões de token dos usuários
+
+Os tokens JWT carregam a versão de token do usuário (claim `ver`). Alterar
+senha, desativar ou rebaixar um usuário incrementa users.token_version,
+revogando os tokens emitidos antes. Este módulo mantém em memória o mapa
+id -> versão dos usuários ativos, recarregado periodicamente, para que as
+rotas de leitura validem os tokens sem consultar a tabela de usuários.
+Usuários inativos ficam fora do mapa e sempre passam pela verificação
+completa.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+import logger
+import models_user
+
+
+class TokenVersionMap:
+    """
+    Versões de token atuais por ID de usuário ativo
+
+    Args:
+        session_factory: Fábrica de sessões assíncronas usada na recarga
+        refresh_interval: Intervalo entre recargas completas (segundos)
+    """
+    def __init__(self, session_factory, refresh_interval: float = 30.0):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def refresh_due(self) -> bool:
+        """Indica se o mapa nunca foi carregado ou está mais velho que o intervalo"""
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+
+    async def refresh_if_due(self):
+        """
+        Recarrega o mapa quando vencido
+
+        Apenas uma recarga roda por vez; enquanto ela acontece, as demais
+        requisições seguem com o mapa atual.
+        """
+        if not self.refresh_due() or not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            await self.refresh()
+        finally:
+            self._refresh_lock.release()
+
+    async def refresh(self):
+        """Recarrega as versões dos usuários ativos do banco principal"""
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(models_user.User.id, models_user.User.token_version)
+                    .where(models_user.User.is_active.is_(True))
+                )
+                versions = {user_id: version or 0 for user_id, version in result.all()}
+        except Exception as e:
+            self.refresh_errors += 1
+            # Sem recarga, o mapa atual continua valendo até a próxima tentativa
+            self._loaded_at = time.monotonic()
+            logger.error("Falha ao recarregar versões de token", {"error": str(e)})
+            return
+        self._versions = versions
+        self._loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def get(self, user_id: int) -> Optional[int]:
+        """Retorna a versão atual do usuário, ou None se ele não estiver no mapa (ou estiver inativo)"""
+        return self._versions.get(user_id)
+
+    def set(self, user_id: int, version: int):
+        """Atualiza a versão de um usuário neste worker, sem esperar a recarga"""
+        versions = dict(self._versions)
+        versions[user_id] = version
+        self._versions = versions
+
+    def discard(self, user_id: int):
+        """Remove um usuário excluído ou desativado do mapa"""
+        versions = dict(self._versions)
+        versions.pop(user_id, None)
+        self._versions = versions
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna tamanho, idade e contadores de recarga do mapa"""
+        return {
+            "size": len(self._versions),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 3) if self._loaded_at is not None else None,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }